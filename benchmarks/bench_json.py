@@ -0,0 +1,119 @@
+"""
+Microbenchmark da serialização JSON das respostas, sem banco nem HTTP.
+
+Monta listas de dicts no formato de Aluno, Livro e Emprestimo e mede, para cada
+tamanho, o tempo (mediana) de:
+
+- antes: datas convertidas com str() em cada registro + json.dumps padrão do
+  flask-restx (como era Emprestimo.to_dict)
+- stdlib / orjson: o SerializadorJSON, com as datas ainda como date
+
+Uso:
+    PYTHONPATH=. SCHEMA_CHECK=off \\
+        python benchmarks/bench_json.py --tamanhos 1000,10000,100000
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+from biblioteca_api.serializacao import SerializadorJSON, orjson
+
+DATAS = ("DATA_EMPRESTIMO", "DATA_PREVISTA_DEV", "DATA_DEVOLUCAO", "DATA_ATRASO")
+
+
+def alunos(n):
+    return [
+        {
+            "MAT_ALUNO": str(i),
+            "NOME": f"Aluno Número {i}",
+            "EMAIL": f"aluno{i}@exemplo.com",
+            "CURSO": "Ciência da Computação",
+            "VERSAO": 1,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def livros(n):
+    return [
+        {
+            "COD": i,
+            "TITULO": f"Introdução à Programação, volume {i}",
+            "AUTOR": "Autora Exemplo",
+            "EDITORA": "Editora Acadêmica",
+            "ANO": 1990 + i % 35,
+            "VERSAO": 1,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def emprestimos(n):
+    inicio = date(2024, 1, 1)
+    return [
+        {
+            "COD": i,
+            "MAT_ALUNO": i % 500 + 1,
+            "DATA_EMPRESTIMO": inicio + timedelta(days=i % 365),
+            "DATA_PREVISTA_DEV": inicio + timedelta(days=i % 365 + 15),
+            "DATA_DEVOLUCAO": inicio + timedelta(days=i % 365 + 10) if i % 2 else None,
+            "DATA_ATRASO": None,
+            "VERSAO": 1,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def antes(registros):
+    if registros and "DATA_EMPRESTIMO" in registros[0]:
+        registros = [
+            {
+                **registro,
+                **{c: str(registro[c]) if registro[c] else None for c in DATAS},
+            }
+            for registro in registros
+        ]
+    return json.dumps(registros) + "\n"
+
+
+def medir(funcao, payload, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(payload)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tamanhos", default="1000,10000,100000")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = {"antes": antes, "stdlib": SerializadorJSON("stdlib").dumps}
+    if orjson is not None:
+        backends["orjson"] = SerializadorJSON("orjson").dumps
+    else:
+        print("orjson não instalado: comparando só com a biblioteca padrão")
+
+    entidades = (("Aluno", alunos), ("Livro", livros), ("Emprestimo", emprestimos))
+    for nome, gerar in entidades:
+        for tamanho in (int(t) for t in args.tamanhos.split(",")):
+            payload = gerar(tamanho)
+            tempos = {
+                backend: medir(funcao, payload, args.repeticoes)
+                for backend, funcao in backends.items()
+            }
+            colunas = "  ".join(
+                f"{backend} {1000 * tempo:>8.2f} ms"
+                for backend, tempo in tempos.items()
+            )
+            print(f"{nome:<10} {tamanho:>7} registros  {colunas}")
+
+
+if __name__ == "__main__":
+    main()
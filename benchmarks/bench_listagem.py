@@ -0,0 +1,126 @@
+"""
+Compara o custo das listagens: objetos do ORM + to_dict() + marshal contra linhas
+do Core convertidas direto em dicts (caminho usado pelas rotas de listagem).
+
+Para cada tamanho de página, mede a latência (mediana) e o pico de memória
+alocada (tracemalloc) de montar a resposta de /Exemplares/ e /Emprestimos/, sem
+a serialização JSON, que é igual nos dois casos.
+
+Uso:
+    PYTHONPATH=. DATABASE_URL=sqlite:///:memory: \\
+        python benchmarks/bench_listagem.py --popular 10000 --paginas 100,1000,10000
+
+Com um banco real, --popular insere os registros de teste (um livro, um aluno,
+N exemplares e N empréstimos); sem ele, são usados os dados existentes.
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from flask_restx import marshal
+
+from biblioteca_api import app, db
+from biblioteca_api.controllers.rows import rows_to_dicts
+from biblioteca_api.models.aluno import Aluno
+from biblioteca_api.models.emprestimo import Emprestimo
+from biblioteca_api.models.exemplar import Exemplar
+from biblioteca_api.models.livro import Livro
+from biblioteca_api.models.swagger_models import emprestimo_model, exemplar_model
+from biblioteca_api.services.emprestimo_service import EmprestimoService
+from biblioteca_api.services.exemplar_service import ExemplarService
+
+
+def orm_exemplares(limite):
+    exemplares = ExemplarService.get_all_exemplares(db.session, limit=limite)
+    return marshal([exemplar.to_dict() for exemplar in exemplares], exemplar_model)
+
+
+def core_exemplares(limite):
+    return rows_to_dicts(ExemplarService.get_exemplares_rows(db.session, limit=limite))
+
+
+def orm_emprestimos(limite):
+    emprestimos = EmprestimoService.get_all_emprestimos(db.session, limit=limite)
+    return marshal([e.to_dict() for e in emprestimos], emprestimo_model)
+
+
+def core_emprestimos(limite):
+    rows = EmprestimoService.get_emprestimos_rows(db.session, limit=limite)
+    return rows_to_dicts(rows)
+
+
+CASOS = [
+    ("exemplares", orm_exemplares, core_exemplares),
+    ("emprestimos", orm_emprestimos, core_emprestimos),
+]
+
+
+def popular(quantidade):
+    db.create_all()
+    livro = Livro(TITULO="Livro de Teste", AUTOR="Autor")
+    aluno = Aluno(NOME="Aluno de Teste", EMAIL="bench@teste.com")
+    db.session.add_all([livro, aluno])
+    db.session.flush()
+    hoje = date.today()
+    db.session.execute(
+        Exemplar.__table__.insert(), [{"COD_LIVRO": livro.COD}] * quantidade
+    )
+    db.session.execute(
+        Emprestimo.__table__.insert(),
+        [
+            {
+                "MAT_ALUNO": aluno.MAT_ALUNO,
+                "DATA_EMPRESTIMO": hoje,
+                "DATA_PREVISTA_DEV": hoje + timedelta(days=15),
+            }
+        ]
+        * quantidade,
+    )
+    db.session.commit()
+
+
+def medir(funcao, limite, repeticoes):
+    """Mediana da latência (s) e pico de memória (bytes) de funcao(limite)"""
+    tempos = []
+    for _ in range(repeticoes):
+        db.session.remove()
+        inicio = time.perf_counter()
+        funcao(limite)
+        tempos.append(time.perf_counter() - inicio)
+
+    db.session.remove()
+    tracemalloc.start()
+    resultado = funcao(limite)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tempos), pico, len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--popular", type=int, default=0, metavar="N")
+    parser.add_argument("--paginas", default="100,1000,10000")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context(), app.test_request_context():
+        if args.popular:
+            popular(args.popular)
+
+        for nome, orm, core in CASOS:
+            for limite in (int(p) for p in args.paginas.split(",")):
+                t_orm, m_orm, linhas = medir(orm, limite, args.repeticoes)
+                t_core, m_core, _ = medir(core, limite, args.repeticoes)
+                print(
+                    f"{nome:<11} {linhas:>6} linhas  "
+                    f"ORM {1000 * t_orm:>8.2f} ms {m_orm / 1024:>9.0f} KiB  |  "
+                    f"Core {1000 * t_core:>8.2f} ms {m_core / 1024:>9.0f} KiB  "
+                    f"({t_orm / t_core:.1f}x)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Cache em memória (por processo) para leituras frequentes dos services.
+
+Cada entidade tem o seu cache, configurado por variáveis de ambiente:
+
+- CACHE_<ENTIDADE>: off (padrão), shadow ou on
+- CACHE_<ENTIDADE>_MAX: número máximo de entradas (padrão 1024)
+- CACHE_<ENTIDADE>_TTL: segundos de validade de cada entrada (padrão 60)
+
+No modo shadow o banco continua sendo consultado sempre: o cache só conta acertos,
+falhas e divergências, o que permite medir a taxa de acerto antes de ligá-lo.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MODO_OFF = "off"
+MODO_SHADOW = "shadow"
+MODO_ON = "on"
+MODOS = (MODO_OFF, MODO_SHADOW, MODO_ON)
+
+_AUSENTE = object()
+
+
+class LRUCache:
+    """
+    Cache LRU com TTL, limitado em número de entradas e seguro entre threads.
+
+    Guarde apenas valores imutáveis ou que ninguém vá alterar (ex.: o dict de
+    to_dict()): o mesmo objeto é devolvido a todas as requisições.
+    """
+
+    def __init__(
+        self, nome, maxsize=1024, ttl=60.0, modo=MODO_OFF, relogio=time.monotonic
+    ):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de cache inválido para {nome}: {modo!r}")
+        self.nome = nome
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.modo = modo
+        self._relogio = relogio
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._zerar_contadores()
+
+    def _zerar_contadores(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.divergencias = 0
+
+    def get(self, chave, default=None):
+        """Valor em cache (contando acerto/falha) ou default"""
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is not _AUSENTE:
+                valor, expira_em = item
+                if self._relogio() < expira_em:
+                    self._dados.move_to_end(chave)
+                    self.hits += 1
+                    return valor
+                del self._dados[chave]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (valor, self._relogio() + self.ttl)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, chave):
+        with self._lock:
+            if self._dados.pop(chave, _AUSENTE) is not _AUSENTE:
+                self.invalidations += 1
+
+    def esvaziar(self):
+        """Descarta todas as entradas, mantendo os contadores"""
+        with self._lock:
+            self._dados.clear()
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+            self._zerar_contadores()
+
+    def buscar(self, chave, carregar):
+        """
+        Leitura read-through: devolve o valor em cache ou chama carregar() e guarda
+        o resultado. None (registro inexistente) não é guardado.
+
+        Uma leitura concorrente com uma escrita pode guardar o valor anterior logo
+        após a invalidação; o TTL limita por quanto tempo isso é visível.
+        """
+        if self.modo == MODO_OFF:
+            return carregar()
+
+        valor = self.get(chave, _AUSENTE)
+        if valor is not _AUSENTE and self.modo == MODO_ON:
+            return valor
+
+        fresco = carregar()
+        if valor is not _AUSENTE and valor != fresco:
+            with self._lock:
+                self.divergencias += 1
+        if fresco is None:
+            self.invalidate(chave)
+        else:
+            self.set(chave, fresco)
+        return fresco
+
+    def buscar_varios(self, chaves, carregar):
+        """
+        Versão em lote de buscar: carregar(chaves) consulta o banco de uma vez e
+        devolve {chave: valor} só com os registros existentes. No modo on, apenas
+        as chaves fora do cache são consultadas.
+        """
+        if self.modo == MODO_OFF:
+            return carregar(chaves)
+
+        em_cache = {}
+        for chave in chaves:
+            valor = self.get(chave, _AUSENTE)
+            if valor is not _AUSENTE:
+                em_cache[chave] = valor
+        if self.modo == MODO_ON:
+            faltantes = [chave for chave in chaves if chave not in em_cache]
+        else:
+            faltantes = list(chaves)
+
+        frescos = carregar(faltantes) if faltantes else {}
+        if self.modo == MODO_SHADOW:
+            divergencias = sum(
+                1 for chave, valor in em_cache.items() if frescos.get(chave) != valor
+            )
+            with self._lock:
+                self.divergencias += divergencias
+        for chave in faltantes:
+            if chave in frescos:
+                self.set(chave, frescos[chave])
+            else:
+                self.invalidate(chave)
+        return {**em_cache, **frescos} if self.modo == MODO_ON else frescos
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "modo": self.modo,
+                "entradas": len(self._dados),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "divergencias": self.divergencias,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_para(nome):
+    """Cache da entidade, criado na primeira chamada com a configuração do ambiente"""
+    with _caches_lock:
+        if nome not in _caches:
+            prefixo = f"CACHE_{nome.upper()}"
+            _caches[nome] = LRUCache(
+                nome,
+                maxsize=int(os.environ.get(f"{prefixo}_MAX", 1024)),
+                ttl=float(os.environ.get(f"{prefixo}_TTL", 60)),
+                modo=os.environ.get(prefixo, MODO_OFF).lower(),
+            )
+        return _caches[nome]
+
+
+def cache_existente(nome):
+    """Cache já criado para a entidade, ou None"""
+    with _caches_lock:
+        return _caches.get(nome)
+
+
+def caches_ligados():
+    """Caches em modo shadow ou on, que precisam ser invalidados"""
+    with _caches_lock:
+        return [cache for cache in _caches.values() if cache.modo != MODO_OFF]
+
+
+def cache_stats():
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.nome: cache.stats() for cache in caches}
@@ -1,26 +1,83 @@
 from flask import request
 from flask_restx import Namespace, Resource
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 
 from .. import db
 from ..models.aluno import Aluno
 from ..models.swagger_models import (
     aluno_model,
     aluno_response_model,
+    alunos_lookup_model,
     error_model,
+    lookup_model,
     message_model,
 )
+from ..services.aluno_service import AlunoService
+from ..services.concorrencia import VersaoDesatualizada, verificar_versao
+from ..services.projecao import opcoes_campos
+from .conditional import (
+    conditional_response,
+    etag_headers,
+    if_match_versions,
+    not_modified_since,
+    version_etag,
+)
+from .lookup import body_ids, lookup_response, parse_ids
+from .pagination import next_cursor_headers, pagination_parser, parse_pagination
+from .patch import parse_patch
+from .rows import convert_values, rows_to_dicts
+from .sparse import parse_fields, project_model
+from .streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, ndjson_response, wants_ndjson
 
 alunos_ns = Namespace("Alunos", description="Operações relacionadas a alunos")
 
+# Campos aceitos no PATCH e seus tipos
+CAMPOS_PATCH = {"NOME": str, "EMAIL": str, "CURSO": str}
+
+FIELDS_DOC = "Campos da resposta, separados por vírgula (ex.: NOME,CURSO)"
+
+# MAT_ALUNO é fields.String em aluno_response_model: listagens JSON e NDJSON
+# convertem o valor da coluna da mesma forma
+CONVERSOES_ALUNO = {"MAT_ALUNO": str}
+
+
+def buscar_alunos(matriculas):
+    """Resposta da busca em lote de alunos"""
+    alunos = AlunoService.buscar_por_matriculas(db.session, matriculas)
+    if alunos is None:
+        alunos_ns.abort(500, "Erro ao buscar alunos")
+    return lookup_response(matriculas, alunos, alunos_lookup_model)
+
 
 @alunos_ns.route("/")
 class AlunosList(Resource):
     @alunos_ns.doc("listar_alunos")
-    @alunos_ns.marshal_list_with(aluno_response_model)
+    @alunos_ns.expect(pagination_parser)
+    @alunos_ns.param("ids", "Matrículas separadas por vírgula (busca em lote)")
+    @alunos_ns.param("fields", FIELDS_DOC + " (ignorado em NDJSON)")
+    @alunos_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @alunos_ns.response(200, "Lista de alunos", [aluno_response_model])
+    @alunos_ns.response(400, "Parâmetros inválidos", error_model)
     def get(self):
-        """Lista todos os alunos"""
-        alunos = Aluno.query.all()
-        return [aluno.to_dict() for aluno in alunos]
+        """Lista os alunos, paginados por matrícula (ou todos, em NDJSON)"""
+        matriculas = parse_ids(alunos_ns)
+        if matriculas is not None:
+            return buscar_alunos(matriculas)
+
+        after, limit = parse_pagination(alunos_ns)
+        campos = parse_fields(alunos_ns, aluno_response_model, "MAT_ALUNO")
+        if wants_ndjson():
+            return ndjson_response(
+                convert_values(aluno, CONVERSOES_ALUNO)
+                for aluno in AlunoService.iterar_todos(db.session, after=after)
+            )
+
+        rows = AlunoService.listar_linhas(
+            db.session, limit=limit, after=after, campos=campos
+        )
+        headers = next_cursor_headers(rows, limit, key=lambda r: r.MAT_ALUNO)
+        return rows_to_dicts(rows, CONVERSOES_ALUNO), 200, headers
 
     @alunos_ns.doc("criar_aluno")
     @alunos_ns.expect(aluno_model)
@@ -48,31 +105,65 @@ class AlunosList(Resource):
             db.session.close()
 
 
+@alunos_ns.route("/lookup")
+class AlunosLookup(Resource):
+    @alunos_ns.doc("buscar_alunos_em_lote")
+    @alunos_ns.expect(lookup_model)
+    @alunos_ns.response(200, "Alunos na ordem pedida", alunos_lookup_model)
+    @alunos_ns.response(400, "Lista de ids inválida", error_model)
+    def post(self):
+        """Busca vários alunos pelas matrículas, na ordem pedida"""
+        return buscar_alunos(body_ids(alunos_ns))
+
+
 @alunos_ns.route("/<int:MAT_ALUNO>")
 @alunos_ns.param("MAT_ALUNO", "Matrícula do aluno")
 class AlunoResource(Resource):
     @alunos_ns.doc("obter_aluno")
-    @alunos_ns.marshal_with(aluno_response_model)
+    @alunos_ns.param("fields", FIELDS_DOC)
+    @alunos_ns.response(200, "Aluno encontrado", aluno_response_model)
+    @alunos_ns.response(304, "Aluno não modificado desde o ETag informado")
     @alunos_ns.response(404, "Aluno não encontrado", error_model)
     def get(self, MAT_ALUNO):
-        """Obtém um aluno pela matrícula"""
-        aluno = db.session.get(Aluno, MAT_ALUNO)
+        """Obtém um aluno pela matrícula (aceita If-None-Match)"""
+        campos = parse_fields(alunos_ns, aluno_response_model, "MAT_ALUNO")
+        if not campos:
+            not_modified = not_modified_since(Aluno, MAT_ALUNO)
+            if not_modified:
+                return not_modified
+
+        aluno = db.session.get(Aluno, MAT_ALUNO, options=opcoes_campos(Aluno, campos))
         if aluno is None:
             alunos_ns.abort(404, "Aluno não encontrado")
-        return aluno.to_dict()
+        if campos:
+            # Resposta parcial: o ETag é o hash do conteúdo, não a VERSAO
+            return conditional_response(
+                aluno.to_dict(campos), project_model(aluno_response_model, campos)
+            )
+        return conditional_response(
+            aluno.to_dict(), aluno_response_model, etag=version_etag(aluno.VERSAO)
+        )
 
     @alunos_ns.doc("atualizar_aluno")
     @alunos_ns.expect(aluno_model)
     @alunos_ns.marshal_with(aluno_response_model)
     @alunos_ns.response(404, "Aluno não encontrado", error_model)
     @alunos_ns.response(409, "O e-mail informado já está em uso", error_model)
+    @alunos_ns.response(412, "Versão diferente da informada em If-Match", error_model)
     @alunos_ns.response(500, "Erro interno do servidor", error_model)
     def put(self, MAT_ALUNO):
-        """Atualiza um aluno existente"""
+        """Atualiza um aluno existente (aceita If-Match)"""
         aluno = db.session.get(Aluno, MAT_ALUNO)
         if aluno is None:
             alunos_ns.abort(404, "Aluno não encontrado")
 
+        try:
+            verificar_versao(aluno, if_match_versions())
+        except VersaoDesatualizada:
+            alunos_ns.abort(
+                412, "O aluno foi alterado desde a versão informada em If-Match"
+            )
+
         data = request.get_json()
 
         # Verifica se o e-mail já está em uso por outro aluno
@@ -85,13 +176,52 @@ class AlunoResource(Resource):
             aluno.EMAIL = data["EMAIL"]
             aluno.CURSO = data.get("CURSO", "")
             db.session.commit()
-            return aluno.to_dict()
+            return aluno.to_dict(), 200, etag_headers(aluno.VERSAO)
+        except StaleDataError:
+            db.session.rollback()
+            alunos_ns.abort(412, "O aluno foi alterado por outra requisição")
         except Exception as e:
             db.session.rollback()
             alunos_ns.abort(500, f"Erro ao atualizar aluno: {str(e)}")
         finally:
             db.session.close()
 
+    @alunos_ns.doc("atualizar_aluno_parcial")
+    @alunos_ns.expect(aluno_model, validate=False)
+    @alunos_ns.marshal_with(aluno_response_model)
+    @alunos_ns.response(400, "Campos inválidos", error_model)
+    @alunos_ns.response(404, "Aluno não encontrado", error_model)
+    @alunos_ns.response(409, "O e-mail informado já está em uso", error_model)
+    @alunos_ns.response(412, "Versão diferente da informada em If-Match", error_model)
+    @alunos_ns.response(500, "Erro interno do servidor", error_model)
+    def patch(self, MAT_ALUNO):
+        """Altera só os campos enviados, num único UPDATE (aceita If-Match)"""
+        try:
+            valores = parse_patch(CAMPOS_PATCH, obrigatorios=("NOME",))
+        except ValueError as e:
+            alunos_ns.abort(400, str(e))
+
+        # O e-mail só é conferido se estiver sendo alterado
+        if valores.get("EMAIL") is not None:
+            email = valores["EMAIL"]
+            existing_aluno = Aluno.query.filter(Aluno.EMAIL == email).first()
+            if existing_aluno and existing_aluno.MAT_ALUNO != MAT_ALUNO:
+                alunos_ns.abort(409, f"O e-mail '{email}' já está em uso.")
+
+        try:
+            aluno = AlunoService.atualizar_parcial(
+                db.session, MAT_ALUNO, valores, versoes=if_match_versions()
+            )
+        except VersaoDesatualizada:
+            alunos_ns.abort(
+                412, "O aluno foi alterado desde a versão informada em If-Match"
+            )
+        except SQLAlchemyError as e:
+            alunos_ns.abort(500, f"Erro ao atualizar aluno: {str(e)}")
+        if aluno is None:
+            alunos_ns.abort(404, "Aluno não encontrado")
+        return aluno, 200, etag_headers(aluno["VERSAO"])
+
     @alunos_ns.doc("deletar_aluno")
     @alunos_ns.marshal_with(message_model)
     @alunos_ns.response(404, "Aluno não encontrado", error_model)
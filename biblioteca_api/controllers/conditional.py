@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+from flask import Response, request
+from flask_restx import marshal
+from sqlalchemy import inspect, select
+
+from .. import db
+
+# Requisições condicionais. Registros versionados (coluna VERSAO) têm ETag "v<N>":
+# - GET: o cliente reenvia o ETag em If-None-Match e recebe 304 sem corpo se o
+#   registro não mudou;
+# - PUT: com If-Match, a alteração só é aceita se o registro ainda estiver na
+#   versão informada (senão, 412).
+# As tabelas não têm data de alteração, então não há Last-Modified.
+
+
+def compute_etag(data):
+    """ETag a partir do conteúdo: hash do JSON canônico do registro (ou lista)"""
+    corpo = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(corpo.encode("utf-8")).hexdigest()
+
+
+def version_etag(versao):
+    """ETag de um registro versionado"""
+    return f"v{versao}"
+
+
+def etag_headers(versao):
+    """Cabeçalho ETag para a resposta de uma escrita"""
+    return {"ETag": f'"{version_etag(versao)}"'}
+
+
+def not_modified_response(etag):
+    """304 sem corpo, repetindo o ETag"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional_response(data, model=None, etag=None):
+    """
+    Resposta de um GET com suporte a If-None-Match.
+
+    Se o cliente já tem a versão atual, devolve 304 sem serializar o corpo;
+    senão, o registro (passado por marshal, se houver model) com o cabeçalho ETag.
+    Cache-Control: no-cache faz os clientes revalidarem a cada uso.
+    """
+    etag = etag or compute_etag(data)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified_response(etag)
+
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if model is not None:
+        data = marshal(data, model)
+    return data, 200, headers
+
+
+def not_modified_since(entity, chave):
+    """
+    Atalho para GETs com If-None-Match: lê só a coluna VERSAO do registro e, se
+    o cliente já tem essa versão, devolve o 304 sem carregar o resto da linha.
+    Retorna None quando a resposta completa é necessária.
+    """
+    if not request.if_none_match:
+        return None
+    pk = inspect(entity).primary_key[0]
+    versao = db.session.execute(
+        select(entity.VERSAO).where(pk == chave)
+    ).scalar_one_or_none()
+    if versao is None:
+        return None
+    etag = version_etag(versao)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified_response(etag)
+    return None
+
+
+def if_match_versions():
+    """
+    Versões aceitas pelo If-Match da requisição, ou None se não houver exigência
+    (cabeçalho ausente ou "*"). ETags que não são de versão não correspondem a
+    nenhum registro: o conjunto vazio faz a escrita ser rejeitada.
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    return {
+        int(etag[1:])
+        for etag in if_match.as_set()
+        if etag.startswith("v") and etag[1:].isdigit()
+    }
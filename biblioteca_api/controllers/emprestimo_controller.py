@@ -1,31 +1,101 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from flask import request
-from flask_restx import Namespace, Resource
+from flask_restx import Namespace, Resource, marshal
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 
 from .. import db
 from ..models.aluno import Aluno
 from ..models.emprestimo import Emprestimo
 from ..models.swagger_models import (
+    checkout_model,
+    devolucao_lote_model,
+    devolucao_resultado_model,
+    emprestimo_checkout_model,
+    emprestimo_com_relacionados_model,
     emprestimo_create_model,
     emprestimo_model,
     error_model,
     message_model,
 )
+from ..services.concorrencia import VersaoDesatualizada, verificar_versao
+from ..services.emprestimo_exemplar_service import EmprestimoExemplarService
+from ..services.emprestimo_service import EmprestimoService
+from ..services.projecao import opcoes_campos
+from .conditional import (
+    compute_etag,
+    conditional_response,
+    etag_headers,
+    if_match_versions,
+    not_modified_response,
+    not_modified_since,
+    version_etag,
+)
+from .include import INCLUDE_EMPRESTIMO, emprestimo_fields, parse_include
+from .pagination import next_cursor_headers, pagination_parser, parse_pagination
+from .patch import parse_patch
+from .rows import rows_to_dicts
+from .sparse import parse_fields
+from .streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, ndjson_response, wants_ndjson
 
 emprestimos_ns = Namespace(
     "Emprestimos", description="Operações relacionadas a empréstimos"
 )
 
+PRAZO_EMPRESTIMO = timedelta(days=15)
+MAX_DEVOLUCOES_LOTE = 10000
+
+INCLUDE_DOC = (
+    "Relacionamentos a embutir, separados por vírgula: aluno, exemplares, "
+    "exemplares.livro"
+)
+FIELDS_DOC = "Campos da resposta, separados por vírgula (ex.: COD,DATA_PREVISTA_DEV)"
+
+# Campos aceitos no PATCH e seus tipos
+CAMPOS_PATCH = {
+    "MAT_ALUNO": int,
+    "DATA_EMPRESTIMO": date,
+    "DATA_PREVISTA_DEV": date,
+    "DATA_DEVOLUCAO": date,
+    "DATA_ATRASO": date,
+}
+
 
 @emprestimos_ns.route("/")
 class EmprestimosList(Resource):
     @emprestimos_ns.doc("listar_emprestimos")
-    @emprestimos_ns.marshal_list_with(emprestimo_model)
+    @emprestimos_ns.expect(pagination_parser)
+    @emprestimos_ns.param("include", INCLUDE_DOC + " (ignorado em NDJSON)")
+    @emprestimos_ns.param("fields", FIELDS_DOC + " (ignorado em NDJSON)")
+    @emprestimos_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @emprestimos_ns.response(
+        200, "Lista de empréstimos", [emprestimo_com_relacionados_model]
+    )
     def get(self):
-        """Lista todos os empréstimos"""
-        emprestimos = Emprestimo.query.all()
-        return [emprestimo.to_dict() for emprestimo in emprestimos]
+        """Lista os empréstimos, paginados por COD (ou todos, em NDJSON)"""
+        after, limit = parse_pagination(emprestimos_ns)
+        include = parse_include(emprestimos_ns, INCLUDE_EMPRESTIMO)
+        campos = parse_fields(emprestimos_ns, emprestimo_model, "COD")
+        if wants_ndjson():
+            return ndjson_response(
+                EmprestimoService.stream_emprestimos(db.session, after=after)
+            )
+
+        if not include:
+            rows = EmprestimoService.get_emprestimos_rows(
+                db.session, limit=limit, after=after, campos=campos
+            )
+            headers = next_cursor_headers(rows, limit, key=lambda r: r.COD)
+            return rows_to_dicts(rows), 200, headers
+
+        emprestimos = EmprestimoService.get_all_emprestimos(
+            db.session, limit=limit, after=after, include=include, campos=campos
+        )
+        headers = next_cursor_headers(emprestimos, limit, key=lambda e: e.COD)
+        data = [emprestimo.to_dict(include, campos) for emprestimo in emprestimos]
+        return marshal(data, emprestimo_fields(include, campos)), 200, headers
 
     @emprestimos_ns.doc("criar_emprestimo")
     @emprestimos_ns.expect(emprestimo_create_model)
@@ -43,7 +113,7 @@ class EmprestimosList(Resource):
 
         try:
             data_emprestimo = datetime.now().date()
-            data_prevista_dev = data_emprestimo + timedelta(days=15)
+            data_prevista_dev = data_emprestimo + PRAZO_EMPRESTIMO
 
             new_emprestimo = Emprestimo(
                 MAT_ALUNO=data["MAT_ALUNO"],
@@ -61,31 +131,130 @@ class EmprestimosList(Resource):
             db.session.close()
 
 
+@emprestimos_ns.route("/checkout")
+class EmprestimoCheckout(Resource):
+    @emprestimos_ns.doc("checkout")
+    @emprestimos_ns.expect(checkout_model)
+    @emprestimos_ns.marshal_with(emprestimo_checkout_model, code=201)
+    @emprestimos_ns.response(
+        400, "Aluno ou exemplar não encontrado, ou exemplar indisponível", error_model
+    )
+    @emprestimos_ns.response(500, "Erro interno do servidor", error_model)
+    def post(self):
+        """Cria um empréstimo com todos os seus exemplares numa única transação"""
+        data = request.get_json()
+
+        tombos = data.get("TOMBOS") if data else None
+        if (
+            not isinstance(tombos, list)
+            or not tombos
+            or not all(isinstance(t, int) and not isinstance(t, bool) for t in tombos)
+        ):
+            emprestimos_ns.abort(400, "TOMBOS deve ser uma lista não vazia de inteiros")
+        tombos = list(dict.fromkeys(tombos))
+
+        aluno = db.session.get(Aluno, data.get("MAT_ALUNO"))
+        if not aluno:
+            emprestimos_ns.abort(400, "Aluno não encontrado")
+
+        try:
+            # Trava os exemplares e verifica todos de uma vez antes de inserir
+            encontrados = EmprestimoExemplarService.bloquear_exemplares(
+                db.session, tombos
+            )
+            faltando = sorted(set(tombos) - set(encontrados))
+            if faltando:
+                db.session.rollback()
+                emprestimos_ns.abort(
+                    400, f"Exemplares não encontrados: {', '.join(map(str, faltando))}"
+                )
+
+            emprestados = EmprestimoExemplarService.tombos_emprestados(
+                db.session, tombos
+            )
+            if emprestados:
+                db.session.rollback()
+                emprestimos_ns.abort(
+                    400,
+                    f"Exemplares já emprestados: {', '.join(map(str, emprestados))}",
+                )
+
+            data_emprestimo = datetime.now().date()
+            emprestimo = EmprestimoService.criar_emprestimo_com_exemplares(
+                db.session,
+                aluno.MAT_ALUNO,
+                tombos,
+                data_emprestimo,
+                data_emprestimo + PRAZO_EMPRESTIMO,
+            )
+            resposta = dict(emprestimo.to_dict(), TOMBOS=tombos)
+            db.session.commit()
+            return resposta, 201
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            emprestimos_ns.abort(500, f"Erro ao realizar checkout: {str(e)}")
+        finally:
+            db.session.close()
+
+
 @emprestimos_ns.route("/<int:COD>")
 @emprestimos_ns.param("COD", "Código do empréstimo (COD)")
 class EmprestimoResource(Resource):
     @emprestimos_ns.doc("obter_emprestimo")
-    @emprestimos_ns.marshal_with(emprestimo_model)
+    @emprestimos_ns.param("include", INCLUDE_DOC)
+    @emprestimos_ns.param("fields", FIELDS_DOC)
+    @emprestimos_ns.response(
+        200, "Empréstimo encontrado", emprestimo_com_relacionados_model
+    )
+    @emprestimos_ns.response(304, "Empréstimo não modificado desde o ETag informado")
     @emprestimos_ns.response(404, "Empréstimo não encontrado", error_model)
     def get(self, COD):
-        """Obtém um empréstimo pelo COD"""
-        emprestimo = db.session.get(Emprestimo, COD)
+        """Obtém um empréstimo pelo COD (aceita If-None-Match)"""
+        include = parse_include(emprestimos_ns, INCLUDE_EMPRESTIMO)
+        campos = parse_fields(emprestimos_ns, emprestimo_model, "COD")
+        completo = not include and not campos
+        if completo:
+            not_modified = not_modified_since(Emprestimo, COD)
+            if not_modified:
+                return not_modified
+
+        opcoes = [
+            *EmprestimoService.opcoes_include(include),
+            *opcoes_campos(Emprestimo, campos),
+        ]
+        emprestimo = db.session.get(Emprestimo, COD, options=opcoes)
         if emprestimo is None:
             emprestimos_ns.abort(404, "Empréstimo não encontrado")
-        return emprestimo.to_dict()
+        data = emprestimo.to_dict(include, campos)
+        # Com relacionamentos embutidos ou só parte dos campos, a VERSAO não
+        # identifica a resposta: o ETag passa a ser o hash do conteúdo
+        etag = version_etag(emprestimo.VERSAO) if completo else compute_etag(data)
+        return conditional_response(
+            data, emprestimo_fields(include, campos), etag=etag
+        )
 
     @emprestimos_ns.doc("atualizar_emprestimo")
     @emprestimos_ns.expect(emprestimo_model)
     @emprestimos_ns.marshal_with(emprestimo_model)
     @emprestimos_ns.response(404, "Empréstimo não encontrado", error_model)
     @emprestimos_ns.response(400, "Aluno não encontrado", error_model)
+    @emprestimos_ns.response(
+        412, "Versão diferente da informada em If-Match", error_model
+    )
     @emprestimos_ns.response(500, "Erro interno do servidor", error_model)
     def put(self, COD):
-        """Atualiza um empréstimo existente pelo COD"""
+        """Atualiza um empréstimo existente pelo COD (aceita If-Match)"""
         emprestimo = db.session.get(Emprestimo, COD)
         if emprestimo is None:
             emprestimos_ns.abort(404, "Empréstimo não encontrado")
 
+        try:
+            verificar_versao(emprestimo, if_match_versions())
+        except VersaoDesatualizada:
+            emprestimos_ns.abort(
+                412, "O empréstimo foi alterado desde a versão informada em If-Match"
+            )
+
         data = request.get_json()
 
         aluno = db.session.get(Aluno, data["MAT_ALUNO"])
@@ -111,13 +280,51 @@ class EmprestimoResource(Resource):
                 else None
             )
             db.session.commit()
-            return emprestimo.to_dict()
+            return emprestimo.to_dict(), 200, etag_headers(emprestimo.VERSAO)
+        except StaleDataError:
+            db.session.rollback()
+            emprestimos_ns.abort(
+                412, "O empréstimo foi alterado por outra requisição"
+            )
         except Exception as e:
             db.session.rollback()
             emprestimos_ns.abort(500, f"Erro ao atualizar empréstimo: {str(e)}")
         finally:
             db.session.close()
 
+    @emprestimos_ns.doc("atualizar_emprestimo_parcial")
+    @emprestimos_ns.expect(emprestimo_model, validate=False)
+    @emprestimos_ns.marshal_with(emprestimo_model)
+    @emprestimos_ns.response(
+        400, "Campos inválidos ou aluno não encontrado", error_model
+    )
+    @emprestimos_ns.response(404, "Empréstimo não encontrado", error_model)
+    @emprestimos_ns.response(
+        412, "Versão diferente da informada em If-Match", error_model
+    )
+    @emprestimos_ns.response(500, "Erro interno do servidor", error_model)
+    def patch(self, COD):
+        """Altera só os campos enviados, num único UPDATE (aceita If-Match)"""
+        try:
+            valores = parse_patch(
+                CAMPOS_PATCH,
+                obrigatorios=("MAT_ALUNO", "DATA_EMPRESTIMO", "DATA_PREVISTA_DEV"),
+            )
+            emprestimo = EmprestimoService.patch_emprestimo(
+                db.session, COD, valores, versoes=if_match_versions()
+            )
+        except ValueError as e:
+            emprestimos_ns.abort(400, str(e))
+        except VersaoDesatualizada:
+            emprestimos_ns.abort(
+                412, "O empréstimo foi alterado desde a versão informada em If-Match"
+            )
+        except SQLAlchemyError as e:
+            emprestimos_ns.abort(500, f"Erro ao atualizar empréstimo: {str(e)}")
+        if emprestimo is None:
+            emprestimos_ns.abort(404, "Empréstimo não encontrado")
+        return emprestimo, 200, etag_headers(emprestimo["VERSAO"])
+
     @emprestimos_ns.doc("deletar_emprestimo")
     @emprestimos_ns.marshal_with(message_model)
     @emprestimos_ns.response(404, "Empréstimo não encontrado", error_model)
@@ -139,6 +346,42 @@ class EmprestimoResource(Resource):
             db.session.close()
 
 
+@emprestimos_ns.route("/devolver")
+class DevolverEmprestimosLote(Resource):
+    @emprestimos_ns.doc("devolver_emprestimos_lote")
+    @emprestimos_ns.expect(devolucao_lote_model)
+    @emprestimos_ns.marshal_list_with(devolucao_resultado_model, skip_none=True)
+    @emprestimos_ns.response(400, "Requisição inválida", error_model)
+    @emprestimos_ns.response(500, "Erro interno do servidor", error_model)
+    def put(self):
+        """Registra a devolução de vários empréstimos, por COD ou por tombo"""
+        data = request.get_json() or {}
+
+        chaves = [chave for chave in ("CODS", "TOMBOS") if chave in data]
+        if len(chaves) != 1:
+            emprestimos_ns.abort(400, "Informe CODS ou TOMBOS (apenas um dos dois)")
+        chave = chaves[0]
+        ids = data[chave]
+        if (
+            not isinstance(ids, list)
+            or not 1 <= len(ids) <= MAX_DEVOLUCOES_LOTE
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+        ):
+            emprestimos_ns.abort(
+                400,
+                f"{chave} deve ser uma lista de 1 a {MAX_DEVOLUCOES_LOTE} inteiros",
+            )
+        ids = list(dict.fromkeys(ids))
+
+        if chave == "CODS":
+            resultado = EmprestimoService.devolver_emprestimos(db.session, ids)
+        else:
+            resultado = EmprestimoService.devolver_por_tombos(db.session, ids)
+        if resultado is None:
+            emprestimos_ns.abort(500, "Erro ao registrar devoluções")
+        return resultado
+
+
 @emprestimos_ns.route("/devolver/<int:COD>")
 @emprestimos_ns.param("COD", "Código do empréstimo (COD)")
 class DevolverEmprestimo(Resource):
@@ -176,13 +419,39 @@ class DevolverEmprestimo(Resource):
 @emprestimos_ns.param("MAT_ALUNO", "Matrícula do aluno")
 class EmprestimosPorAluno(Resource):
     @emprestimos_ns.doc("listar_emprestimos_por_aluno")
-    @emprestimos_ns.marshal_list_with(emprestimo_model)
+    @emprestimos_ns.param("include", INCLUDE_DOC)
+    @emprestimos_ns.response(
+        200, "Empréstimos do aluno", [emprestimo_com_relacionados_model]
+    )
+    @emprestimos_ns.response(304, "Lista não modificada desde o ETag informado")
     @emprestimos_ns.response(404, "Aluno não encontrado", error_model)
     def get(self, MAT_ALUNO):
-        """Lista todos os empréstimos de um aluno específico"""
+        """Lista todos os empréstimos de um aluno específico (aceita If-None-Match)"""
+        include = parse_include(emprestimos_ns, INCLUDE_EMPRESTIMO)
+        if request.if_none_match and not include:
+            # Os pares (COD, VERSAO) bastam para saber se a lista mudou
+            versoes = db.session.execute(
+                select(Emprestimo.COD, Emprestimo.VERSAO)
+                .where(Emprestimo.MAT_ALUNO == MAT_ALUNO)
+                .order_by(Emprestimo.COD)
+            ).all()
+            etag = compute_etag([list(versao) for versao in versoes])
+            if versoes and request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+
         aluno = db.session.get(Aluno, MAT_ALUNO)
         if not aluno:
             emprestimos_ns.abort(404, "Aluno não encontrado")
 
-        emprestimos = Emprestimo.query.filter_by(MAT_ALUNO=MAT_ALUNO).all()
-        return [emprestimo.to_dict() for emprestimo in emprestimos]
+        emprestimos = (
+            Emprestimo.query.filter_by(MAT_ALUNO=MAT_ALUNO)
+            .options(*EmprestimoService.opcoes_include(include))
+            .order_by(Emprestimo.COD)
+            .all()
+        )
+        data = [emprestimo.to_dict(include) for emprestimo in emprestimos]
+        if include:
+            etag = compute_etag(data)
+        else:
+            etag = compute_etag([[e["COD"], e["VERSAO"]] for e in data])
+        return conditional_response(data, emprestimo_fields(include), etag=etag)
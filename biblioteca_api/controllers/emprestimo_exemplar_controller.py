@@ -1,5 +1,6 @@
 from flask import request
-from flask_restx import Namespace, Resource
+from flask_restx import Namespace, Resource, marshal
+from sqlalchemy.exc import SQLAlchemyError
 
 from .. import db
 from ..models.emprestimo import Emprestimo
@@ -10,6 +11,16 @@ from ..models.swagger_models import (
     error_model,
     message_model,
 )
+from ..services.emprestimo_exemplar_service import (
+    EmprestimoExemplarService,
+    ExemplarEmprestado,
+)
+from .pagination import (
+    composite_pagination_parser,
+    next_cursor_headers,
+    parse_pagination,
+)
+from .streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, ndjson_response, wants_ndjson
 
 emprestimo_exemplares_ns = Namespace(
     "Emprestimo-exemplares",
@@ -20,11 +31,31 @@ emprestimo_exemplares_ns = Namespace(
 @emprestimo_exemplares_ns.route("/")
 class EmprestimoExemplaresList(Resource):
     @emprestimo_exemplares_ns.doc("listar_emprestimo_exemplares")
-    @emprestimo_exemplares_ns.marshal_list_with(emprestimo_exemplar_model)
+    @emprestimo_exemplares_ns.expect(composite_pagination_parser)
+    @emprestimo_exemplares_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @emprestimo_exemplares_ns.response(
+        200, "Lista de exemplares de empréstimos", [emprestimo_exemplar_model]
+    )
     def get(self):
-        """Lista todos os exemplares de empréstimos"""
-        emprestimo_exemplares = EmprestimoExemplar.query.all()
-        return [ee.to_dict() for ee in emprestimo_exemplares]
+        """Lista os exemplares de empréstimos, paginados pela chave composta"""
+        after, limit = parse_pagination(emprestimo_exemplares_ns, composite=True)
+        if wants_ndjson():
+            return ndjson_response(
+                EmprestimoExemplarService.stream_emprestimo_exemplares(
+                    db.session, after=after
+                )
+            )
+
+        emprestimo_exemplares = EmprestimoExemplarService.get_all_emprestimo_exemplares(
+            db.session, limit=limit, after=after
+        )
+        headers = next_cursor_headers(
+            emprestimo_exemplares,
+            limit,
+            key=lambda ee: (ee.cod_emprestimo, ee.tombo_exemplar),
+        )
+        data = [ee.to_dict() for ee in emprestimo_exemplares]
+        return marshal(data, emprestimo_exemplar_model), 200, headers
 
     @emprestimo_exemplares_ns.doc("criar_emprestimo_exemplar")
     @emprestimo_exemplares_ns.expect(emprestimo_exemplar_model)
@@ -46,37 +77,20 @@ class EmprestimoExemplaresList(Resource):
                 400, "Não é possível adicionar exemplares a um empréstimo já devolvido."
             )
 
-        # Verificar se o exemplar existe
-        exemplar = db.session.get(Exemplar, data["TOMBO_EXEMPLAR"])
-        if not exemplar:
-            emprestimo_exemplares_ns.abort(400, "Exemplar não encontrado")
-
-        # Verificar se o exemplar já está em outro empréstimo ativo
-        emprestimo_ativo = (
-            EmprestimoExemplar.query.filter_by(tombo_exemplar=data["TOMBO_EXEMPLAR"])
-            .join(Emprestimo)
-            .filter(Emprestimo.DATA_DEVOLUCAO.is_(None))
-            .first()
-        )
-
-        if emprestimo_ativo:
-            emprestimo_exemplares_ns.abort(400, "Exemplar já está emprestado")
-
+        # Trava o exemplar, verifica se ele existe e se está em outro empréstimo
+        # ativo e insere na mesma transação
         try:
-            new_emprestimo_exemplar = EmprestimoExemplar(
-                cod_emprestimo=data["COD_EMPRESTIMO"],
-                tombo_exemplar=data["TOMBO_EXEMPLAR"],
-            )
-            db.session.add(new_emprestimo_exemplar)
-            db.session.commit()
-            return new_emprestimo_exemplar.to_dict(), 201
-        except Exception as e:
-            db.session.rollback()
-            emprestimo_exemplares_ns.abort(
-                500, f"Erro ao adicionar exemplar ao empréstimo: {str(e)}"
+            new_emprestimo_exemplar = EmprestimoExemplarService.emprestar_exemplar(
+                db.session, data["COD_EMPRESTIMO"], data["TOMBO_EXEMPLAR"]
             )
-        finally:
-            db.session.close()
+        except ExemplarEmprestado:
+            emprestimo_exemplares_ns.abort(400, "Exemplar já está emprestado")
+        except SQLAlchemyError as e:
+            emprestimo_exemplares_ns.abort(500, f"Erro ao emprestar exemplar: {str(e)}")
+        if new_emprestimo_exemplar is None:
+            emprestimo_exemplares_ns.abort(400, "Exemplar não encontrado")
+
+        return new_emprestimo_exemplar.to_dict(), 201
 
 
 @emprestimo_exemplares_ns.route("/<int:COD_EMPRESTIMO>/<int:TOMBO_EXEMPLAR>")
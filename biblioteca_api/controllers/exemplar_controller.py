@@ -1,29 +1,91 @@
 from flask import make_response, request
-from flask_restx import Namespace, Resource
+from flask_restx import Namespace, Resource, marshal
+from sqlalchemy.exc import SQLAlchemyError
 
 from .. import db
 from ..models.exemplar import Exemplar
 from ..models.livro import Livro
-from ..models.swagger_models import error_model, exemplar_model, message_model
+from ..models.swagger_models import (
+    error_model,
+    exemplar_com_livro_model,
+    exemplar_lote_model,
+    exemplar_model,
+    exemplares_lookup_model,
+    lookup_model,
+    message_model,
+)
+from ..services.concorrencia import VersaoDesatualizada
 from ..services.exemplar_service import ExemplarService
+from .conditional import (
+    conditional_response,
+    etag_headers,
+    if_match_versions,
+    version_etag,
+)
+from .include import INCLUDE_EXEMPLAR, exemplar_fields, parse_include
+from .lookup import body_ids, lookup_response, parse_ids
+from .pagination import next_cursor_headers, pagination_parser, parse_pagination
+from .patch import parse_patch
+from .rows import rows_to_dicts
+from .streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, ndjson_response, wants_ndjson
 
 exemplares_ns = Namespace(
     "Exemplares", description="Operações relacionadas a exemplares"
 )
 
+MAX_EXEMPLARES_LOTE = 500
+
+# Campos aceitos no PATCH e seus tipos
+CAMPOS_PATCH = {"COD_LIVRO": int}
+
 
 def error_response(msg, code):
     return make_response({"error": msg}, code)
 
 
+def buscar_exemplares(tombos):
+    """Resposta da busca em lote de exemplares"""
+    exemplares = ExemplarService.get_exemplares_dict(db.session, tombos)
+    if exemplares is None:
+        return error_response("Erro ao buscar exemplares", 500)
+    return lookup_response(tombos, exemplares, exemplares_lookup_model)
+
+
 @exemplares_ns.route("/")
 class ExemplaresList(Resource):
     @exemplares_ns.doc("listar_exemplares")
-    @exemplares_ns.marshal_list_with(exemplar_model)
+    @exemplares_ns.expect(pagination_parser)
+    @exemplares_ns.param("include", "Use include=livro para embutir o livro")
+    @exemplares_ns.param("ids", "Tombos separados por vírgula (busca em lote)")
+    @exemplares_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @exemplares_ns.response(200, "Lista de exemplares", [exemplar_com_livro_model])
+    @exemplares_ns.response(400, "Parâmetros inválidos", error_model)
     def get(self):
-        """Lista todos os exemplares"""
-        exemplares = ExemplarService.get_all_exemplares(db.session)
-        return [exemplar.to_dict() for exemplar in exemplares]
+        """Lista os exemplares, paginados por tombo (ou todos, em NDJSON)"""
+        tombos = parse_ids(exemplares_ns)
+        if tombos is not None:
+            return buscar_exemplares(tombos)
+
+        after, limit = parse_pagination(exemplares_ns)
+        include = parse_include(exemplares_ns, INCLUDE_EXEMPLAR)
+        if wants_ndjson():
+            return ndjson_response(
+                ExemplarService.stream_exemplares(db.session, after=after)
+            )
+
+        if not include:
+            rows = ExemplarService.get_exemplares_rows(
+                db.session, limit=limit, after=after
+            )
+            headers = next_cursor_headers(rows, limit, key=lambda r: r.TOMBO)
+            return rows_to_dicts(rows), 200, headers
+
+        exemplares = ExemplarService.get_all_exemplares(
+            db.session, limit=limit, after=after, include=include
+        )
+        headers = next_cursor_headers(exemplares, limit, key=lambda e: e.TOMBO)
+        data = [exemplar.to_dict(include) for exemplar in exemplares]
+        return marshal(data, exemplar_fields(include)), 200, headers
 
     @exemplares_ns.doc("criar_exemplar")
     @exemplares_ns.expect(exemplar_model)
@@ -44,39 +106,100 @@ class ExemplaresList(Resource):
         return new_exemplar.to_dict(), 201
 
 
+@exemplares_ns.route("/lookup")
+class ExemplaresLookup(Resource):
+    @exemplares_ns.doc("buscar_exemplares_em_lote")
+    @exemplares_ns.expect(lookup_model)
+    @exemplares_ns.response(200, "Exemplares na ordem pedida", exemplares_lookup_model)
+    @exemplares_ns.response(400, "Lista de ids inválida", error_model)
+    def post(self):
+        """Busca vários exemplares pelos tombos, na ordem pedida"""
+        return buscar_exemplares(body_ids(exemplares_ns))
+
+
 @exemplares_ns.route("/<int:TOMBO>")
 @exemplares_ns.param("TOMBO", "Número do tombo do exemplar")
 class ExemplarResource(Resource):
     @exemplares_ns.doc("obter_exemplar")
-    @exemplares_ns.response(200, "Exemplar encontrado", exemplar_model)
+    @exemplares_ns.param("include", "Use include=livro para embutir o livro")
+    @exemplares_ns.response(200, "Exemplar encontrado", exemplar_com_livro_model)
+    @exemplares_ns.response(304, "Exemplar não modificado desde o ETag informado")
     @exemplares_ns.response(404, "Exemplar não encontrado", error_model)
     def get(self, TOMBO):
-        """Obtém um exemplar pelo tombo"""
-        exemplar = ExemplarService.get_exemplar_by_tombo(db.session, TOMBO)
+        """Obtém um exemplar pelo tombo (aceita If-None-Match)"""
+        include = parse_include(exemplares_ns, INCLUDE_EXEMPLAR)
+        if include:
+            # Fora do cache, que guarda só o exemplar; o livro vem no mesmo SELECT
+            exemplar = ExemplarService.get_exemplar_by_tombo(
+                db.session, TOMBO, include
+            )
+            if exemplar is None:
+                return error_response("Exemplar não encontrado", 404)
+            return conditional_response(exemplar.to_dict(include))
+
+        exemplar = ExemplarService.get_exemplar_dict(db.session, TOMBO)
         if exemplar is None:
             return error_response("Exemplar não encontrado", 404)
-        return exemplar.to_dict(), 200
+        return conditional_response(exemplar, etag=version_etag(exemplar["VERSAO"]))
 
     @exemplares_ns.doc("atualizar_exemplar")
     @exemplares_ns.expect(exemplar_model)
     @exemplares_ns.response(200, "Exemplar atualizado", exemplar_model)
     @exemplares_ns.response(404, "Exemplar não encontrado", error_model)
     @exemplares_ns.response(400, "Livro não encontrado", error_model)
+    @exemplares_ns.response(
+        412, "Versão diferente da informada em If-Match", error_model
+    )
     @exemplares_ns.response(500, "Erro interno do servidor", error_model)
     def put(self, TOMBO):
-        """Atualiza um exemplar existente"""
+        """Atualiza um exemplar existente (aceita If-Match)"""
         data = request.get_json()
 
         if not data or "COD_LIVRO" not in data:
             return error_response("COD_LIVRO é obrigatório", 400)
 
-        updated_exemplar = ExemplarService.update_exemplar(
-            db.session, TOMBO, data["COD_LIVRO"]
-        )
+        try:
+            updated_exemplar = ExemplarService.update_exemplar(
+                db.session, TOMBO, data["COD_LIVRO"], versoes=if_match_versions()
+            )
+        except VersaoDesatualizada:
+            return error_response(
+                "O exemplar foi alterado desde a versão informada em If-Match", 412
+            )
         if not updated_exemplar:
             return error_response("Exemplar não encontrado", 404)
 
-        return updated_exemplar.to_dict(), 200
+        return updated_exemplar.to_dict(), 200, etag_headers(updated_exemplar.VERSAO)
+
+    @exemplares_ns.doc("atualizar_exemplar_parcial")
+    @exemplares_ns.expect(exemplar_model, validate=False)
+    @exemplares_ns.response(200, "Exemplar atualizado", exemplar_model)
+    @exemplares_ns.response(
+        400, "Campos inválidos ou livro não encontrado", error_model
+    )
+    @exemplares_ns.response(404, "Exemplar não encontrado", error_model)
+    @exemplares_ns.response(
+        412, "Versão diferente da informada em If-Match", error_model
+    )
+    @exemplares_ns.response(500, "Erro interno do servidor", error_model)
+    def patch(self, TOMBO):
+        """Altera só os campos enviados, num único UPDATE (aceita If-Match)"""
+        try:
+            valores = parse_patch(CAMPOS_PATCH, obrigatorios=("COD_LIVRO",))
+            exemplar = ExemplarService.patch_exemplar(
+                db.session, TOMBO, valores, versoes=if_match_versions()
+            )
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except VersaoDesatualizada:
+            return error_response(
+                "O exemplar foi alterado desde a versão informada em If-Match", 412
+            )
+        except SQLAlchemyError as e:
+            return error_response(f"Erro ao atualizar exemplar: {str(e)}", 500)
+        if exemplar is None:
+            return error_response("Exemplar não encontrado", 404)
+        return exemplar, 200, etag_headers(exemplar["VERSAO"])
 
     @exemplares_ns.doc("deletar_exemplar")
     @exemplares_ns.response(200, "Exemplar deletado", message_model)
@@ -106,3 +229,38 @@ class ExemplaresPorLivro(Resource):
 
         exemplares = ExemplarService.get_exemplares_by_livro(db.session, COD_LIVRO)
         return [exemplar.to_dict() for exemplar in exemplares], 200
+
+
+@exemplares_ns.route("/livro/<int:COD_LIVRO>/lote")
+@exemplares_ns.param("COD_LIVRO", "Código do livro")
+class ExemplaresLote(Resource):
+    @exemplares_ns.doc("criar_exemplares_lote")
+    @exemplares_ns.expect(exemplar_lote_model)
+    @exemplares_ns.response(201, "Exemplares criados", [exemplar_model])
+    @exemplares_ns.response(400, "Quantidade inválida", error_model)
+    @exemplares_ns.response(404, "Livro não encontrado", error_model)
+    @exemplares_ns.response(500, "Erro interno do servidor", error_model)
+    def post(self, COD_LIVRO):
+        """Cria vários exemplares de um livro numa única transação"""
+        data = request.get_json()
+
+        quantidade = data.get("QUANTIDADE") if data else None
+        if (
+            not isinstance(quantidade, int)
+            or isinstance(quantidade, bool)
+            or not 1 <= quantidade <= MAX_EXEMPLARES_LOTE
+        ):
+            return error_response(
+                f"QUANTIDADE deve ser um inteiro entre 1 e {MAX_EXEMPLARES_LOTE}", 400
+            )
+
+        try:
+            exemplares = ExemplarService.create_exemplares_lote(
+                db.session, COD_LIVRO, quantidade
+            )
+        except SQLAlchemyError:
+            return error_response("Erro ao criar exemplares", 500)
+        if exemplares is None:
+            return error_response("Livro não encontrado", 404)
+
+        return exemplares, 201
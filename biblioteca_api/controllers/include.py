@@ -0,0 +1,58 @@
+from flask import request
+from flask_restx import fields
+
+from ..models.swagger_models import (
+    aluno_response_model,
+    emprestimo_model,
+    exemplar_model,
+    livro_model,
+)
+from .sparse import project_model
+
+# Recursos relacionados embutidos na resposta: ?include=aluno,exemplares.livro.
+# Os relacionamentos pedidos são carregados com eager loading (selectinload /
+# joinedload), então o número de consultas não cresce com o tamanho da página.
+INCLUDE_EMPRESTIMO = ("aluno", "exemplares", "exemplares.livro")
+INCLUDE_EXEMPLAR = ("livro",)
+
+
+def parse_include(namespace, permitidos):
+    """
+    Lê ?include= e devolve os nomes pedidos. "a.b" implica "a"; nomes fora de
+    permitidos resultam em 400.
+    """
+    valor = request.args.get("include", "")
+    include = {nome.strip() for nome in valor.split(",") if nome.strip()}
+    invalidos = sorted(include - set(permitidos))
+    if invalidos:
+        namespace.abort(
+            400,
+            f"include inválido: {', '.join(invalidos)}. "
+            f"Valores aceitos: {', '.join(permitidos)}",
+        )
+    include |= {nome.split(".", 1)[0] for nome in include}
+    return frozenset(include)
+
+
+def exemplar_fields(include=()):
+    """Campos de marshal do exemplar com os relacionamentos incluídos"""
+    if "livro" not in include:
+        return exemplar_model
+    return dict(exemplar_model, livro=fields.Nested(livro_model))
+
+
+def emprestimo_fields(include=(), fields_pedidos=None):
+    """
+    Campos de marshal do empréstimo com os relacionamentos incluídos, restritos
+    aos pedidos em ?fields= (os relacionamentos vêm sempre que incluídos)
+    """
+    modelo = project_model(emprestimo_model, fields_pedidos)
+    if not include:
+        return modelo
+    campos = dict(modelo)
+    if "aluno" in include:
+        campos["aluno"] = fields.Nested(aluno_response_model)
+    if "exemplares" in include:
+        exemplar = exemplar_fields(["livro"] if "exemplares.livro" in include else [])
+        campos["exemplares"] = fields.List(fields.Nested(exemplar))
+    return campos
@@ -1,22 +1,102 @@
+import io
+
 from flask import request
-from flask_restx import Namespace, Resource
+from flask_restx import Namespace, Resource, inputs
+from sqlalchemy.exc import SQLAlchemyError
 
 from .. import db
 from ..models.livro import Livro
-from ..models.swagger_models import error_model, livro_model, message_model
+from ..models.swagger_models import (
+    error_model,
+    livro_model,
+    livros_importados_model,
+    livros_lookup_model,
+    lookup_model,
+    message_model,
+)
+from ..services.concorrencia import VersaoDesatualizada
+from ..services.livro_import import ler_livros_csv, ler_livros_ndjson
 from ..services.livro_service import LivroService
+from .conditional import (
+    conditional_response,
+    etag_headers,
+    if_match_versions,
+    version_etag,
+)
+from .lookup import body_ids, lookup_response, parse_ids
+from .pagination import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    next_cursor_headers,
+    pagination_parser,
+    parse_pagination,
+)
+from .patch import parse_patch
+from .rows import rows_to_dicts
+from .sparse import parse_fields, project_model
+from .streaming import JSON_MIMETYPE, NDJSON_MIMETYPE, ndjson_response, wants_ndjson
+
+CSV_MIMETYPE = "text/csv"
+
+# Campos aceitos no PATCH e seus tipos
+CAMPOS_PATCH = {"TITULO": str, "AUTOR": str, "EDITORA": str, "ANO": int}
+
+FIELDS_DOC = "Campos da resposta, separados por vírgula (ex.: COD,TITULO)"
 
 livros_ns = Namespace("Livros", description="Operações relacionadas a livros")
 
+busca_parser = livros_ns.parser()
+busca_parser.add_argument("TITULO", type=str, location="args", default="")
+busca_parser.add_argument("AUTOR", type=str, location="args", default="")
+busca_parser.add_argument(
+    "limit",
+    type=inputs.int_range(1, MAX_LIMIT),
+    location="args",
+    default=DEFAULT_LIMIT,
+    help=f"Quantidade máxima de resultados (1-{MAX_LIMIT})",
+)
+busca_parser.add_argument(
+    "offset",
+    type=inputs.natural,
+    location="args",
+    default=0,
+    help="Quantidade de resultados a pular, na ordem de relevância",
+)
+
+
+def buscar_livros(cods):
+    """Resposta da busca em lote de livros"""
+    livros = LivroService.get_livros_dict(db.session, cods)
+    if livros is None:
+        livros_ns.abort(500, "Erro ao buscar livros")
+    return lookup_response(cods, livros, livros_lookup_model)
+
 
 @livros_ns.route("/")
 class LivrosList(Resource):
     @livros_ns.doc("listar_livros")
-    @livros_ns.marshal_list_with(livro_model)
+    @livros_ns.expect(pagination_parser)
+    @livros_ns.param("ids", "Códigos separados por vírgula (busca em lote)")
+    @livros_ns.param("fields", FIELDS_DOC + " (ignorado em NDJSON)")
+    @livros_ns.produces([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    @livros_ns.response(200, "Lista de livros", [livro_model])
+    @livros_ns.response(400, "Parâmetros inválidos", error_model)
     def get(self):
-        """Lista todos os livros"""
-        livros = LivroService.get_all_livros(db.session)
-        return [livro.to_dict() for livro in livros]
+        """Lista os livros, paginados por código (ou todos, em NDJSON)"""
+        cods = parse_ids(livros_ns)
+        if cods is not None:
+            return buscar_livros(cods)
+
+        after, limit = parse_pagination(livros_ns)
+        campos = parse_fields(livros_ns, livro_model, "COD")
+        if wants_ndjson():
+            return ndjson_response(LivroService.stream_livros(db.session, after=after))
+
+        rows = LivroService.get_livros_rows(
+            db.session, limit=limit, after=after, campos=campos
+        )
+        headers = next_cursor_headers(rows, limit, key=lambda r: r.COD)
+        return rows_to_dicts(rows), 200, headers
 
     @livros_ns.doc("criar_livro")
     @livros_ns.expect(livro_model)
@@ -41,26 +121,82 @@ class LivrosList(Resource):
             livros_ns.abort(500, f"Erro ao criar livro: {str(e)}")
 
 
+@livros_ns.route("/lookup")
+class LivrosLookup(Resource):
+    @livros_ns.doc("buscar_livros_em_lote")
+    @livros_ns.expect(lookup_model)
+    @livros_ns.response(200, "Livros na ordem pedida", livros_lookup_model)
+    @livros_ns.response(400, "Lista de ids inválida", error_model)
+    def post(self):
+        """Busca vários livros pelos códigos, na ordem pedida"""
+        return buscar_livros(body_ids(livros_ns))
+
+
+@livros_ns.route("/importar")
+class LivrosImportacao(Resource):
+    @livros_ns.doc(
+        "importar_livros",
+        consumes=[CSV_MIMETYPE, NDJSON_MIMETYPE],
+        description="Importa livros em massa a partir de um CSV com cabeçalho "
+        "TITULO,AUTOR,EDITORA,ANO ou de um NDJSON (um livro por linha).",
+    )
+    @livros_ns.marshal_with(livros_importados_model, code=201)
+    @livros_ns.response(400, "Arquivo inválido", error_model)
+    @livros_ns.response(415, "Formato não suportado", error_model)
+    @livros_ns.response(500, "Erro interno do servidor", error_model)
+    def post(self):
+        """Importa livros em massa (CSV ou NDJSON)"""
+        leitores = {CSV_MIMETYPE: ler_livros_csv, NDJSON_MIMETYPE: ler_livros_ndjson}
+        leitor = leitores.get(request.mimetype)
+        if leitor is None:
+            livros_ns.abort(415, "Envie o arquivo como text/csv ou application/x-ndjson")
+
+        arquivo = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+        try:
+            cods = LivroService.import_livros(db.session, leitor(arquivo))
+        except ValueError as e:
+            livros_ns.abort(400, str(e))
+        if cods is None:
+            livros_ns.abort(500, "Erro ao importar livros")
+        return {"total": len(cods), "CODS": cods}, 201
+
+
 @livros_ns.route("/<int:COD>")
 @livros_ns.param("COD", "Código do livro")
 class LivroResource(Resource):
     @livros_ns.doc("obter_livro")
-    @livros_ns.marshal_with(livro_model)
+    @livros_ns.param("fields", FIELDS_DOC)
+    @livros_ns.response(200, "Livro encontrado", livro_model)
+    @livros_ns.response(304, "Livro não modificado desde o ETag informado")
     @livros_ns.response(404, "Livro não encontrado", error_model)
     def get(self, COD):
-        """Obtém um livro pelo código"""
-        livro = LivroService.get_livro_by_id(db.session, COD)
+        """Obtém um livro pelo código (aceita If-None-Match)"""
+        campos = parse_fields(livros_ns, livro_model, "COD")
+        if campos:
+            # Fora do cache, que guarda o livro inteiro; só as colunas pedidas são
+            # lidas, e o ETag é o hash do conteúdo
+            livro = LivroService.get_livro_by_id(db.session, COD, campos)
+            if livro is None:
+                livros_ns.abort(404, "Livro não encontrado")
+            return conditional_response(
+                livro.to_dict(campos), project_model(livro_model, campos)
+            )
+
+        livro = LivroService.get_livro_dict(db.session, COD)
         if livro is None:
             livros_ns.abort(404, "Livro não encontrado")
-        return livro.to_dict()
+        return conditional_response(
+            livro, livro_model, etag=version_etag(livro["VERSAO"])
+        )
 
     @livros_ns.doc("atualizar_livro")
     @livros_ns.expect(livro_model)
     @livros_ns.marshal_with(livro_model)
     @livros_ns.response(404, "Livro não encontrado", error_model)
+    @livros_ns.response(412, "Versão diferente da informada em If-Match", error_model)
     @livros_ns.response(500, "Erro interno do servidor", error_model)
     def put(self, COD):
-        """Atualiza um livro existente"""
+        """Atualiza um livro existente (aceita If-Match)"""
         data = request.get_json()
         try:
             updated_livro = LivroService.update_livro(
@@ -70,16 +206,49 @@ class LivroResource(Resource):
                 AUTOR=data.get("AUTOR"),
                 EDITORA=data.get("EDITORA"),
                 ANO=data.get("ANO"),
+                versoes=if_match_versions(),
             )
             if updated_livro:
-                return updated_livro.to_dict()
+                return updated_livro.to_dict(), 200, etag_headers(updated_livro.VERSAO)
             else:
                 livros_ns.abort(404, "Livro não encontrado")
+        except VersaoDesatualizada:
+            livros_ns.abort(
+                412, "O livro foi alterado desde a versão informada em If-Match"
+            )
         except Exception as e:
             if hasattr(e, "code") and e.code == 404:
                 raise
             livros_ns.abort(500, f"Erro ao atualizar livro: {str(e)}")
 
+    @livros_ns.doc("atualizar_livro_parcial")
+    @livros_ns.expect(livro_model, validate=False)
+    @livros_ns.marshal_with(livro_model)
+    @livros_ns.response(400, "Campos inválidos", error_model)
+    @livros_ns.response(404, "Livro não encontrado", error_model)
+    @livros_ns.response(412, "Versão diferente da informada em If-Match", error_model)
+    @livros_ns.response(500, "Erro interno do servidor", error_model)
+    def patch(self, COD):
+        """Altera só os campos enviados, num único UPDATE (aceita If-Match)"""
+        try:
+            valores = parse_patch(CAMPOS_PATCH, obrigatorios=("TITULO",))
+        except ValueError as e:
+            livros_ns.abort(400, str(e))
+
+        try:
+            livro = LivroService.patch_livro(
+                db.session, COD, valores, versoes=if_match_versions()
+            )
+        except VersaoDesatualizada:
+            livros_ns.abort(
+                412, "O livro foi alterado desde a versão informada em If-Match"
+            )
+        except SQLAlchemyError as e:
+            livros_ns.abort(500, f"Erro ao atualizar livro: {str(e)}")
+        if livro is None:
+            livros_ns.abort(404, "Livro não encontrado")
+        return livro, 200, etag_headers(livro["VERSAO"])
+
     @livros_ns.doc("deletar_livro")
     @livros_ns.marshal_with(message_model)
     @livros_ns.response(404, "Livro não encontrado", error_model)
@@ -101,15 +270,19 @@ class LivroResource(Resource):
 @livros_ns.route("/buscar")
 class LivroBusca(Resource):
     @livros_ns.doc("buscar_livros")
+    @livros_ns.expect(busca_parser)
     @livros_ns.marshal_list_with(livro_model)
     def get(self):
-        """Busca livros por título ou autor"""
-        TITULO = request.args.get("TITULO", "")
-        AUTOR = request.args.get("AUTOR", "")
+        """Busca livros por título ou autor, ordenados por relevância"""
+        args = busca_parser.parse_args()
+        TITULO = args["TITULO"]
+        AUTOR = args["AUTOR"]
 
         livros = LivroService.search_livros(
             db=db.session,
             TITULO=TITULO if TITULO else None,
             AUTOR=AUTOR if AUTOR else None,
+            limit=args["limit"],
+            offset=args["offset"],
         )
         return [livro.to_dict() for livro in livros]
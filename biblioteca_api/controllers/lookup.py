@@ -0,0 +1,56 @@
+from flask import request
+from flask_restx import marshal
+
+from .pagination import MAX_LIMIT
+
+# Busca em lote (multi-get): GET /<recurso>/?ids=1,2,3 ou POST /<recurso>/lookup
+# com {"ids": [...]}. A resposta traz os itens na ordem pedida, com null no lugar
+# de cada chave inexistente, e a lista dessas chaves em nao_encontrados.
+MAX_IDS = MAX_LIMIT
+
+
+def _validar_ids(namespace, ids):
+    if not ids:
+        namespace.abort(400, "Informe ao menos um id")
+    if len(ids) > MAX_IDS:
+        namespace.abort(400, f"Informe no máximo {MAX_IDS} ids por busca")
+    return ids
+
+
+def parse_ids(namespace):
+    """Lê ?ids=1,2,3 da query string; None se o parâmetro não foi enviado"""
+    valor = request.args.get("ids")
+    if valor is None:
+        return None
+    try:
+        ids = [int(parte) for parte in valor.split(",")]
+    except ValueError:
+        namespace.abort(400, "O parâmetro ids deve ser uma lista de inteiros")
+    return _validar_ids(namespace, ids)
+
+
+def body_ids(namespace):
+    """Lê {"ids": [...]} do corpo de um POST /lookup"""
+    data = request.get_json(silent=True)
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if not isinstance(ids, list) or any(
+        isinstance(i, bool) or not isinstance(i, int) for i in ids
+    ):
+        namespace.abort(400, "ids deve ser uma lista de inteiros")
+    return _validar_ids(namespace, ids)
+
+
+def lookup_response(ids, encontrados, model):
+    """
+    Monta a resposta da busca em lote a partir de {chave: dict} dos registros
+    existentes. Chaves repetidas repetem o item, na posição em que aparecem.
+    """
+    return marshal(
+        {
+            "itens": [encontrados.get(chave) for chave in ids],
+            "nao_encontrados": list(
+                dict.fromkeys(chave for chave in ids if chave not in encontrados)
+            ),
+        },
+        model,
+    )
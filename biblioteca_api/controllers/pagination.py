@@ -0,0 +1,73 @@
+from urllib.parse import urlencode
+
+from flask import request
+from flask_restx import reqparse
+
+# Paginação por cursor (keyset): o cliente envia ?after=<última chave recebida>
+# e recebe o próximo cursor no cabeçalho X-Next-Cursor, de modo que a página N
+# custa o mesmo que a primeira (sem OFFSET).
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument(
+    "after", type=int, location="args", help="Retorna registros após esta chave"
+)
+pagination_parser.add_argument(
+    "limit",
+    type=int,
+    location="args",
+    default=DEFAULT_LIMIT,
+    help=f"Quantidade máxima de registros (1-{MAX_LIMIT})",
+)
+
+composite_pagination_parser = pagination_parser.copy()
+composite_pagination_parser.replace_argument(
+    "after",
+    type=str,
+    location="args",
+    help="Retorna registros após esta chave composta, no formato "
+    "COD_EMPRESTIMO,TOMBO_EXEMPLAR",
+)
+
+
+def parse_pagination(namespace, composite=False):
+    """Lê e valida os parâmetros after/limit da query string"""
+    parser = composite_pagination_parser if composite else pagination_parser
+    args = parser.parse_args()
+
+    limit = args["limit"]
+    if limit is None or not 1 <= limit <= MAX_LIMIT:
+        namespace.abort(400, f"O parâmetro limit deve estar entre 1 e {MAX_LIMIT}")
+
+    after = args["after"]
+    if composite and after is not None:
+        try:
+            cod_emprestimo, tombo_exemplar = (int(p) for p in after.split(","))
+        except ValueError:
+            namespace.abort(
+                400, "O parâmetro after deve estar no formato COD_EMPRESTIMO,TOMBO_EXEMPLAR"
+            )
+        after = (cod_emprestimo, tombo_exemplar)
+
+    return after, limit
+
+
+def next_cursor_headers(items, limit, key):
+    """
+    Monta os cabeçalhos com o cursor da próxima página.
+
+    Uma página cheia indica que pode haver mais registros; nesse caso o cursor é a
+    chave do último item, e a URL da próxima página (com os demais parâmetros da
+    requisição, como include) vai no cabeçalho Link.
+    """
+    if len(items) < limit:
+        return {}
+
+    cursor = key(items[-1])
+    if isinstance(cursor, tuple):
+        cursor = ",".join(str(part) for part in cursor)
+
+    args = dict(request.args.items(), after=cursor, limit=limit)
+    next_url = f"{request.base_url}?{urlencode(args, safe=',')}"
+    return {"X-Next-Cursor": str(cursor), "Link": f'<{next_url}>; rel="next"'}
@@ -0,0 +1,48 @@
+from datetime import date
+
+from flask import request
+
+# Atualização parcial (PATCH): o corpo traz só os campos que mudam, e apenas eles
+# são validados e gravados. Cada recurso declara os campos editáveis e o tipo de
+# cada um; campos não editáveis (chave, VERSAO) ou desconhecidos são rejeitados.
+
+
+def _converter(campo, valor, tipo):
+    if tipo is date:
+        if isinstance(valor, str):
+            try:
+                return date.fromisoformat(valor)
+            except ValueError:
+                pass
+        raise ValueError(f"{campo} deve ser uma data no formato AAAA-MM-DD")
+    if tipo is int and (isinstance(valor, bool) or not isinstance(valor, int)):
+        raise ValueError(f"{campo} deve ser um número inteiro")
+    if tipo is str and not isinstance(valor, str):
+        raise ValueError(f"{campo} deve ser um texto")
+    return valor
+
+
+def parse_patch(campos, obrigatorios=()):
+    """
+    Lê o corpo de um PATCH e devolve {coluna: valor} já convertido.
+
+    campos mapeia cada campo editável para int, str ou date; os de obrigatorios
+    não aceitam null. Lança ValueError com a mensagem para o cliente.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        raise ValueError("Envie um objeto JSON com os campos a alterar")
+
+    invalidos = sorted(set(data) - set(campos))
+    if invalidos:
+        raise ValueError(f"Campos não editáveis: {', '.join(invalidos)}")
+
+    valores = {}
+    for campo, valor in data.items():
+        if valor is None:
+            if campo in obrigatorios:
+                raise ValueError(f"{campo} não pode ser nulo")
+            valores[campo] = None
+        else:
+            valores[campo] = _converter(campo, valor, campos[campo])
+    return valores
@@ -0,0 +1,28 @@
+# Listagens sem include respondem a partir de linhas do Core (Row: tupla nomeada
+# com __slots__, sem identity map nem instrumentação do ORM). As colunas
+# selecionadas já são os campos do modelo de resposta, então cada linha vira o
+# dict final direto, sem to_dict() seguido de marshal. Datas são escritas pelo
+# serializador JSON; só as colunas que o modelo muda de tipo são convertidas.
+
+
+def convert_values(item, converters):
+    """Aplica converters (coluna -> função) aos valores não nulos de item"""
+    for coluna, converter in converters.items():
+        valor = item.get(coluna)
+        if valor is not None:
+            item[coluna] = converter(valor)
+    return item
+
+
+def rows_to_dicts(rows, converters=None):
+    """
+    Linhas como dicts prontos para JSON.
+
+    converters mapeia coluna -> função aplicada aos valores não nulos, para as
+    colunas em que o modelo muda o tipo do valor (ex.: str para fields.String).
+    """
+    data = [row._asdict() for row in rows]
+    if converters:
+        for item in data:
+            convert_values(item, converters)
+    return data
@@ -0,0 +1,35 @@
+from flask import request
+
+# Sparse fieldsets: ?fields=COD,TITULO limita a resposta aos campos pedidos. Os
+# nomes são validados contra o modelo Swagger do recurso e viram as colunas do
+# SELECT (Core ou load_only), então os demais campos não são lidos do banco nem
+# serializados. A chave primária vem sempre, para identificar o registro e servir
+# de cursor na paginação.
+
+
+def parse_fields(namespace, model, chave):
+    """
+    Lê ?fields= e devolve os campos pedidos (mais a chave), na ordem do modelo.
+    None se o parâmetro não foi enviado; nomes fora do modelo resultam em 400.
+    """
+    valor = request.args.get("fields")
+    if valor is None:
+        return None
+    pedidos = {campo.strip() for campo in valor.split(",") if campo.strip()}
+    if not pedidos:
+        namespace.abort(400, "Informe ao menos um campo em fields")
+    invalidos = sorted(pedidos - set(model))
+    if invalidos:
+        namespace.abort(
+            400,
+            f"fields inválido: {', '.join(invalidos)}. "
+            f"Campos aceitos: {', '.join(model)}",
+        )
+    return tuple(campo for campo in model if campo in pedidos or campo == chave)
+
+
+def project_model(model, campos):
+    """Campos de marshal do modelo restritos aos pedidos em ?fields="""
+    if not campos:
+        return model
+    return {campo: field for campo, field in model.items() if campo in campos}
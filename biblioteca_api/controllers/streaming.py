@@ -0,0 +1,29 @@
+from flask import Response, request, stream_with_context
+
+from ..serializacao import JSON_MIMETYPE, serializar
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_ndjson():
+    """Indica se o cliente pediu a listagem em NDJSON pelo cabeçalho Accept"""
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def ndjson_response(rows):
+    """
+    Escreve cada registro como uma linha JSON à medida que é lido do banco.
+
+    A resposta é enviada em chunks, então a memória do worker não cresce com o
+    tamanho da tabela. Cada linha passa pelo mesmo serializador das respostas
+    JSON (JSON_BACKEND), com datas como AAAA-MM-DD. Um erro do banco no meio da
+    leitura é propagado: o servidor interrompe a resposta sem o chunk final, e o
+    cliente não confunde um corpo truncado com uma exportação completa.
+    """
+
+    def generate():
+        for row in rows:
+            yield serializar(row) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,190 @@
+"""
+Consultor de índices: lê as estatísticas do PostgreSQL em execução e aponta tabelas
+lidas por varredura sequencial e índices candidatos para as consultas que a API
+realmente executa.
+
+Usa pg_stat_user_tables (sempre disponível) e pg_stat_statements (PostgreSQL 13+,
+exige shared_preload_libraries=pg_stat_statements e CREATE EXTENSION
+pg_stat_statements). Só lê estatísticas: nunca cria índices.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import text
+
+from . import db
+
+# "TABELA"."COLUNA" (ou TABELA.coluna) seguido ou precedido de um operador de filtro
+_COLUNA = r'"?(\w+)"?\."?(\w+)"?'
+_OPERADOR = r"(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bIS\b|\bLIKE\b|\bILIKE\b|\bBETWEEN\b)"
+_PREDICADO_ESQUERDA = re.compile(_COLUNA + r"\s*" + _OPERADOR, re.IGNORECASE)
+_PREDICADO_DIREITA = re.compile(r"(?:=|<>|<=|>=|<|>)\s*" + _COLUNA)
+
+SQL_SEQ_SCANS = """
+    SELECT relname AS tabela, seq_scan, seq_tup_read,
+           COALESCE(idx_scan, 0) AS idx_scan, n_live_tup
+    FROM pg_stat_user_tables
+    WHERE schemaname = current_schema()
+      AND n_live_tup >= :min_linhas
+      AND seq_scan > COALESCE(idx_scan, 0)
+    ORDER BY seq_tup_read DESC
+"""
+
+SQL_FKS_SEM_INDICE = """
+    SELECT t.relname AS tabela, a.attname AS coluna, c.conname AS restricao
+    FROM pg_constraint c
+    JOIN pg_class t ON t.oid = c.conrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+    WHERE c.contype = 'f'
+      AND n.nspname = current_schema()
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_index i
+          WHERE i.indrelid = c.conrelid AND i.indkey[0] = c.conkey[1]
+      )
+    ORDER BY t.relname, a.attname
+"""
+
+SQL_COLUNAS_INDEXADAS = """
+    SELECT t.relname AS tabela, a.attname AS coluna
+    FROM pg_index i
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0]
+    WHERE n.nspname = current_schema()
+"""
+
+SQL_TEM_PG_STAT_STATEMENTS = (
+    "SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'"
+)
+
+SQL_CONSULTAS = """
+    SELECT query, calls, total_exec_time, mean_exec_time, rows
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND query ~* '^\\s*(SELECT|UPDATE|DELETE)'
+    ORDER BY total_exec_time DESC
+    LIMIT :limite
+"""
+
+
+def colunas_filtradas(sql: str, tabelas: Iterable[str]) -> Set[Tuple[str, str]]:
+    """
+    Pares (tabela, coluna) usados em filtros e junções de uma consulta.
+
+    Reconhece o SQL gerado pelo SQLAlchemy ("TABELA"."COLUNA" = $1); colunas da
+    lista do SELECT ou do ORDER BY não são seguidas de operador e ficam de fora.
+    """
+    conhecidas = set(tabelas)
+    pares = set()
+    for expressao in (_PREDICADO_ESQUERDA, _PREDICADO_DIREITA):
+        for tabela, coluna in expressao.findall(sql):
+            if tabela in conhecidas:
+                pares.add((tabela, coluna))
+    return pares
+
+
+def sugerir_indices(
+    consultas: Iterable[dict],
+    indexadas: Set[Tuple[str, str]],
+    tabelas: Iterable[str],
+) -> List[dict]:
+    """
+    Índices candidatos: colunas filtradas que não são a primeira coluna de nenhum
+    índice, ordenadas pelo tempo total das consultas que as usam.
+    """
+    tabelas = list(tabelas)
+    candidatos = defaultdict(lambda: {"chamadas": 0, "tempo_total_ms": 0.0})
+    for consulta in consultas:
+        for par in colunas_filtradas(consulta["query"], tabelas):
+            if par in indexadas:
+                continue
+            candidatos[par]["chamadas"] += consulta["calls"]
+            candidatos[par]["tempo_total_ms"] += consulta["total_exec_time"]
+
+    sugestoes = []
+    for (tabela, coluna), uso in candidatos.items():
+        nome = f"ix_{tabela}_{coluna}".lower()
+        sugestoes.append(
+            {
+                "tabela": tabela,
+                "coluna": coluna,
+                "chamadas": uso["chamadas"],
+                "tempo_total_ms": round(uso["tempo_total_ms"], 1),
+                "ddl": (
+                    f'CREATE INDEX CONCURRENTLY "{nome}" ON "{tabela}" ("{coluna}")'
+                ),
+            }
+        )
+    sugestoes.sort(key=lambda s: s["tempo_total_ms"], reverse=True)
+    return sugestoes
+
+
+def analisar(conexao, min_linhas: int = 1000, limite: int = 50) -> Dict:
+    """Relatório com varreduras sequenciais, FKs sem índice e índices candidatos"""
+    from . import models  # noqa: F401 - registra todos os modelos no metadata
+
+    tabelas = list(db.metadata.tables)
+    relatorio = {
+        "seq_scans": [
+            dict(linha._mapping)
+            for linha in conexao.execute(
+                text(SQL_SEQ_SCANS), {"min_linhas": min_linhas}
+            )
+        ],
+        "fks_sem_indice": [
+            dict(linha._mapping) for linha in conexao.execute(text(SQL_FKS_SEM_INDICE))
+        ],
+        "pg_stat_statements": False,
+        "sugestoes": [],
+    }
+
+    if conexao.execute(text(SQL_TEM_PG_STAT_STATEMENTS)).first() is None:
+        return relatorio
+
+    relatorio["pg_stat_statements"] = True
+    indexadas = {
+        (linha.tabela, linha.coluna)
+        for linha in conexao.execute(text(SQL_COLUNAS_INDEXADAS))
+    }
+    consultas = [
+        dict(linha._mapping)
+        for linha in conexao.execute(text(SQL_CONSULTAS), {"limite": limite})
+    ]
+    relatorio["sugestoes"] = sugerir_indices(consultas, indexadas, tabelas)
+    return relatorio
+
+
+def formatar(relatorio: Dict) -> str:
+    linhas = ["Tabelas com mais varreduras sequenciais do que por índice:"]
+    for t in relatorio["seq_scans"]:
+        linhas.append(
+            f"  {t['tabela']}: {t['seq_scan']} seq scans ({t['seq_tup_read']} linhas "
+            f"lidas), {t['idx_scan']} idx scans, {t['n_live_tup']} linhas"
+        )
+    if not relatorio["seq_scans"]:
+        linhas.append("  nenhuma")
+
+    linhas.append("Chaves estrangeiras sem índice:")
+    for fk in relatorio["fks_sem_indice"]:
+        linhas.append(f"  {fk['tabela']}.{fk['coluna']} ({fk['restricao']})")
+    if not relatorio["fks_sem_indice"]:
+        linhas.append("  nenhuma")
+
+    linhas.append("Índices candidatos (pg_stat_statements):")
+    if not relatorio["pg_stat_statements"]:
+        linhas.append(
+            "  pg_stat_statements indisponível: inicie o PostgreSQL com "
+            "shared_preload_libraries=pg_stat_statements e execute "
+            "CREATE EXTENSION pg_stat_statements"
+        )
+    for s in relatorio["sugestoes"]:
+        linhas.append(
+            f"  {s['tabela']}.{s['coluna']}: {s['chamadas']} chamadas, "
+            f"{s['tempo_total_ms']} ms\n    {s['ddl']};"
+        )
+    if relatorio["pg_stat_statements"] and not relatorio["sugestoes"]:
+        linhas.append("  nenhum")
+    return "\n".join(linhas)
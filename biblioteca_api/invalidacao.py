@@ -0,0 +1,231 @@
+"""
+Barramento de invalidação dos caches entre processos (workers).
+
+Toda escrita em LIVRO, EXEMPLAR, ALUNO ou EMPRESTIMO feita pelo ORM é publicada
+automaticamente (hook after_flush da sessão); escritas em massa via Core chamam
+publicar() explicitamente. O barramento depende do banco:
+
+- PostgreSQL: a mensagem é enviada com pg_notify dentro da própria transação, então
+  só chega aos outros workers se ela for confirmada. Cada worker mantém uma thread
+  (OuvinteInvalidacao) com LISTEN numa conexão psycopg2 própria, fora do pool.
+- Outros bancos (SQLite, testes): BarramentoMemoria entrega as mensagens aos
+  assinantes do próprio processo no commit.
+
+Em ambos os casos o cache local é invalidado logo após o commit.
+"""
+
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+from .cache import cache_existente, caches_ligados
+
+logger = logging.getLogger(__name__)
+
+CANAL = "biblioteca_invalidacao"
+
+# Tabelas publicadas no barramento -> nome da entidade (e do cache)
+ENTIDADES = {
+    "LIVRO": "livro",
+    "EXEMPLAR": "exemplar",
+    "ALUNO": "aluno",
+    "EMPRESTIMO": "emprestimo",
+}
+
+# O payload do NOTIFY é limitado a 8000 bytes
+_CHAVES_POR_MENSAGEM = 500
+_PENDENTES = "invalidacoes_pendentes"
+
+
+def codificar(entidade: str, chaves: List[int]) -> List[str]:
+    """Mensagens "entidade:chave1,chave2,..." com no máximo 500 chaves cada"""
+    return [
+        f"{entidade}:"
+        + ",".join(str(chave) for chave in chaves[i : i + _CHAVES_POR_MENSAGEM])
+        for i in range(0, len(chaves), _CHAVES_POR_MENSAGEM)
+    ]
+
+
+def decodificar(mensagem: str) -> Tuple[str, List[int]]:
+    entidade, _, chaves = mensagem.partition(":")
+    return entidade, [int(chave) for chave in chaves.split(",") if chave]
+
+
+def evictar_local(entidade: str, chaves: Iterable[int]):
+    """Remove as chaves do cache deste processo, se a entidade tiver cache"""
+    cache = cache_existente(entidade)
+    if cache is None:
+        return
+    for chave in chaves:
+        cache.invalidate(chave)
+
+
+class BarramentoMemoria:
+    """Substituto do LISTEN/NOTIFY para bancos sem ele: entrega no próprio processo"""
+
+    def __init__(self):
+        self._assinantes = []
+        self._lock = threading.Lock()
+
+    def assinar(self, callback):
+        with self._lock:
+            self._assinantes.append(callback)
+
+    def cancelar(self, callback):
+        with self._lock:
+            self._assinantes.remove(callback)
+
+    def entregar(self, entidade: str, chaves: List[int]):
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for callback in assinantes:
+            callback(entidade, chaves)
+
+
+barramento_memoria = BarramentoMemoria()
+barramento_memoria.assinar(evictar_local)
+
+
+def _usa_notify(session: Session) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def publicar(session: Session, entidade: str, chaves: Iterable[int]):
+    """
+    Publica a alteração das chaves da entidade na transação atual da sessão.
+
+    Nada é entregue antes do commit; num rollback as mensagens são descartadas.
+    """
+    chaves = list(chaves)
+    if not chaves:
+        return
+    session.info.setdefault(_PENDENTES, []).append((entidade, chaves))
+    if _usa_notify(session):
+        conexao = session.connection()
+        for mensagem in codificar(entidade, chaves):
+            conexao.execute(sql_select(func.pg_notify(CANAL, mensagem)))
+
+
+@event.listens_for(Session, "after_flush")
+def _publicar_alteracoes(session, flush_context):
+    # Registros novos não têm entradas em cache: só alterados e removidos
+    alterados = defaultdict(list)
+    for instancia in list(session.dirty) + list(session.deleted):
+        entidade = ENTIDADES.get(getattr(instancia, "__tablename__", None))
+        identidade = inspect(instancia).identity
+        if entidade and identidade:
+            alterados[entidade].append(identidade[0])
+    for entidade, chaves in alterados.items():
+        publicar(session, entidade, chaves)
+
+
+@event.listens_for(Session, "after_commit")
+def _entregar_publicacoes(session):
+    pendentes = session.info.pop(_PENDENTES, None)
+    if not pendentes:
+        return
+    notify = _usa_notify(session)
+    for entidade, chaves in pendentes:
+        if notify:
+            # Os demais workers recebem pelo LISTEN; este não espera pela thread
+            evictar_local(entidade, chaves)
+        else:
+            barramento_memoria.entregar(entidade, chaves)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_publicacoes(session):
+    session.info.pop(_PENDENTES, None)
+
+
+class OuvinteInvalidacao(threading.Thread):
+    """
+    Thread com LISTEN no canal de invalidação, numa conexão psycopg2 dedicada.
+
+    Se a conexão cair, reconecta com espera crescente e esvazia os caches locais,
+    já que mensagens podem ter sido perdidas enquanto estava desconectada.
+    """
+
+    def __init__(self, engine, intervalo=5.0):
+        super().__init__(name="ouvinte-invalidacao", daemon=True)
+        self._engine = engine
+        self._intervalo = intervalo
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+
+    def _conectar(self):
+        dialect = self._engine.dialect
+        cargs, cparams = dialect.create_connect_args(self._engine.url)
+        conexao = dialect.connect(*cargs, **cparams)
+        conexao.autocommit = True
+        with conexao.cursor() as cursor:
+            cursor.execute(f"LISTEN {CANAL}")
+        return conexao
+
+    def _escutar(self, conexao):
+        while not self._parar.is_set():
+            prontos, _, _ = select.select([conexao], [], [], self._intervalo)
+            if not prontos:
+                continue
+            conexao.poll()
+            while conexao.notifies:
+                notificacao = conexao.notifies.pop(0)
+                evictar_local(*decodificar(notificacao.payload))
+
+    def run(self):
+        erro_dbapi = self._engine.dialect.loaded_dbapi.Error
+        espera = 1
+        while not self._parar.is_set():
+            try:
+                conexao = self._conectar()
+            except erro_dbapi as e:
+                logger.warning(f"Ouvinte de invalidação sem conexão: {e}")
+                self._parar.wait(espera)
+                espera = min(espera * 2, 30)
+                continue
+
+            espera = 1
+            for cache in caches_ligados():
+                cache.esvaziar()
+            try:
+                self._escutar(conexao)
+            except erro_dbapi as e:
+                logger.warning(f"Ouvinte de invalidação desconectado: {e}")
+            finally:
+                conexao.close()
+
+
+_ouvinte = None
+_ouvinte_pid = None
+_ouvinte_lock = threading.Lock()
+
+
+def garantir_ouvinte(engine):
+    """
+    Inicia o ouvinte deste processo, se necessário.
+
+    Só há ouvinte no PostgreSQL e com algum cache ligado. Threads não sobrevivem
+    ao fork, então a verificação usa o PID: cada worker do gunicorn inicia o seu
+    na primeira requisição.
+    """
+    global _ouvinte, _ouvinte_pid
+    if engine.dialect.name != "postgresql" or not caches_ligados():
+        return None
+    pid = os.getpid()
+    if _ouvinte_pid == pid and _ouvinte.is_alive():
+        return _ouvinte
+    with _ouvinte_lock:
+        if _ouvinte_pid != pid or not _ouvinte.is_alive():
+            _ouvinte = OuvinteInvalidacao(engine)
+            _ouvinte.start()
+            _ouvinte_pid = pid
+    return _ouvinte
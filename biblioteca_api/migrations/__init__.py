@@ -0,0 +1,43 @@
+"""
+Migrações versionadas do schema.
+
+Cada migração é um módulo vNNNN_descricao.py com:
+
+- VERSAO: número inteiro, igual ao do nome do arquivo
+- DESCRICAO: texto curto registrado na tabela SCHEMA_VERSION
+- TRANSACIONAL (opcional, padrão True): False para migrações que não podem rodar
+  dentro de uma transação, como CREATE INDEX CONCURRENTLY
+- upgrade(conexao): aplica a migração usando a Connection recebida
+
+O runner (biblioteca_api.schema.migrar) aplica as pendentes em ordem.
+"""
+
+import importlib
+import pkgutil
+import re
+
+_NOME_MIGRACAO = re.compile(r"^v(\d{4})_\w+$")
+
+
+def carregar_migracoes():
+    """Importa os módulos de migração deste pacote, ordenados por VERSAO"""
+    migracoes = []
+    for info in pkgutil.iter_modules(__path__):
+        encontrado = _NOME_MIGRACAO.match(info.name)
+        if not encontrado:
+            continue
+        modulo = importlib.import_module(f"{__name__}.{info.name}")
+        if modulo.VERSAO != int(encontrado.group(1)):
+            raise RuntimeError(
+                f"Migração {info.name} declara VERSAO = {modulo.VERSAO}"
+            )
+        migracoes.append(modulo)
+
+    migracoes.sort(key=lambda modulo: modulo.VERSAO)
+    versoes = [modulo.VERSAO for modulo in migracoes]
+    if len(set(versoes)) != len(versoes):
+        raise RuntimeError(f"Versões de migração duplicadas: {versoes}")
+    return migracoes
+
+
+MIGRACOES = carregar_migracoes()
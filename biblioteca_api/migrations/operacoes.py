@@ -0,0 +1,50 @@
+"""Operações idempotentes usadas pelas migrações"""
+
+from sqlalchemy import inspect, text
+
+
+def adicionar_coluna(conexao, tabela, coluna, tipo):
+    """ALTER TABLE ... ADD COLUMN, ignorado se a coluna já existir"""
+    colunas = {c["name"] for c in inspect(conexao).get_columns(tabela)}
+    if coluna in colunas:
+        return False
+    conexao.execute(text(f'ALTER TABLE "{tabela}" ADD COLUMN "{coluna}" {tipo}'))
+    return True
+
+
+def _remover_indice_invalido(conexao, nome):
+    # Um CREATE INDEX CONCURRENTLY interrompido deixa o índice marcado como
+    # inválido; IF NOT EXISTS o manteria para sempre, então ele é recriado
+    invalido = conexao.execute(
+        text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :nome"
+        ),
+        {"nome": nome},
+    ).scalar()
+    if invalido:
+        conexao.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{nome}"'))
+
+
+def criar_indice(conexao, nome, tabela, colunas, using=None, where=None):
+    """
+    CREATE INDEX idempotente.
+
+    No PostgreSQL usa CONCURRENTLY, que não bloqueia escritas na tabela mas não
+    pode rodar dentro de uma transação: a migração deve declarar
+    TRANSACIONAL = False. Nos demais bancos é um CREATE INDEX comum.
+    """
+    postgresql = conexao.dialect.name == "postgresql"
+    if postgresql:
+        _remover_indice_invalido(conexao, nome)
+
+    sql = "CREATE INDEX "
+    if postgresql:
+        sql += "CONCURRENTLY "
+    sql += f'IF NOT EXISTS "{nome}" ON "{tabela}"'
+    if using:
+        sql += f" USING {using}"
+    sql += f" ({colunas})"
+    if where:
+        sql += f" WHERE {where}"
+    conexao.execute(text(sql))
@@ -0,0 +1,53 @@
+"""Tabelas originais: ALUNO, LIVRO, EXEMPLAR, EMPRESTIMO e EMP_EXEMPLAR"""
+
+from sqlalchemy import Column, Date, ForeignKey, Integer, MetaData, String, Table
+
+VERSAO = 1
+DESCRICAO = "Schema inicial"
+
+# Cópia congelada das tabelas nesta versão: os modelos evoluem, a migração não
+metadata = MetaData()
+
+Table(
+    "ALUNO",
+    metadata,
+    Column("MAT_ALUNO", Integer, primary_key=True, autoincrement=True),
+    Column("NOME", String(100), nullable=False),
+    Column("EMAIL", String(100)),
+    Column("CURSO", String(100)),
+)
+Table(
+    "LIVRO",
+    metadata,
+    Column("COD", Integer, primary_key=True, autoincrement=True),
+    Column("TITULO", String(200), nullable=False),
+    Column("AUTOR", String(100)),
+    Column("EDITORA", String(100)),
+    Column("ANO", Integer),
+)
+Table(
+    "EXEMPLAR",
+    metadata,
+    Column("TOMBO", Integer, primary_key=True, autoincrement=True),
+    Column("COD_LIVRO", Integer, ForeignKey("LIVRO.COD"), nullable=False),
+)
+Table(
+    "EMPRESTIMO",
+    metadata,
+    Column("COD", Integer, primary_key=True),
+    Column("MAT_ALUNO", Integer, ForeignKey("ALUNO.MAT_ALUNO"), nullable=False),
+    Column("DATA_EMPRESTIMO", Date, nullable=False),
+    Column("DATA_PREVISTA_DEV", Date, nullable=False),
+    Column("DATA_DEVOLUCAO", Date),
+    Column("DATA_ATRASO", Date),
+)
+Table(
+    "EMP_EXEMPLAR",
+    metadata,
+    Column("cod_emprestimo", Integer, ForeignKey("EMPRESTIMO.COD"), primary_key=True),
+    Column("tombo_exemplar", Integer, ForeignKey("EXEMPLAR.TOMBO"), primary_key=True),
+)
+
+
+def upgrade(conexao):
+    metadata.create_all(conexao)
@@ -0,0 +1,51 @@
+"""Colunas *_NORM (sem acentos, minúsculas) usadas pela busca de livros e alunos"""
+
+from sqlalchemy import text
+
+from ..models.normalizacao import normalizar
+from .operacoes import adicionar_coluna
+
+VERSAO = 2
+DESCRICAO = "Colunas normalizadas para busca sem acentos"
+
+# tabela -> (chave primária, [(coluna de origem, coluna normalizada, tipo)])
+COLUNAS = {
+    "ALUNO": ("MAT_ALUNO", [("NOME", "NOME_NORM", "VARCHAR(100)")]),
+    "LIVRO": (
+        "COD",
+        [
+            ("TITULO", "TITULO_NORM", "VARCHAR(200)"),
+            ("AUTOR", "AUTOR_NORM", "VARCHAR(100)"),
+        ],
+    ),
+}
+
+
+def _preencher_em_python(conexao, tabela, chave, colunas):
+    # Em todos os bancos, a mesma normalizar() do ORM e dos termos de busca:
+    # lower(unaccent()) do PostgreSQL diverge dela em letras como ø, ł, æ, œ e ß
+    origens = ", ".join(f'"{origem}"' for origem, _, _ in colunas)
+    linhas = conexao.execute(text(f'SELECT "{chave}", {origens} FROM "{tabela}"'))
+    valores = []
+    for linha in linhas:
+        valor = {"chave": linha[0]}
+        for (_, destino, _), original in zip(colunas, linha[1:]):
+            valor[destino] = normalizar(original)
+        valores.append(valor)
+    if not valores:
+        return
+
+    atribuicoes = ", ".join(f'"{destino}" = :{destino}' for _, destino, _ in colunas)
+    conexao.execute(
+        text(f'UPDATE "{tabela}" SET {atribuicoes} WHERE "{chave}" = :chave'), valores
+    )
+
+
+def upgrade(conexao):
+    if conexao.dialect.name == "postgresql":
+        conexao.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    for tabela, (chave, colunas) in COLUNAS.items():
+        for _, destino, tipo in colunas:
+            adicionar_coluna(conexao, tabela, destino, tipo)
+        _preencher_em_python(conexao, tabela, chave, colunas)
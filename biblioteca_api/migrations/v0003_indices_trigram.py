@@ -0,0 +1,21 @@
+"""Índices GIN trigram sobre as colunas normalizadas (somente PostgreSQL)"""
+
+from .operacoes import criar_indice
+
+VERSAO = 3
+DESCRICAO = "Índices trigram para busca por título, autor e nome"
+# CREATE INDEX CONCURRENTLY não roda dentro de uma transação
+TRANSACIONAL = False
+
+INDICES = [
+    ("ix_livro_titulo_norm_trgm", "LIVRO", "TITULO_NORM"),
+    ("ix_livro_autor_norm_trgm", "LIVRO", "AUTOR_NORM"),
+    ("ix_aluno_nome_norm_trgm", "ALUNO", "NOME_NORM"),
+]
+
+
+def upgrade(conexao):
+    if conexao.dialect.name != "postgresql":
+        return
+    for nome, tabela, coluna in INDICES:
+        criar_indice(conexao, nome, tabela, f'"{coluna}" gin_trgm_ops', using="gin")
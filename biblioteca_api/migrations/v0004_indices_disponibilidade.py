@@ -0,0 +1,21 @@
+"""Índices usados na verificação de disponibilidade de exemplares"""
+
+from .operacoes import criar_indice
+
+VERSAO = 4
+DESCRICAO = "Índices de disponibilidade de exemplares"
+# CREATE INDEX CONCURRENTLY não roda dentro de uma transação
+TRANSACIONAL = False
+
+
+def upgrade(conexao):
+    criar_indice(
+        conexao, "ix_emp_exemplar_tombo_exemplar", "EMP_EXEMPLAR", '"tombo_exemplar"'
+    )
+    criar_indice(
+        conexao,
+        "ix_emprestimo_ativo",
+        "EMPRESTIMO",
+        '"COD"',
+        where='"DATA_DEVOLUCAO" IS NULL',
+    )
@@ -0,0 +1,14 @@
+"""Índices nas chaves estrangeiras EMPRESTIMO.MAT_ALUNO e EXEMPLAR.COD_LIVRO"""
+
+from .operacoes import criar_indice
+
+VERSAO = 5
+DESCRICAO = "Índices nas chaves estrangeiras"
+# CREATE INDEX CONCURRENTLY não roda dentro de uma transação
+TRANSACIONAL = False
+
+
+def upgrade(conexao):
+    # EMP_EXEMPLAR.tombo_exemplar já é coberta por ix_emp_exemplar_tombo_exemplar
+    criar_indice(conexao, "ix_emprestimo_mat_aluno", "EMPRESTIMO", '"MAT_ALUNO"')
+    criar_indice(conexao, "ix_exemplar_cod_livro", "EXEMPLAR", '"COD_LIVRO"')
@@ -0,0 +1,15 @@
+"""Coluna VERSAO (controle de concorrência otimista) nas tabelas editáveis pela API"""
+
+from .operacoes import adicionar_coluna
+
+VERSAO = 6
+DESCRICAO = "Colunas de versão para If-Match"
+
+TABELAS = ("ALUNO", "LIVRO", "EXEMPLAR", "EMPRESTIMO")
+
+
+def upgrade(conexao):
+    # Com DEFAULT constante o PostgreSQL (11+) não reescreve a tabela: as linhas
+    # existentes passam a ter VERSAO = 1 sem custo
+    for tabela in TABELAS:
+        adicionar_coluna(conexao, tabela, "VERSAO", "INTEGER NOT NULL DEFAULT 1")
@@ -1,4 +1,8 @@
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import validates
+
 from .. import db
+from .normalizacao import normalizar
 
 
 class Aluno(db.Model):
@@ -7,11 +11,41 @@ class Aluno(db.Model):
     NOME = db.Column(db.String(100), nullable=False)
     EMAIL = db.Column(db.String(100))
     CURSO = db.Column(db.String(100))
+    # Nome sem acentos e em minúsculas, mantido a cada escrita de NOME
+    NOME_NORM = db.Column(db.String(100))
+    # Incrementada a cada UPDATE pelo ORM (version_id_col); vira o ETag do registro
+    VERSAO = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __table_args__ = (
+        db.Index(
+            "ix_aluno_nome_norm_trgm",
+            "NOME_NORM",
+            postgresql_using="gin",
+            postgresql_ops={"NOME_NORM": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+    __mapper_args__ = {"version_id_col": VERSAO}
+
+    @validates("NOME")
+    def _atualizar_nome_norm(self, key, value):
+        self.NOME_NORM = normalizar(value)
+        return value
 
-    def to_dict(self):
+    def to_dict(self, campos=None):
+        """campos restringe o dict aos campos pedidos em ?fields= (e carregados)"""
+        if campos is not None:
+            return {campo: getattr(self, campo) for campo in campos}
         return {
             "MAT_ALUNO": self.MAT_ALUNO,
             "NOME": self.NOME,
             "EMAIL": self.EMAIL,
             "CURSO": self.CURSO,
+            "VERSAO": self.VERSAO,
         }
+
+
+event.listen(
+    Aluno.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -11,18 +11,59 @@ class Emprestimo(db.Model):
     DATA_PREVISTA_DEV = db.Column(db.Date, nullable=False)
     DATA_DEVOLUCAO = db.Column(db.Date)
     DATA_ATRASO = db.Column(db.Date)
+    # Incrementada a cada UPDATE pelo ORM (version_id_col); vira o ETag do registro
+    VERSAO = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __table_args__ = (
+        # Empréstimos de um aluno e o ON DELETE RESTRICT de ALUNO
+        db.Index("ix_emprestimo_mat_aluno", "MAT_ALUNO"),
+        # Índice parcial com apenas os empréstimos em aberto, usado na verificação
+        # de disponibilidade de exemplares
+        db.Index(
+            "ix_emprestimo_ativo",
+            "COD",
+            postgresql_where=DATA_DEVOLUCAO.is_(None),
+            sqlite_where=DATA_DEVOLUCAO.is_(None),
+        ),
+    )
+    __mapper_args__ = {"version_id_col": VERSAO}
 
     aluno = db.relationship("Aluno", backref=db.backref("emprestimos", lazy=True))
+    # Exemplares do empréstimo, atravessando EMP_EXEMPLAR. Somente leitura: as
+    # escritas continuam pela tabela de associação (EmprestimoExemplar)
+    exemplares = db.relationship(
+        "Exemplar", secondary="EMP_EXEMPLAR", viewonly=True, order_by="Exemplar.TOMBO"
+    )
 
-    def to_dict(self):
+    def to_dict(self, include=(), campos=None):
         """
         Retorna um dicionário com os dados do empréstimo, usando sempre 'COD' como chave do identificador.
+
+        include pode conter "aluno", "exemplares" e "exemplares.livro"; carregue
+        esses relacionamentos antes (EmprestimoService.opcoes_include) para não
+        gerar uma consulta por empréstimo. campos restringe as colunas do
+        empréstimo às pedidas em ?fields= (carregadas com load_only).
         """
-        return {
-            "COD": self.COD,
-            "MAT_ALUNO": int(self.MAT_ALUNO) if self.MAT_ALUNO is not None else None,
-            "DATA_EMPRESTIMO": str(self.DATA_EMPRESTIMO),
-            "DATA_PREVISTA_DEV": str(self.DATA_PREVISTA_DEV),
-            "DATA_DEVOLUCAO": str(self.DATA_DEVOLUCAO) if self.DATA_DEVOLUCAO else None,
-            "DATA_ATRASO": str(self.DATA_ATRASO) if self.DATA_ATRASO else None,
-        }
+        if campos is not None:
+            data = {campo: getattr(self, campo) for campo in campos}
+        else:
+            data = {
+                "COD": self.COD,
+                "MAT_ALUNO": (
+                    int(self.MAT_ALUNO) if self.MAT_ALUNO is not None else None
+                ),
+                # Datas ficam como date: o serializador JSON as escreve em AAAA-MM-DD
+                "DATA_EMPRESTIMO": self.DATA_EMPRESTIMO,
+                "DATA_PREVISTA_DEV": self.DATA_PREVISTA_DEV,
+                "DATA_DEVOLUCAO": self.DATA_DEVOLUCAO,
+                "DATA_ATRASO": self.DATA_ATRASO,
+                "VERSAO": self.VERSAO,
+            }
+        if "aluno" in include:
+            data["aluno"] = self.aluno.to_dict()
+        if "exemplares" in include:
+            include_exemplar = ["livro"] if "exemplares.livro" in include else []
+            data["exemplares"] = [
+                exemplar.to_dict(include_exemplar) for exemplar in self.exemplares
+            ]
+        return data
@@ -10,6 +10,9 @@ class EmprestimoExemplar(db.Model):
         db.Integer, db.ForeignKey("EXEMPLAR.TOMBO"), primary_key=True
     )
 
+    # A chave primária começa por cod_emprestimo; buscas por exemplar precisam deste
+    __table_args__ = (db.Index("ix_emp_exemplar_tombo_exemplar", "tombo_exemplar"),)
+
     emprestimo = db.relationship(
         "Emprestimo", backref=db.backref("emprestimo_exemplares", lazy=True)
     )
@@ -5,12 +5,22 @@ class Exemplar(db.Model):
     __tablename__ = "EXEMPLAR"
     TOMBO = db.Column(db.Integer, primary_key=True, autoincrement=True)
     COD_LIVRO = db.Column(db.Integer, db.ForeignKey("LIVRO.COD"), nullable=False)
+    # Incrementada a cada UPDATE pelo ORM (version_id_col); vira o ETag do registro
+    VERSAO = db.Column(db.Integer, nullable=False, server_default="1")
+
+    # Exemplares de um livro e o ON DELETE RESTRICT de LIVRO
+    __table_args__ = (db.Index("ix_exemplar_cod_livro", "COD_LIVRO"),)
+    __mapper_args__ = {"version_id_col": VERSAO}
 
     # Relacionamento com Livro
     livro = db.relationship("Livro", backref="exemplares")
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include=()):
+        data = {
             "TOMBO": self.TOMBO,
             "COD_LIVRO": self.COD_LIVRO,
+            "VERSAO": self.VERSAO,
         }
+        if "livro" in include:
+            data["livro"] = self.livro.to_dict()
+        return data
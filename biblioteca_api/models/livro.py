@@ -1,4 +1,8 @@
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import validates
+
 from .. import db
+from .normalizacao import normalizar
 
 
 class Livro(db.Model):
@@ -8,6 +12,28 @@ class Livro(db.Model):
     AUTOR = db.Column(db.String(100))
     EDITORA = db.Column(db.String(100))
     ANO = db.Column(db.Integer)
+    # Título e autor sem acentos e em minúsculas, mantidos a cada escrita
+    TITULO_NORM = db.Column(db.String(200))
+    AUTOR_NORM = db.Column(db.String(100))
+    # Incrementada a cada UPDATE pelo ORM (version_id_col); vira o ETag do registro
+    VERSAO = db.Column(db.Integer, nullable=False, server_default="1")
+
+    # Índices trigram (pg_trgm) para a busca por título/autor; só existem no PostgreSQL
+    __table_args__ = (
+        db.Index(
+            "ix_livro_titulo_norm_trgm",
+            "TITULO_NORM",
+            postgresql_using="gin",
+            postgresql_ops={"TITULO_NORM": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        db.Index(
+            "ix_livro_autor_norm_trgm",
+            "AUTOR_NORM",
+            postgresql_using="gin",
+            postgresql_ops={"AUTOR_NORM": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+    __mapper_args__ = {"version_id_col": VERSAO}
 
     def __init__(self, TITULO, AUTOR, EDITORA=None, ANO=None):
         self.TITULO = TITULO
@@ -15,11 +41,27 @@ class Livro(db.Model):
         self.EDITORA = EDITORA
         self.ANO = ANO
 
-    def to_dict(self):
+    @validates("TITULO", "AUTOR")
+    def _atualizar_colunas_norm(self, key, value):
+        setattr(self, f"{key}_NORM", normalizar(value))
+        return value
+
+    def to_dict(self, campos=None):
+        """campos restringe o dict aos campos pedidos em ?fields= (e carregados)"""
+        if campos is not None:
+            return {campo: getattr(self, campo) for campo in campos}
         return {
             "COD": self.COD,
             "TITULO": self.TITULO,
             "AUTOR": self.AUTOR,
             "EDITORA": self.EDITORA,
             "ANO": self.ANO,
+            "VERSAO": self.VERSAO,
         }
+
+
+event.listen(
+    Livro.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,16 @@
+import unicodedata
+from typing import Optional
+
+
+def normalizar(texto: Optional[str]) -> Optional[str]:
+    """
+    Remove acentos e converte para minúsculas ("Informação" -> "informacao").
+
+    É a forma gravada nas colunas *_NORM e usada nos termos de busca, para que a
+    comparação não dependa de acentuação nem de funções aplicadas linha a linha.
+    """
+    if texto is None:
+        return None
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return sem_acentos.lower()
@@ -27,6 +27,9 @@ aluno_response_model = api.model(
         "NOME": fields.String(description="Nome completo do aluno"),
         "EMAIL": fields.String(description="Email do aluno"),
         "CURSO": fields.String(description="Curso do aluno"),
+        "VERSAO": fields.Integer(
+            readonly=True, description="Versão do registro (ETag; use em If-Match)"
+        ),
     },
 )
 
@@ -39,6 +42,19 @@ livro_model = api.model(
         "AUTOR": fields.String(required=True, description="Autor do livro"),
         "EDITORA": fields.String(description="Editora do livro"),
         "ANO": fields.Integer(description="Ano de publicação"),
+        "VERSAO": fields.Integer(
+            readonly=True, description="Versão do registro (ETag; use em If-Match)"
+        ),
+    },
+)
+
+livros_importados_model = api.model(
+    "LivrosImportados",
+    {
+        "total": fields.Integer(description="Quantidade de livros importados"),
+        "CODS": fields.List(
+            fields.Integer, description="Códigos atribuídos, na ordem do arquivo"
+        ),
     },
 )
 
@@ -50,6 +66,18 @@ exemplar_model = api.model(
             readonly=True, description="Número do tombo do exemplar"
         ),
         "COD_LIVRO": fields.Integer(required=True, description="Código do livro"),
+        "VERSAO": fields.Integer(
+            readonly=True, description="Versão do registro (ETag; use em If-Match)"
+        ),
+    },
+)
+
+exemplar_lote_model = api.model(
+    "ExemplarLote",
+    {
+        "QUANTIDADE": fields.Integer(
+            required=True, min=1, description="Quantidade de exemplares a criar"
+        ),
     },
 )
 
@@ -65,6 +93,9 @@ emprestimo_model = api.model(
         ),
         "DATA_DEVOLUCAO": fields.Date(description="Data real de devolução"),
         "DATA_ATRASO": fields.Date(description="Data de atraso"),
+        "VERSAO": fields.Integer(
+            readonly=True, description="Versão do registro (ETag; use em If-Match)"
+        ),
     },
 )
 
@@ -75,6 +106,53 @@ emprestimo_create_model = api.model(
     },
 )
 
+checkout_model = api.model(
+    "Checkout",
+    {
+        "MAT_ALUNO": fields.Integer(required=True, description="Matrícula do aluno"),
+        "TOMBOS": fields.List(
+            fields.Integer,
+            required=True,
+            description="Tombos dos exemplares a emprestar",
+        ),
+    },
+)
+
+emprestimo_checkout_model = api.inherit(
+    "EmprestimoCheckout",
+    emprestimo_model,
+    {
+        "TOMBOS": fields.List(
+            fields.Integer, description="Tombos dos exemplares emprestados"
+        ),
+    },
+)
+
+devolucao_lote_model = api.model(
+    "DevolucaoLote",
+    {
+        "CODS": fields.List(
+            fields.Integer, description="Códigos dos empréstimos a devolver"
+        ),
+        "TOMBOS": fields.List(
+            fields.Integer,
+            description="Tombos lidos; devolve o empréstimo ativo de cada um",
+        ),
+    },
+)
+
+devolucao_resultado_model = api.model(
+    "DevolucaoResultado",
+    {
+        "COD": fields.Integer(description="Código do empréstimo"),
+        "TOMBO": fields.Integer(description="Tombo lido (devolução por tombo)"),
+        "STATUS": fields.String(
+            enum=["devolvido", "ja_devolvido", "nao_encontrado"],
+            description="Resultado da devolução",
+        ),
+    },
+)
+
 # Modelo para Empréstimo Exemplar
 emprestimo_exemplar_model = api.model(
     "EmprestimoExemplar",
@@ -129,3 +207,71 @@ emprestimos_list_model = api.model(
         )
     },
 )
+
+# Respostas com ?include= (relacionamentos presentes apenas quando pedidos)
+exemplar_com_livro_model = api.inherit(
+    "ExemplarComLivro",
+    exemplar_model,
+    {"livro": fields.Nested(livro_model, description="Com include=livro")},
+)
+
+emprestimo_com_relacionados_model = api.inherit(
+    "EmprestimoComRelacionados",
+    emprestimo_model,
+    {
+        "aluno": fields.Nested(aluno_response_model, description="Com include=aluno"),
+        "exemplares": fields.List(
+            fields.Nested(exemplar_com_livro_model),
+            description="Com include=exemplares (livro com exemplares.livro)",
+        ),
+    },
+)
+
+# Busca em lote: itens na ordem pedida, com null onde a chave não existe
+lookup_model = api.model(
+    "Lookup",
+    {
+        "ids": fields.List(
+            fields.Integer, required=True, description="Chaves a buscar, em ordem"
+        ),
+    },
+)
+
+livros_lookup_model = api.model(
+    "LivrosLookup",
+    {
+        "itens": fields.List(
+            fields.Nested(livro_model, allow_null=True),
+            description="Livros na ordem pedida (null se não encontrado)",
+        ),
+        "nao_encontrados": fields.List(
+            fields.Integer, description="Códigos sem livro correspondente"
+        ),
+    },
+)
+
+alunos_lookup_model = api.model(
+    "AlunosLookup",
+    {
+        "itens": fields.List(
+            fields.Nested(aluno_response_model, allow_null=True),
+            description="Alunos na ordem pedida (null se não encontrado)",
+        ),
+        "nao_encontrados": fields.List(
+            fields.Integer, description="Matrículas sem aluno correspondente"
+        ),
+    },
+)
+
+exemplares_lookup_model = api.model(
+    "ExemplaresLookup",
+    {
+        "itens": fields.List(
+            fields.Nested(exemplar_model, allow_null=True),
+            description="Exemplares na ordem pedida (null se não encontrado)",
+        ),
+        "nao_encontrados": fields.List(
+            fields.Integer, description="Tombos sem exemplar correspondente"
+        ),
+    },
+)
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def _env_int(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+def _env_bool(nome, padrao):
+    return os.environ.get(nome, "1" if padrao else "0").lower() in ("1", "true", "yes")
+
+
+class PoolStats:
+    """Contadores de checkout do pool, seguros para uso entre threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def registrar(self, espera, timeout=False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+
+    def as_dict(self):
+        with self._lock:
+            tentativas = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_media_ms": round(
+                    1000 * self.espera_total / tentativas if tentativas else 0.0, 3
+                ),
+                "espera_max_ms": round(1000 * self.espera_max, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout levou para obter uma conexão"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super().connect()
+        except exc.TimeoutError:
+            self.stats.registrar(time.perf_counter() - inicio, timeout=True)
+            raise
+        self.stats.registrar(time.perf_counter() - inicio)
+        return conexao
+
+
+def engine_options(url):
+    """
+    Opções do pool lidas do ambiente, usadas em SQLALCHEMY_ENGINE_OPTIONS.
+
+    - DB_POOL_SIZE: conexões mantidas abertas (padrão 5)
+    - DB_MAX_OVERFLOW: conexões extras em picos (padrão 10)
+    - DB_POOL_TIMEOUT: segundos aguardando uma conexão livre (padrão 30)
+    - DB_POOL_RECYCLE: segundos até reciclar uma conexão (padrão 1800)
+    - DB_POOL_PRE_PING: testa a conexão antes de usá-la (padrão 1)
+
+    O SQLite usa o pool configurado pelo Flask-SQLAlchemy e não recebe opções.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def pool_stats(engine):
+    """Estado atual do pool e estatísticas de checkout/espera"""
+    pool = engine.pool
+    dados = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        dados.update(
+            tamanho=pool.size(),
+            em_uso=pool.checkedout(),
+            disponiveis=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        dados.update(pool.stats.as_dict())
+    return dados
+
+
+@contextmanager
+def raw_connection(engine):
+    """
+    Conexão DBAPI (psycopg2) emprestada do pool do engine.
+
+    Ao sair do bloco a conexão volta ao pool; transações não confirmadas são
+    desfeitas pelo próprio pool na devolução.
+    """
+    conexao = engine.raw_connection()
+    try:
+        yield conexao
+    finally:
+        conexao.close()
@@ -0,0 +1,188 @@
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional, Set
+
+from sqlalchemy import func, inspect, insert, select, text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from . import db
+from .migrations import MIGRACOES
+
+logger = logging.getLogger(__name__)
+
+# Versão do schema esperada por este código: a da última migração
+SCHEMA_VERSION = MIGRACOES[-1].VERSAO
+# Versão atribuída a bancos criados antes do controle de versões
+BASELINE = MIGRACOES[0].VERSAO
+
+# Valores aceitos em SCHEMA_CHECK
+CHECK_OFF = "off"
+CHECK_WARN = "warn"
+CHECK_STRICT = "strict"
+
+# Chave do pg_advisory_lock que impede dois deploys de migrarem ao mesmo tempo
+_LOCK_MIGRACAO = 7_402_117
+
+schema_version = db.Table(
+    "SCHEMA_VERSION",
+    db.Column("VERSAO", db.Integer, primary_key=True, autoincrement=False),
+    db.Column("DESCRICAO", db.String(200)),
+    db.Column("APLICADA_EM", db.DateTime, nullable=False),
+)
+
+
+def _consultar_versoes(conexao, consulta):
+    try:
+        return conexao.execute(consulta)
+    except DBAPIError:
+        conexao.rollback()
+        if inspect(conexao).has_table(schema_version.name):
+            raise
+        return None
+
+
+def versao_schema(conexao) -> Optional[int]:
+    """Versão registrada no banco, ou None se o schema nunca foi inicializado"""
+    resultado = _consultar_versoes(conexao, select(func.max(schema_version.c.VERSAO)))
+    return None if resultado is None else resultado.scalar()
+
+
+def versoes_aplicadas(conexao) -> Optional[Set[int]]:
+    """Migrações registradas no banco, ou None se não há tabela de versões"""
+    resultado = _consultar_versoes(conexao, select(schema_version.c.VERSAO))
+    return None if resultado is None else set(resultado.scalars())
+
+
+def migracoes_pendentes(conexao) -> list:
+    """Módulos de migração ainda não aplicados, em ordem"""
+    aplicadas = versoes_aplicadas(conexao) or set()
+    return [migracao for migracao in MIGRACOES if migracao.VERSAO not in aplicadas]
+
+
+def _registrar(conexao, migracoes):
+    conexao.execute(
+        insert(schema_version),
+        [
+            {
+                "VERSAO": migracao.VERSAO,
+                "DESCRICAO": migracao.DESCRICAO,
+                "APLICADA_EM": datetime.utcnow(),
+            }
+            for migracao in migracoes
+        ],
+    )
+
+
+def _aplicar(engine, migracao):
+    logger.info(f"Aplicando migração {migracao.VERSAO:04d}: {migracao.DESCRICAO}")
+    if getattr(migracao, "TRANSACIONAL", True):
+        # Migração e registro da versão são confirmados juntos ou desfeitos juntos
+        with engine.begin() as conexao:
+            migracao.upgrade(conexao)
+            _registrar(conexao, [migracao])
+        return
+
+    # Ex.: CREATE INDEX CONCURRENTLY. Cada comando é confirmado isoladamente, por
+    # isso essas migrações devem ser idempotentes (podem ser repetidas após falha)
+    with engine.connect() as conexao:
+        conexao.execution_options(isolation_level="AUTOCOMMIT")
+        migracao.upgrade(conexao)
+    with engine.begin() as conexao:
+        _registrar(conexao, [migracao])
+
+
+@contextmanager
+def _lock_migracao(engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conexao:
+        # Lock de sessão em AUTOCOMMIT: uma transação aberta nesta conexão faria o
+        # CREATE INDEX CONCURRENTLY das migrações esperar por ela
+        conexao.execution_options(isolation_level="AUTOCOMMIT")
+        conexao.execute(
+            text("SELECT pg_advisory_lock(:chave)"), {"chave": _LOCK_MIGRACAO}
+        )
+        try:
+            yield
+        finally:
+            conexao.execute(
+                text("SELECT pg_advisory_unlock(:chave)"), {"chave": _LOCK_MIGRACAO}
+            )
+
+
+def _preparar_versionamento(engine):
+    """
+    Garante a tabela SCHEMA_VERSION.
+
+    - Banco vazio: cria o schema atual dos modelos e registra todas as migrações
+    - Banco com as tabelas mas sem versões: registra a BASELINE, e as migrações
+      seguintes são aplicadas normalmente
+    """
+    from . import models  # noqa: F401 - registra todos os modelos no metadata
+
+    with engine.connect() as conexao:
+        if versoes_aplicadas(conexao) is not None:
+            return
+
+        existentes = set(inspect(conexao).get_table_names())
+        tabelas = set(db.metadata.tables) - {schema_version.name}
+        if not existentes & tabelas:
+            logger.info("Banco vazio: criando o schema na versão atual")
+            db.metadata.create_all(conexao)
+            _registrar(conexao, MIGRACOES)
+        else:
+            logger.info(f"Banco sem versões: registrando a versão {BASELINE}")
+            schema_version.create(conexao)
+            _registrar(conexao, [MIGRACOES[0]])
+        conexao.commit()
+
+
+def migrar(engine) -> List[int]:
+    """
+    Leva o banco à versão atual e retorna as migrações aplicadas.
+
+    Idempotente: com o banco atualizado, faz apenas a consulta das versões. É o
+    passo de deploy (python db.py init) que substitui o create_all executado a cada
+    import da aplicação e o antigo init_db.sql.
+    """
+    with _lock_migracao(engine):
+        _preparar_versionamento(engine)
+        with engine.connect() as conexao:
+            pendentes = migracoes_pendentes(conexao)
+        for migracao in pendentes:
+            _aplicar(engine, migracao)
+    return [migracao.VERSAO for migracao in pendentes]
+
+
+def verificar_schema(engine, modo=CHECK_WARN) -> Optional[int]:
+    """
+    Verificação feita no boot: uma única consulta compara a versão do banco com
+    SCHEMA_VERSION.
+
+    - off: não acessa o banco
+    - warn: registra um aviso se o schema estiver desatualizado ou inacessível
+    - strict: levanta RuntimeError nesses casos, impedindo o worker de subir
+    """
+    if modo == CHECK_OFF:
+        return None
+
+    try:
+        with engine.connect() as conexao:
+            versao = versao_schema(conexao)
+    except SQLAlchemyError as e:
+        if modo == CHECK_STRICT:
+            raise
+        logger.warning(f"Não foi possível verificar a versão do schema: {e}")
+        return None
+
+    if versao is None or versao < SCHEMA_VERSION:
+        mensagem = (
+            f"Schema do banco na versão {versao}, esperada {SCHEMA_VERSION}: "
+            "execute 'python db.py init'"
+        )
+        if modo == CHECK_STRICT:
+            raise RuntimeError(mensagem)
+        logger.warning(mensagem)
+    return versao
@@ -0,0 +1,105 @@
+"""
+Serialização JSON das respostas da API (flask-restx, jsonify e NDJSON).
+
+JSON_BACKEND escolhe a biblioteca usada:
+
+- auto (padrão): orjson, se estiver instalado; senão, o json da biblioteca padrão
+- orjson: exige o pacote orjson
+- stdlib: sempre o json da biblioteca padrão
+
+Os dois geram o mesmo JSON compacto para os tipos usados na API. Datas (date)
+saem como AAAA-MM-DD direto do valor do banco, sem conversão prévia nos models.
+"""
+
+import json
+import os
+from datetime import date
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+BACKEND_AUTO = "auto"
+BACKEND_ORJSON = "orjson"
+BACKEND_STDLIB = "stdlib"
+BACKENDS = (BACKEND_AUTO, BACKEND_ORJSON, BACKEND_STDLIB)
+
+JSON_MIMETYPE = "application/json"
+
+
+def _padrao(valor):
+    """Tipos que o json da biblioteca padrão não serializa sozinho"""
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Objeto do tipo {type(valor).__name__} não serializável em JSON")
+
+
+class SerializadorJSON:
+    """Codifica objetos Python em JSON (bytes UTF-8) com o backend escolhido"""
+
+    def __init__(self, backend=BACKEND_AUTO):
+        if backend not in BACKENDS:
+            raise ValueError(f"JSON_BACKEND inválido: {backend!r}")
+        if backend == BACKEND_ORJSON and orjson is None:
+            raise ValueError("JSON_BACKEND=orjson exige o pacote orjson instalado")
+        usar_orjson = orjson is not None and backend != BACKEND_STDLIB
+        self.backend = BACKEND_ORJSON if usar_orjson else BACKEND_STDLIB
+        self.dumps = self._dumps_orjson if usar_orjson else self._dumps_stdlib
+
+    @staticmethod
+    def _dumps_orjson(obj):
+        # orjson já codifica date/datetime em ISO 8601; chaves int viram texto,
+        # como no json da biblioteca padrão
+        return orjson.dumps(obj, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+    @staticmethod
+    def _dumps_stdlib(obj):
+        corpo = json.dumps(
+            obj, default=_padrao, ensure_ascii=False, separators=(",", ":")
+        )
+        return corpo.encode("utf-8")
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """
+    Provedor JSON do Flask (jsonify, make_response com dict) usando o
+    SerializadorJSON. A leitura dos corpos das requisições continua a padrão.
+    """
+
+    def __init__(self, app, serializador):
+        super().__init__(app)
+        self.serializador = serializador
+
+    def dumps(self, obj, **kwargs):
+        return self.serializador.dumps(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.serializador.dumps(obj), mimetype=JSON_MIMETYPE
+        )
+
+
+def configurar_json(app, backend=None):
+    """Instala o serializador na aplicação (JSON_BACKEND=auto|orjson|stdlib)"""
+    backend = backend or os.environ.get("JSON_BACKEND", BACKEND_AUTO).lower()
+    app.json = ProvedorJSON(app, SerializadorJSON(backend))
+    return app.json.serializador
+
+
+def serializar(obj):
+    """JSON (bytes) com o serializador da aplicação atual"""
+    return current_app.json.serializador.dumps(obj)
+
+
+def output_json(data, code, headers=None):
+    """Representação application/json do flask-restx"""
+    resposta = current_app.response_class(
+        serializar(data), status=code, mimetype=JSON_MIMETYPE
+    )
+    resposta.headers.extend(headers or {})
+    return resposta
@@ -1,13 +1,21 @@
 import logging
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Set
 
+from sqlalchemy import Row, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from ..models.aluno import Aluno
+from ..models.normalizacao import normalizar
+from .atualizacao import atualizar_colunas
+from .concorrencia import VersaoDesatualizada
+from .projecao import colunas
 
 logger = logging.getLogger(__name__)
 
+# Colunas de to_dict(), devolvidas pelo UPDATE ... RETURNING de atualizar_parcial
+COLUNAS_ALUNO = (Aluno.MAT_ALUNO, Aluno.NOME, Aluno.EMAIL, Aluno.CURSO, Aluno.VERSAO)
+
 
 class AlunoService:
     """Serviço para operações CRUD da entidade Aluno"""
@@ -73,6 +81,30 @@ class AlunoService:
             logger.error(f"Erro ao buscar aluno por matrícula {MAT_ALUNO}: {e}")
             return None
 
+    @staticmethod
+    def buscar_por_matriculas(
+        db: Session, matriculas: Sequence[int]
+    ) -> Optional[Dict[int, dict]]:
+        """
+        Busca vários alunos de uma vez, num único SELECT com WHERE MAT_ALUNO IN (...)
+
+        Args:
+            db: Sessão do banco de dados
+            matriculas: Matrículas dos alunos (repetições são ignoradas)
+
+        Returns:
+            Dicionário {MAT_ALUNO: dados do aluno} só com os alunos existentes,
+            ou None em caso de erro
+        """
+        try:
+            alunos = db.scalars(
+                select(Aluno).where(Aluno.MAT_ALUNO.in_(set(matriculas)))
+            )
+            return {aluno.MAT_ALUNO: aluno.to_dict() for aluno in alunos}
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao buscar alunos em lote: {e}")
+            return None
+
     @staticmethod
     def buscar_por_email(db: Session, EMAIL: str) -> Optional[Aluno]:
         """
@@ -93,29 +125,94 @@ class AlunoService:
             return None
 
     @staticmethod
-    def listar_todos(db: Session, skip: int = 0, limit: int = 100) -> List[Aluno]:
+    def listar_todos(
+        db: Session, skip: int = 0, limit: int = 100, after: Optional[int] = None
+    ) -> List[Aluno]:
         """
-        Lista todos os alunos com paginação
+        Lista todos os alunos com paginação, ordenados pela matrícula
 
         Args:
             db: Sessão do banco de dados
             skip: Número de registros para pular (paginação)
             limit: Número máximo de registros para retornar
+            after: Retorna apenas matrículas maiores que esta (paginação por cursor)
 
         Returns:
             Lista de objetos Aluno
         """
         try:
-            alunos = db.query(Aluno).offset(skip).limit(limit).all()
+            query = db.query(Aluno).order_by(Aluno.MAT_ALUNO)
+            if after is not None:
+                query = query.filter(Aluno.MAT_ALUNO > after)
+            alunos = query.offset(skip).limit(limit).all()
             return alunos
         except SQLAlchemyError as e:
             logger.error(f"Erro ao listar alunos: {e}")
             return []
 
+    @staticmethod
+    def listar_linhas(
+        db: Session,
+        limit: int = 100,
+        after: Optional[int] = None,
+        campos: Optional[Sequence[str]] = None,
+    ) -> List[Row]:
+        """
+        Lista os alunos como linhas do Core (COLUNAS_ALUNO), sem montar objetos
+        do ORM; usado nas listagens, que só leem os dados
+
+        Args:
+            db: Sessão do banco de dados
+            limit: Número máximo de registros para retornar
+            after: Retorna apenas matrículas maiores que esta (paginação por cursor)
+            campos: Seleciona só estas colunas (?fields=) em vez de COLUNAS_ALUNO
+
+        Returns:
+            Lista de linhas (tuplas nomeadas) ordenadas pela matrícula
+        """
+        try:
+            stmt = select(*colunas(Aluno, campos, COLUNAS_ALUNO))
+            stmt = stmt.order_by(Aluno.MAT_ALUNO).limit(limit)
+            if after is not None:
+                stmt = stmt.where(Aluno.MAT_ALUNO > after)
+            return db.execute(stmt).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao listar alunos: {e}")
+            return []
+
+    @staticmethod
+    def iterar_todos(
+        db: Session, after: Optional[int] = None, batch_size: int = 1000
+    ) -> Iterator[dict]:
+        """
+        Percorre todos os alunos usando um cursor no servidor
+
+        Os registros são lidos em lotes e entregues como dicionários, sem criar
+        objetos Aluno nem carregar a tabela inteira na memória.
+
+        Args:
+            db: Sessão do banco de dados
+            after: Retorna apenas matrículas maiores que esta
+            batch_size: Quantidade de linhas buscadas por vez no cursor
+
+        Returns:
+            Iterador de dicionários com os dados dos alunos
+        """
+        try:
+            stmt = select(*COLUNAS_ALUNO).order_by(Aluno.MAT_ALUNO)
+            if after is not None:
+                stmt = stmt.where(Aluno.MAT_ALUNO > after)
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            for row in result:
+                yield row._asdict()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao transmitir alunos: {e}")
+            raise
+
     @staticmethod
     def buscar_por_nome(db: Session, NOME: str) -> List[Aluno]:
         """
-        Busca alunos por nome (busca parcial, case-insensitive)
+        Busca alunos por nome (busca parcial, sem diferenciar maiúsculas e acentos)
 
         Args:
             db: Sessão do banco de dados
@@ -125,7 +222,8 @@ class AlunoService:
             Lista de objetos Aluno que correspondem à busca
         """
         try:
-            alunos = db.query(Aluno).filter(Aluno.NOME.ilike(f"%{NOME}%")).all()
+            termo = normalizar(NOME)
+            alunos = db.query(Aluno).filter(Aluno.NOME_NORM.like(f"%{termo}%")).all()
             return alunos
         except SQLAlchemyError as e:
             logger.error(f"Erro ao buscar alunos por nome {NOME}: {e}")
@@ -196,6 +294,45 @@ class AlunoService:
             db.rollback()
             return None
 
+    @staticmethod
+    def atualizar_parcial(
+        db: Session,
+        MAT_ALUNO: int,
+        valores: dict,
+        versoes: Optional[Set[int]] = None,
+    ) -> Optional[dict]:
+        """
+        Atualiza apenas as colunas informadas, com um único UPDATE ... RETURNING
+
+        Args:
+            db: Sessão do banco de dados
+            MAT_ALUNO: Matrícula do aluno a ser atualizado
+            valores: Colunas a alterar e seus novos valores
+            versoes: Versões aceitas (If-Match); None aceita qualquer uma
+
+        Returns:
+            Dicionário no formato de to_dict() ou None se o aluno não existir
+
+        Raises:
+            VersaoDesatualizada: se o aluno não estiver numa das versões aceitas
+        """
+        valores = dict(valores)
+        if "NOME" in valores:
+            valores["NOME_NORM"] = normalizar(valores["NOME"])
+        try:
+            aluno = atualizar_colunas(
+                db, Aluno, MAT_ALUNO, valores, COLUNAS_ALUNO, versoes
+            )
+            db.commit()
+            return aluno
+        except VersaoDesatualizada:
+            db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao atualizar aluno {MAT_ALUNO}: {e}")
+            db.rollback()
+            raise
+
     @staticmethod
     def deletar_aluno(db: Session, MAT_ALUNO: int) -> bool:
         """
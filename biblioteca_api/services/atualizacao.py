@@ -0,0 +1,49 @@
+from typing import Optional, Sequence, Set
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..invalidacao import ENTIDADES, publicar
+from .concorrencia import VersaoDesatualizada
+
+
+def atualizar_colunas(
+    db: Session,
+    modelo,
+    chave: int,
+    valores: dict,
+    colunas: Sequence,
+    versoes: Optional[Set[int]] = None,
+) -> Optional[dict]:
+    """
+    Atualização parcial numa única instrução:
+
+        UPDATE ... SET <valores>, VERSAO = VERSAO + 1
+        WHERE <pk> = :chave [AND VERSAO IN (:versoes)] RETURNING <colunas>
+
+    A linha devolvida já é a resposta, sem refresh nem nova leitura. Como o UPDATE
+    é via Core, a invalidação dos caches é publicada aqui. Não faz commit.
+
+    Retorna o dict da linha atualizada ou None se o registro não existir; lança
+    VersaoDesatualizada se ele existir numa versão fora de versoes (If-Match).
+    """
+    tabela = modelo.__table__
+    pk = tabela.primary_key.columns[0]
+    stmt = (
+        update(tabela)
+        .where(pk == chave)
+        .values(**valores, VERSAO=tabela.c.VERSAO + 1)
+        .returning(*colunas)
+    )
+    if versoes is not None:
+        stmt = stmt.where(tabela.c.VERSAO.in_(versoes))
+
+    linha = db.execute(stmt).one_or_none()
+    if linha is None:
+        # Só no caminho de falha: distingue registro inexistente de versão antiga
+        if versoes is not None and db.execute(select(pk).where(pk == chave)).first():
+            raise VersaoDesatualizada()
+        return None
+
+    publicar(db, ENTIDADES[tabela.name], [chave])
+    return linha._asdict()
@@ -0,0 +1,21 @@
+from typing import Optional, Set
+
+
+class VersaoDesatualizada(Exception):
+    """O registro mudou desde a versão em que o cliente baseou a alteração"""
+
+    def __init__(self, versao_atual: Optional[int] = None):
+        super().__init__(f"Registro alterado (versão atual: {versao_atual})")
+        self.versao_atual = versao_atual
+
+
+def verificar_versao(registro, versoes: Optional[Set[int]]):
+    """
+    Confere a VERSAO do registro com as versões aceitas (If-Match).
+
+    A verificação antes da escrita cobre o caso comum; uma alteração concorrente
+    entre a leitura e o commit é detectada pelo ORM (version_id_col), que lança
+    StaleDataError no UPDATE.
+    """
+    if versoes is not None and registro.VERSAO not in versoes:
+        raise VersaoDesatualizada(registro.VERSAO)
@@ -1,6 +1,7 @@
 import logging
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 
+from sqlalchemy import select, tuple_, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
@@ -11,16 +12,60 @@ from ..models.exemplar import Exemplar
 logger = logging.getLogger(__name__)
 
 
+class ExemplarEmprestado(Exception):
+    """O exemplar já está em um empréstimo ainda não devolvido"""
+
+
 class EmprestimoExemplarService:
     @staticmethod
-    def get_all_emprestimo_exemplares(db: Session, skip: int = 0, limit: int = 100) -> List[EmprestimoExemplar]:
+    def get_all_emprestimo_exemplares(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[Tuple[int, int]] = None,
+    ) -> List[EmprestimoExemplar]:
         try:
-            emprestimo_exemplares = db.query(EmprestimoExemplar).offset(skip).limit(limit).all()
+            chave = tuple_(
+                EmprestimoExemplar.cod_emprestimo, EmprestimoExemplar.tombo_exemplar
+            )
+            query = db.query(EmprestimoExemplar).order_by(
+                EmprestimoExemplar.cod_emprestimo, EmprestimoExemplar.tombo_exemplar
+            )
+            if after is not None:
+                query = query.filter(chave > tuple_(*after))
+            emprestimo_exemplares = query.offset(skip).limit(limit).all()
             return emprestimo_exemplares
         except SQLAlchemyError as e:
             logger.error(f"Erro ao listar empréstimo exemplares: {e}")
             return []
 
+    @staticmethod
+    def stream_emprestimo_exemplares(
+        db: Session,
+        after: Optional[Tuple[int, int]] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict]:
+        """Percorre EMP_EXEMPLAR com cursor no servidor, sem materializar a tabela"""
+        try:
+            stmt = select(
+                EmprestimoExemplar.cod_emprestimo.label("COD_EMPRESTIMO"),
+                EmprestimoExemplar.tombo_exemplar.label("TOMBO_EXEMPLAR"),
+            ).order_by(
+                EmprestimoExemplar.cod_emprestimo, EmprestimoExemplar.tombo_exemplar
+            )
+            if after is not None:
+                chave = tuple_(
+                    EmprestimoExemplar.cod_emprestimo,
+                    EmprestimoExemplar.tombo_exemplar,
+                )
+                stmt = stmt.where(chave > tuple_(*after))
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            for row in result:
+                yield row._asdict()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao transmitir empréstimo exemplares: {e}")
+            raise
+
     @staticmethod
     def get_emprestimo_exemplar_by_ids(
         db: Session, cod_emprestimo: int, tombo_exemplar: int
@@ -38,6 +83,102 @@ class EmprestimoExemplarService:
             )
             return None
 
+    @staticmethod
+    def exemplar_emprestado(db: Session, tombo_exemplar: int) -> bool:
+        """
+        Indica se o exemplar está em algum empréstimo ainda não devolvido.
+
+        A consulta é um EXISTS que percorre ix_emp_exemplar_tombo_exemplar e
+        confere cada empréstimo no índice parcial ix_emprestimo_ativo.
+        """
+        ativo = (
+            select(EmprestimoExemplar.cod_emprestimo)
+            .join(Emprestimo, Emprestimo.COD == EmprestimoExemplar.cod_emprestimo)
+            .where(
+                EmprestimoExemplar.tombo_exemplar == tombo_exemplar,
+                Emprestimo.DATA_DEVOLUCAO.is_(None),
+            )
+        )
+        return bool(db.scalar(select(ativo.exists())))
+
+    @staticmethod
+    def tombos_emprestados(db: Session, tombos: List[int]) -> List[int]:
+        """Retorna, numa única consulta, quais dos tombos estão em empréstimos ativos"""
+        stmt = (
+            select(EmprestimoExemplar.tombo_exemplar)
+            .join(Emprestimo, Emprestimo.COD == EmprestimoExemplar.cod_emprestimo)
+            .where(
+                EmprestimoExemplar.tombo_exemplar.in_(tombos),
+                Emprestimo.DATA_DEVOLUCAO.is_(None),
+            )
+            .distinct()
+        )
+        return sorted(db.scalars(stmt))
+
+    @staticmethod
+    def bloquear_exemplares(db: Session, tombos: List[int]) -> List[int]:
+        """
+        Trava os exemplares até o fim da transação e retorna os tombos existentes.
+
+        No PostgreSQL usa SELECT ... FOR UPDATE, em ordem de tombo para que dois
+        checkouts com vários exemplares não entrem em deadlock. O SQLite não tem
+        lock por linha: um UPDATE sem efeito obtém o lock de escrita do banco.
+        """
+        tabela = Exemplar.__table__
+        if db.get_bind().dialect.name != "postgresql":
+            db.execute(
+                update(tabela)
+                .where(tabela.c.TOMBO.in_(tombos))
+                .values(TOMBO=tabela.c.TOMBO)
+            )
+        stmt = (
+            select(tabela.c.TOMBO)
+            .where(tabela.c.TOMBO.in_(tombos))
+            .order_by(tabela.c.TOMBO)
+            .with_for_update()
+        )
+        return list(db.scalars(stmt))
+
+    @staticmethod
+    def emprestar_exemplar(
+        db: Session, cod_emprestimo: int, tombo_exemplar: int
+    ) -> Optional[EmprestimoExemplar]:
+        """
+        Adiciona o exemplar ao empréstimo se ele estiver disponível.
+
+        O exemplar é travado antes da verificação de disponibilidade, então dois
+        balcões emprestando o mesmo tombo ao mesmo tempo são serializados e só um
+        deles consegue. Retorna None se o exemplar não existir e lança
+        ExemplarEmprestado se ele já estiver emprestado; erros do banco são
+        propagados após o rollback.
+        """
+        try:
+            if not EmprestimoExemplarService.bloquear_exemplares(db, [tombo_exemplar]):
+                logger.warning(f"Exemplar com tombo {tombo_exemplar} não encontrado")
+                db.rollback()
+                return None
+
+            if EmprestimoExemplarService.exemplar_emprestado(db, tombo_exemplar):
+                logger.warning(f"Exemplar {tombo_exemplar} já está emprestado")
+                raise ExemplarEmprestado(tombo_exemplar)
+
+            emprestimo_exemplar = EmprestimoExemplar(
+                cod_emprestimo=cod_emprestimo, tombo_exemplar=tombo_exemplar
+            )
+            db.add(emprestimo_exemplar)
+            db.commit()
+            logger.info(
+                f"Exemplar {tombo_exemplar} adicionado ao empréstimo {cod_emprestimo}"
+            )
+            return emprestimo_exemplar
+        except ExemplarEmprestado:
+            db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao emprestar exemplar {tombo_exemplar}: {e}")
+            db.rollback()
+            raise
+
     @staticmethod
     def create_emprestimo_exemplar(
         db: Session, cod_emprestimo: int, tombo_exemplar: int
@@ -1,26 +1,118 @@
 import logging
 from datetime import date, datetime
-from typing import List, Optional
+from typing import AbstractSet, Dict, Iterator, List, Optional, Sequence, Set
 
+from sqlalchemy import Row, case, func, insert, select, update
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 
+from ..invalidacao import publicar
 from ..models.aluno import Aluno
 from ..models.emprestimo import Emprestimo
+from ..models.emprestimo_exemplar import EmprestimoExemplar
+from ..models.exemplar import Exemplar
+from .atualizacao import atualizar_colunas
+from .concorrencia import VersaoDesatualizada
+from .projecao import colunas, opcoes_campos
 
 logger = logging.getLogger(__name__)
 
+DEVOLVIDO = "devolvido"
+JA_DEVOLVIDO = "ja_devolvido"
+NAO_ENCONTRADO = "nao_encontrado"
+
+# Colunas de to_dict(), devolvidas pelo UPDATE ... RETURNING de patch_emprestimo
+COLUNAS_EMPRESTIMO = (
+    Emprestimo.COD,
+    Emprestimo.MAT_ALUNO,
+    Emprestimo.DATA_EMPRESTIMO,
+    Emprestimo.DATA_PREVISTA_DEV,
+    Emprestimo.DATA_DEVOLUCAO,
+    Emprestimo.DATA_ATRASO,
+    Emprestimo.VERSAO,
+)
+
 
 class EmprestimoService:
     @staticmethod
-    def get_all_emprestimos(db: Session, skip: int = 0, limit: int = 100) -> List[Emprestimo]:
+    def opcoes_include(include: AbstractSet[str] = frozenset()) -> list:
+        """
+        Opções de eager loading para os relacionamentos de ?include=.
+
+        O aluno vem no próprio SELECT (JOIN); os exemplares, com seus livros, numa
+        única consulta extra (SELECT ... WHERE COD IN (...)) para a página inteira.
+        """
+        opcoes = []
+        if "aluno" in include:
+            opcoes.append(joinedload(Emprestimo.aluno))
+        if "exemplares.livro" in include:
+            opcoes.append(
+                selectinload(Emprestimo.exemplares).joinedload(Exemplar.livro)
+            )
+        elif "exemplares" in include:
+            opcoes.append(selectinload(Emprestimo.exemplares))
+        return opcoes
+
+    @staticmethod
+    def get_all_emprestimos(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[int] = None,
+        include: AbstractSet[str] = frozenset(),
+        campos: Optional[Sequence[str]] = None,
+    ) -> List[Emprestimo]:
         try:
-            emprestimos = db.query(Emprestimo).offset(skip).limit(limit).all()
+            query = db.query(Emprestimo).order_by(Emprestimo.COD)
+            query = query.options(
+                *EmprestimoService.opcoes_include(include),
+                *opcoes_campos(Emprestimo, campos),
+            )
+            if after is not None:
+                query = query.filter(Emprestimo.COD > after)
+            emprestimos = query.offset(skip).limit(limit).all()
             return emprestimos
         except SQLAlchemyError as e:
             logger.error(f"Erro ao listar empréstimos: {e}")
             return []
 
+    @staticmethod
+    def get_emprestimos_rows(
+        db: Session,
+        limit: int = 100,
+        after: Optional[int] = None,
+        campos: Optional[Sequence[str]] = None,
+    ) -> List[Row]:
+        """
+        Página de empréstimos como linhas do Core: as colunas de campos
+        (?fields=) ou, sem eles, COLUNAS_EMPRESTIMO
+        """
+        try:
+            stmt = select(*colunas(Emprestimo, campos, COLUNAS_EMPRESTIMO))
+            stmt = stmt.order_by(Emprestimo.COD).limit(limit)
+            if after is not None:
+                stmt = stmt.where(Emprestimo.COD > after)
+            return db.execute(stmt).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao listar empréstimos: {e}")
+            return []
+
+    @staticmethod
+    def stream_emprestimos(
+        db: Session, after: Optional[int] = None, batch_size: int = 1000
+    ) -> Iterator[dict]:
+        """Percorre os empréstimos com cursor no servidor, sem materializar a tabela"""
+        try:
+            stmt = select(*COLUNAS_EMPRESTIMO).order_by(Emprestimo.COD)
+            if after is not None:
+                stmt = stmt.where(Emprestimo.COD > after)
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            for row in result:
+                yield row._asdict()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao transmitir empréstimos: {e}")
+            raise
+
     @staticmethod
     def get_emprestimo_by_cod(db: Session, cod: int) -> Optional[Emprestimo]:
         try:
@@ -58,6 +150,36 @@ class EmprestimoService:
             db.rollback()
             return None
 
+    @staticmethod
+    def criar_emprestimo_com_exemplares(
+        db: Session,
+        mat_aluno: int,
+        tombos: List[int],
+        data_emprestimo: date,
+        data_prevista_dev: date,
+    ) -> Emprestimo:
+        """
+        Insere o empréstimo e todas as linhas de EMP_EXEMPLAR na transação atual.
+
+        Não faz commit nem verifica disponibilidade: quem chama já deve ter travado
+        e validado os exemplares na mesma transação.
+        """
+        emprestimo = Emprestimo(
+            MAT_ALUNO=mat_aluno,
+            DATA_EMPRESTIMO=data_emprestimo,
+            DATA_PREVISTA_DEV=data_prevista_dev,
+        )
+        db.add(emprestimo)
+        db.flush()
+        db.execute(
+            insert(EmprestimoExemplar.__table__),
+            [
+                {"cod_emprestimo": emprestimo.COD, "tombo_exemplar": tombo}
+                for tombo in tombos
+            ],
+        )
+        return emprestimo
+
     @staticmethod
     def update_emprestimo(
         db: Session,
@@ -98,6 +220,39 @@ class EmprestimoService:
             db.rollback()
             return None
 
+    @staticmethod
+    def patch_emprestimo(
+        db: Session, cod: int, valores: dict, versoes: Optional[Set[int]] = None
+    ) -> Optional[dict]:
+        """
+        Atualiza apenas as colunas em valores com um único UPDATE ... RETURNING.
+
+        O aluno só é verificado se MAT_ALUNO mudar (ValueError se não existir).
+        Retorna as colunas de to_dict() (datas como date), ou None se o empréstimo
+        não existir.
+        """
+        try:
+            if "MAT_ALUNO" in valores:
+                aluno = db.execute(
+                    select(Aluno.MAT_ALUNO).where(
+                        Aluno.MAT_ALUNO == valores["MAT_ALUNO"]
+                    )
+                ).first()
+                if aluno is None:
+                    raise ValueError("Aluno não encontrado")
+            emprestimo = atualizar_colunas(
+                db, Emprestimo, cod, valores, COLUNAS_EMPRESTIMO, versoes
+            )
+            db.commit()
+            return emprestimo
+        except (ValueError, VersaoDesatualizada):
+            db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao atualizar empréstimo {cod}: {e}")
+            db.rollback()
+            raise
+
     @staticmethod
     def delete_emprestimo(db: Session, cod: int) -> bool:
         try:
@@ -140,6 +295,118 @@ class EmprestimoService:
             db.rollback()
             return None
 
+    @staticmethod
+    def _devolver_cods(
+        db: Session, cods: List[int], data_devolucao: date
+    ) -> List[int]:
+        """UPDATE único nos empréstimos em aberto; retorna os CODs devolvidos"""
+        tabela = Emprestimo.__table__
+        stmt = (
+            update(tabela)
+            .where(tabela.c.COD.in_(cods), tabela.c.DATA_DEVOLUCAO.is_(None))
+            .values(
+                DATA_DEVOLUCAO=data_devolucao,
+                DATA_ATRASO=case(
+                    (tabela.c.DATA_PREVISTA_DEV < data_devolucao, data_devolucao),
+                    else_=tabela.c.DATA_ATRASO,
+                ),
+                # O ORM incrementa VERSAO sozinho; via Core é preciso fazê-lo aqui
+                VERSAO=tabela.c.VERSAO + 1,
+            )
+            .returning(tabela.c.COD)
+        )
+        devolvidos = list(db.execute(stmt).scalars())
+        # UPDATE via Core não passa pelo hook do ORM: publica a invalidação aqui
+        publicar(db, "emprestimo", devolvidos)
+        return devolvidos
+
+    @staticmethod
+    def devolver_emprestimos(
+        db: Session, cods: List[int], data_devolucao: Optional[date] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Devolve vários empréstimos de uma vez, pelo COD.
+
+        Faz um UPDATE ... RETURNING para todos e uma consulta apenas para os que
+        não foram devolvidos, para diferenciar "ja_devolvido" de "nao_encontrado".
+        Retorna o resultado de cada COD, na ordem recebida.
+        """
+        data_devolucao = data_devolucao or datetime.now().date()
+        try:
+            devolvidos = set(
+                EmprestimoService._devolver_cods(db, cods, data_devolucao)
+            )
+            restantes = [cod for cod in cods if cod not in devolvidos]
+            existentes = set()
+            if restantes:
+                stmt = select(Emprestimo.COD).where(Emprestimo.COD.in_(restantes))
+                existentes = set(db.scalars(stmt))
+            db.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao devolver empréstimos em lote: {e}")
+            db.rollback()
+            return None
+
+        logger.info(f"{len(devolvidos)} empréstimos devolvidos em lote")
+        resultado = []
+        for cod in cods:
+            if cod in devolvidos:
+                status = DEVOLVIDO
+            elif cod in existentes:
+                status = JA_DEVOLVIDO
+            else:
+                status = NAO_ENCONTRADO
+            resultado.append({"COD": cod, "STATUS": status})
+        return resultado
+
+    @staticmethod
+    def devolver_por_tombos(
+        db: Session, tombos: List[int], data_devolucao: Optional[date] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Devolve os empréstimos ativos dos tombos lidos (ex.: caixa de devolução).
+
+        Uma consulta agregada encontra o empréstimo ativo de cada tombo e um
+        UPDATE ... RETURNING devolve todos eles. Tombos sem empréstimo registrado
+        são "nao_encontrado"; com empréstimos, mas nenhum em aberto, "ja_devolvido".
+        """
+        data_devolucao = data_devolucao or datetime.now().date()
+        try:
+            ativo = func.max(
+                case((Emprestimo.DATA_DEVOLUCAO.is_(None), Emprestimo.COD))
+            ).label("ativo")
+            stmt = (
+                select(EmprestimoExemplar.tombo_exemplar, ativo)
+                .join(Emprestimo, Emprestimo.COD == EmprestimoExemplar.cod_emprestimo)
+                .where(EmprestimoExemplar.tombo_exemplar.in_(tombos))
+                .group_by(EmprestimoExemplar.tombo_exemplar)
+            )
+            ativos = dict(db.execute(stmt).all())
+            cods = sorted({cod for cod in ativos.values() if cod is not None})
+            devolvidos = set()
+            if cods:
+                devolvidos = set(
+                    EmprestimoService._devolver_cods(db, cods, data_devolucao)
+                )
+            db.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao devolver exemplares em lote: {e}")
+            db.rollback()
+            return None
+
+        logger.info(f"{len(devolvidos)} empréstimos devolvidos por tombo")
+        resultado = []
+        for tombo in tombos:
+            cod = ativos.get(tombo)
+            if tombo not in ativos:
+                status = NAO_ENCONTRADO
+            elif cod in devolvidos:
+                status = DEVOLVIDO
+            else:
+                status = JA_DEVOLVIDO
+            resultado.append({"TOMBO": tombo, "COD": cod, "STATUS": status})
+        return resultado
+
     @staticmethod
     def get_emprestimos_by_aluno(db: Session, mat_aluno: int) -> List[Emprestimo]:
         try:
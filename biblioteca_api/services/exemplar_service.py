@@ -1,36 +1,127 @@
 import logging
-from typing import List, Optional
+from typing import AbstractSet, Dict, Iterator, List, Optional, Sequence, Set
 
+from sqlalchemy import Row, insert, select
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.exc import StaleDataError
 
+from ..cache import cache_para
 from ..models.exemplar import Exemplar
 from ..models.livro import Livro
+from .atualizacao import atualizar_colunas
+from .concorrencia import VersaoDesatualizada, verificar_versao
 
 logger = logging.getLogger(__name__)
 
+# Exemplares por TOMBO, como dicts de to_dict() (CACHE_EXEMPLAR=off|shadow|on)
+exemplar_cache = cache_para("exemplar")
+
+# Colunas de to_dict(), devolvidas pelo UPDATE ... RETURNING de patch_exemplar
+COLUNAS_EXEMPLAR = (Exemplar.TOMBO, Exemplar.COD_LIVRO, Exemplar.VERSAO)
+
 
 class ExemplarService:
+    @staticmethod
+    def opcoes_include(include: AbstractSet[str] = frozenset()) -> list:
+        """Opções de eager loading para ?include= (o livro vem no mesmo SELECT)"""
+        return [joinedload(Exemplar.livro)] if "livro" in include else []
+
     @staticmethod
     def get_all_exemplares(
-        db: Session, skip: int = 0, limit: int = 100
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[int] = None,
+        include: AbstractSet[str] = frozenset(),
     ) -> List[Exemplar]:
         try:
-            exemplares = db.query(Exemplar).offset(skip).limit(limit).all()
+            query = db.query(Exemplar).order_by(Exemplar.TOMBO)
+            query = query.options(*ExemplarService.opcoes_include(include))
+            if after is not None:
+                query = query.filter(Exemplar.TOMBO > after)
+            exemplares = query.offset(skip).limit(limit).all()
             return exemplares
         except SQLAlchemyError as e:
             logger.error(f"Erro ao listar exemplares: {e}")
             return []
 
     @staticmethod
-    def get_exemplar_by_tombo(db: Session, tombo: int) -> Optional[Exemplar]:
+    def get_exemplares_rows(
+        db: Session, limit: int = 100, after: Optional[int] = None
+    ) -> List[Row]:
+        """Página de exemplares como linhas do Core (COLUNAS_EXEMPLAR), sem o ORM"""
         try:
-            exemplar = db.query(Exemplar).filter(Exemplar.TOMBO == tombo).first()
+            stmt = select(*COLUNAS_EXEMPLAR).order_by(Exemplar.TOMBO).limit(limit)
+            if after is not None:
+                stmt = stmt.where(Exemplar.TOMBO > after)
+            return db.execute(stmt).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao listar exemplares: {e}")
+            return []
+
+    @staticmethod
+    def stream_exemplares(
+        db: Session, after: Optional[int] = None, batch_size: int = 1000
+    ) -> Iterator[dict]:
+        """Percorre os exemplares com cursor no servidor, sem materializar a tabela"""
+        try:
+            stmt = select(*COLUNAS_EXEMPLAR).order_by(Exemplar.TOMBO)
+            if after is not None:
+                stmt = stmt.where(Exemplar.TOMBO > after)
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            for row in result:
+                yield row._asdict()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao transmitir exemplares: {e}")
+            raise
+
+    @staticmethod
+    def get_exemplar_by_tombo(
+        db: Session, tombo: int, include: AbstractSet[str] = frozenset()
+    ) -> Optional[Exemplar]:
+        try:
+            exemplar = (
+                db.query(Exemplar)
+                .options(*ExemplarService.opcoes_include(include))
+                .filter(Exemplar.TOMBO == tombo)
+                .first()
+            )
             return exemplar
         except SQLAlchemyError as e:
             logger.error(f"Erro ao buscar exemplar por tombo {tombo}: {e}")
             return None
 
+    @staticmethod
+    def get_exemplar_dict(db: Session, tombo: int) -> Optional[dict]:
+        """Exemplar como dict, servido pelo cache de exemplares quando habilitado"""
+
+        def carregar():
+            exemplar = ExemplarService.get_exemplar_by_tombo(db, tombo)
+            return exemplar.to_dict() if exemplar else None
+
+        return exemplar_cache.buscar(tombo, carregar)
+
+    @staticmethod
+    def get_exemplares_dict(
+        db: Session, tombos: Sequence[int]
+    ) -> Optional[Dict[int, dict]]:
+        """
+        Busca em lote: {TOMBO: dict} dos exemplares existentes, num único SELECT
+        com WHERE TOMBO IN (...) para os que não estiverem no cache. None em caso
+        de erro.
+        """
+
+        def carregar(chaves):
+            exemplares = db.scalars(select(Exemplar).where(Exemplar.TOMBO.in_(chaves)))
+            return {exemplar.TOMBO: exemplar.to_dict() for exemplar in exemplares}
+
+        try:
+            return exemplar_cache.buscar_varios(list(dict.fromkeys(tombos)), carregar)
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao buscar exemplares em lote: {e}")
+            return None
+
     @staticmethod
     def create_exemplar(db: Session, cod_livro: int) -> Optional[Exemplar]:
         try:
@@ -50,15 +141,60 @@ class ExemplarService:
             db.rollback()
             return None
 
+    @staticmethod
+    def create_exemplares_lote(
+        db: Session, cod_livro: int, quantidade: int
+    ) -> Optional[List[dict]]:
+        """
+        Cria vários exemplares de um livro com um único INSERT ... RETURNING.
+
+        Retorna as colunas de to_dict() (com VERSAO) de cada exemplar criado, em
+        ordem de tombo, ou None se o livro não existir; erros do banco são
+        propagados após o rollback.
+        """
+        try:
+            livro = db.get(Livro, cod_livro)
+            if not livro:
+                logger.warning(f"Livro com código {cod_livro} não encontrado")
+                return None
+
+            stmt = (
+                insert(Exemplar.__table__)
+                .values([{"COD_LIVRO": cod_livro}] * quantidade)
+                .returning(*COLUNAS_EXEMPLAR)
+            )
+            exemplares = sorted(
+                (row._asdict() for row in db.execute(stmt)),
+                key=lambda exemplar: exemplar["TOMBO"],
+            )
+            db.commit()
+            logger.info(
+                f"{len(exemplares)} exemplares criados para o livro {cod_livro}: "
+                f"{exemplares[0]['TOMBO']}..{exemplares[-1]['TOMBO']}"
+            )
+            return exemplares
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao criar exemplares em lote: {e}")
+            db.rollback()
+            raise
+
     @staticmethod
     def update_exemplar(
-        db: Session, tombo: int, cod_livro: Optional[int] = None
+        db: Session,
+        tombo: int,
+        cod_livro: Optional[int] = None,
+        versoes: Optional[Set[int]] = None,
     ) -> Optional[Exemplar]:
+        """
+        Atualiza o livro do exemplar. Com versoes (If-Match), lança
+        VersaoDesatualizada se o exemplar não estiver numa delas.
+        """
         try:
             exemplar = db.query(Exemplar).filter(Exemplar.TOMBO == tombo).first()
             if not exemplar:
                 logger.warning(f"Exemplar com tombo {tombo} não encontrado")
                 return None
+            verificar_versao(exemplar, versoes)
 
             if cod_livro is not None:
                 livro = db.query(Livro).filter(Livro.COD == cod_livro).first()
@@ -71,11 +207,45 @@ class ExemplarService:
             db.refresh(exemplar)
             logger.info(f"Exemplar {tombo} atualizado com sucesso")
             return exemplar
+        except StaleDataError:
+            logger.warning(f"Exemplar {tombo} alterado por outra transação")
+            db.rollback()
+            raise VersaoDesatualizada()
         except SQLAlchemyError as e:
             logger.error(f"Erro ao atualizar exemplar {tombo}: {e}")
             db.rollback()
             return None
 
+    @staticmethod
+    def patch_exemplar(
+        db: Session, tombo: int, valores: dict, versoes: Optional[Set[int]] = None
+    ) -> Optional[dict]:
+        """
+        Atualiza apenas as colunas em valores com um único UPDATE ... RETURNING.
+
+        O livro só é verificado se COD_LIVRO mudar (ValueError se não existir).
+        Retorna o exemplar no formato de to_dict(), ou None se não existir.
+        """
+        try:
+            if "COD_LIVRO" in valores:
+                livro = db.execute(
+                    select(Livro.COD).where(Livro.COD == valores["COD_LIVRO"])
+                ).first()
+                if livro is None:
+                    raise ValueError("Livro não encontrado")
+            exemplar = atualizar_colunas(
+                db, Exemplar, tombo, valores, COLUNAS_EXEMPLAR, versoes
+            )
+            db.commit()
+            return exemplar
+        except (ValueError, VersaoDesatualizada):
+            db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao atualizar exemplar {tombo}: {e}")
+            db.rollback()
+            raise
+
     @staticmethod
     def delete_exemplar(db: Session, tombo: int) -> bool:
         try:
@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import IO, Iterable, Iterator, List
+
+from ..models.normalizacao import normalizar
+
+# Quantidade de livros enviada por COPY (ou por executemany, no SQLite)
+BATCH_SIZE = 5000
+
+COLUNAS = ("COD", "TITULO", "AUTOR", "EDITORA", "ANO", "TITULO_NORM", "AUTOR_NORM")
+
+
+def _validar_livro(dados: dict, linha: int) -> dict:
+    titulo = (dados.get("TITULO") or "").strip()
+    if not titulo:
+        raise ValueError(f"Linha {linha}: TITULO é obrigatório")
+
+    ano = dados.get("ANO")
+    if ano in ("", None):
+        ano = None
+    else:
+        try:
+            ano = int(ano)
+        except (TypeError, ValueError):
+            raise ValueError(f"Linha {linha}: ANO inválido ({ano!r})")
+
+    autor = dados.get("AUTOR") or None
+    return {
+        "TITULO": titulo,
+        "AUTOR": autor,
+        "EDITORA": dados.get("EDITORA") or None,
+        "ANO": ano,
+        "TITULO_NORM": normalizar(titulo),
+        "AUTOR_NORM": normalizar(autor),
+    }
+
+
+def ler_livros_csv(arquivo: IO[str]) -> Iterator[dict]:
+    """Lê livros de um CSV com cabeçalho (TITULO,AUTOR,EDITORA,ANO)"""
+    leitor = csv.DictReader(arquivo)
+    for linha, dados in enumerate(leitor, start=2):
+        yield _validar_livro(dados, linha)
+
+
+def ler_livros_ndjson(arquivo: IO[str]) -> Iterator[dict]:
+    """Lê livros de um arquivo NDJSON, um objeto JSON por linha"""
+    for linha, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            dados = json.loads(texto)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Linha {linha}: JSON inválido ({e.msg})")
+        yield _validar_livro(dados, linha)
+
+
+def em_lotes(livros: Iterable[dict], tamanho: int = BATCH_SIZE) -> Iterator[List[dict]]:
+    iterador = iter(livros)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+def copy_livros(connection, livros: Iterable[dict]) -> List[int]:
+    """
+    Insere livros no PostgreSQL com COPY FROM STDIN e retorna os CODs na ordem
+    de entrada.
+
+    Os CODs de cada lote são reservados antes na sequence da tabela, o que evita
+    depender da ordem de um RETURNING. Recebe uma conexão psycopg2 e não faz
+    commit: quem chama controla a transação.
+    """
+    cods = []
+    with connection.cursor() as cursor:
+        for lote in em_lotes(livros):
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence('\"LIVRO\"', 'COD')) "
+                "FROM generate_series(1, %s)",
+                (len(lote),),
+            )
+            cods_lote = [row[0] for row in cursor.fetchall()]
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for cod, livro in zip(cods_lote, lote):
+                writer.writerow([cod] + [livro[coluna] for coluna in COLUNAS[1:]])
+            buffer.seek(0)
+
+            colunas = ", ".join(f'"{coluna}"' for coluna in COLUNAS)
+            cursor.copy_expert(
+                f'COPY "LIVRO" ({colunas}) FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cods.extend(cods_lote)
+    return cods
@@ -1,33 +1,125 @@
 import logging
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
 
+from sqlalchemy import Row, func, insert, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
+from ..cache import cache_para
 from ..models.livro import Livro
+from ..models.normalizacao import normalizar
+from .atualizacao import atualizar_colunas
+from .concorrencia import VersaoDesatualizada, verificar_versao
+from .livro_import import copy_livros, em_lotes
+from .projecao import colunas, opcoes_campos
 
 logger = logging.getLogger(__name__)
 
+# Livros por COD, como dicts de to_dict() (CACHE_LIVRO=off|shadow|on)
+livro_cache = cache_para("livro")
+
+# Colunas de to_dict(), devolvidas pelo UPDATE ... RETURNING de patch_livro
+COLUNAS_LIVRO = (
+    Livro.COD,
+    Livro.TITULO,
+    Livro.AUTOR,
+    Livro.EDITORA,
+    Livro.ANO,
+    Livro.VERSAO,
+)
+
 
 class LivroService:
     @staticmethod
-    def get_all_livros(db: Session, skip: int = 0, limit: int = 100) -> List[Livro]:
+    def get_all_livros(
+        db: Session, skip: int = 0, limit: int = 100, after: Optional[int] = None
+    ) -> List[Livro]:
         try:
-            livros = db.query(Livro).offset(skip).limit(limit).all()
+            query = db.query(Livro).order_by(Livro.COD)
+            if after is not None:
+                query = query.filter(Livro.COD > after)
+            livros = query.offset(skip).limit(limit).all()
             return livros
         except SQLAlchemyError as e:
             logger.error(f"Erro ao listar livros: {e}")
             return []
 
     @staticmethod
-    def get_livro_by_id(db: Session, cod: int) -> Optional[Livro]:
+    def get_livros_rows(
+        db: Session,
+        limit: int = 100,
+        after: Optional[int] = None,
+        campos: Optional[Sequence[str]] = None,
+    ) -> List[Row]:
+        """
+        Página de livros como linhas do Core, sem o ORM: as colunas de campos
+        (?fields=) ou, sem eles, COLUNAS_LIVRO
+        """
         try:
-            livro = db.get(Livro, cod)
+            stmt = select(*colunas(Livro, campos, COLUNAS_LIVRO))
+            stmt = stmt.order_by(Livro.COD).limit(limit)
+            if after is not None:
+                stmt = stmt.where(Livro.COD > after)
+            return db.execute(stmt).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao listar livros: {e}")
+            return []
+
+    @staticmethod
+    def stream_livros(
+        db: Session, after: Optional[int] = None, batch_size: int = 1000
+    ) -> Iterator[dict]:
+        """Percorre os livros com cursor no servidor, sem materializar a tabela"""
+        try:
+            stmt = select(*COLUNAS_LIVRO).order_by(Livro.COD)
+            if after is not None:
+                stmt = stmt.where(Livro.COD > after)
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            for row in result:
+                yield row._asdict()
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao transmitir livros: {e}")
+            raise
+
+    @staticmethod
+    def get_livro_by_id(
+        db: Session, cod: int, campos: Optional[Sequence[str]] = None
+    ) -> Optional[Livro]:
+        try:
+            livro = db.get(Livro, cod, options=opcoes_campos(Livro, campos))
             return livro
         except SQLAlchemyError as e:
             logger.error(f"Erro ao buscar livro por código {cod}: {e}")
             return None
 
+    @staticmethod
+    def get_livro_dict(db: Session, cod: int) -> Optional[dict]:
+        """Livro como dict, servido pelo cache de livros quando habilitado"""
+
+        def carregar():
+            livro = LivroService.get_livro_by_id(db, cod)
+            return livro.to_dict() if livro else None
+
+        return livro_cache.buscar(cod, carregar)
+
+    @staticmethod
+    def get_livros_dict(db: Session, cods: Sequence[int]) -> Optional[Dict[int, dict]]:
+        """
+        Busca em lote: {COD: dict} dos livros existentes, num único SELECT com
+        WHERE COD IN (...) para os que não estiverem no cache. None em caso de erro.
+        """
+
+        def carregar(chaves):
+            livros = db.scalars(select(Livro).where(Livro.COD.in_(chaves)))
+            return {livro.COD: livro.to_dict() for livro in livros}
+
+        try:
+            return livro_cache.buscar_varios(list(dict.fromkeys(cods)), carregar)
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao buscar livros em lote: {e}")
+            return None
+
     @staticmethod
     def create_livro(
         db: Session,
@@ -48,6 +140,37 @@ class LivroService:
             db.rollback()
             return None
 
+    @staticmethod
+    def import_livros(db: Session, livros: Iterable[dict]) -> Optional[List[int]]:
+        """
+        Importa livros em massa numa única transação e retorna os CODs criados.
+
+        No PostgreSQL os dados vão por COPY FROM STDIN na conexão psycopg2 da
+        sessão; nos demais bancos, por executemany em lotes. Erros de validação
+        dos dados (ValueError) são propagados após o rollback.
+        """
+        bind = db.get_bind()
+        try:
+            if bind.dialect.name == "postgresql":
+                cods = copy_livros(db.connection().connection, livros)
+            else:
+                stmt = insert(Livro.__table__).returning(
+                    Livro.__table__.c.COD, sort_by_parameter_order=True
+                )
+                cods = []
+                for lote in em_lotes(livros):
+                    cods.extend(db.execute(stmt, lote).scalars())
+            db.commit()
+            logger.info(f"{len(cods)} livros importados com sucesso")
+            return cods
+        except ValueError:
+            db.rollback()
+            raise
+        except (SQLAlchemyError, bind.dialect.loaded_dbapi.Error) as e:
+            logger.error(f"Erro ao importar livros: {e}")
+            db.rollback()
+            return None
+
     @staticmethod
     def update_livro(
         db: Session,
@@ -56,12 +179,18 @@ class LivroService:
         AUTOR: Optional[str] = None,
         EDITORA: Optional[str] = None,
         ANO: Optional[int] = None,
+        versoes: Optional[Set[int]] = None,
     ) -> Optional[Livro]:
+        """
+        Atualiza os campos informados. Com versoes (If-Match), lança
+        VersaoDesatualizada se o livro não estiver numa delas.
+        """
         try:
             livro = db.get(Livro, cod)
             if not livro:
                 logger.warning(f"Livro com código {cod} não encontrado")
                 return None
+            verificar_versao(livro, versoes)
 
             if TITULO is not None:
                 livro.TITULO = TITULO
@@ -76,11 +205,41 @@ class LivroService:
             db.refresh(livro)
             logger.info(f"Livro {cod} atualizado com sucesso")
             return livro
+        except StaleDataError:
+            logger.warning(f"Livro {cod} alterado por outra transação")
+            db.rollback()
+            raise VersaoDesatualizada()
         except SQLAlchemyError as e:
             logger.error(f"Erro ao atualizar livro {cod}: {e}")
             db.rollback()
             return None
 
+    @staticmethod
+    def patch_livro(
+        db: Session, cod: int, valores: dict, versoes: Optional[Set[int]] = None
+    ) -> Optional[dict]:
+        """
+        Atualiza apenas as colunas em valores com um único UPDATE ... RETURNING.
+
+        Retorna o livro no formato de to_dict(), ou None se não existir. Lança
+        VersaoDesatualizada (If-Match) e propaga erros do banco após o rollback.
+        """
+        valores = dict(valores)
+        for coluna in ("TITULO", "AUTOR"):
+            if coluna in valores:
+                valores[f"{coluna}_NORM"] = normalizar(valores[coluna])
+        try:
+            livro = atualizar_colunas(db, Livro, cod, valores, COLUNAS_LIVRO, versoes)
+            db.commit()
+            return livro
+        except VersaoDesatualizada:
+            db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            logger.error(f"Erro ao atualizar livro {cod}: {e}")
+            db.rollback()
+            raise
+
     @staticmethod
     def delete_livro(db: Session, cod: int) -> bool:
         try:
@@ -100,15 +259,31 @@ class LivroService:
 
     @staticmethod
     def search_livros(
-        db: Session, TITULO: Optional[str] = None, AUTOR: Optional[str] = None
+        db: Session,
+        TITULO: Optional[str] = None,
+        AUTOR: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
     ) -> List[Livro]:
         try:
+            # Os termos são comparados com as colunas normalizadas (sem acentos,
+            # minúsculas), então "informacao" encontra "Informação"
             query = db.query(Livro)
-            if TITULO:
-                query = query.filter(Livro.TITULO.ilike(f"%{TITULO}%"))
-            if AUTOR:
-                query = query.filter(Livro.AUTOR.ilike(f"%{AUTOR}%"))
-            return query.all()
+            relevancia = []
+            for termo, coluna in ((TITULO, Livro.TITULO_NORM), (AUTOR, Livro.AUTOR_NORM)):
+                if termo:
+                    termo = normalizar(termo)
+                    query = query.filter(coluna.like(f"%{termo}%"))
+                    relevancia.append(func.word_similarity(termo, coluna))
+
+            if relevancia and db.get_bind().dialect.name == "postgresql":
+                # No PostgreSQL o LIKE é resolvido pelos índices GIN trigram e o
+                # resultado vem ordenado pela similaridade (pg_trgm) com os termos
+                pontuacao = sum(relevancia[1:], relevancia[0])
+                query = query.order_by(pontuacao.desc(), Livro.COD)
+            else:
+                query = query.order_by(Livro.COD)
+            return query.offset(offset).limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"Erro ao buscar livros: {e}")
             return []
@@ -0,0 +1,16 @@
+from typing import Optional, Sequence
+
+from sqlalchemy.orm import load_only
+
+# Projeção de colunas para ?fields=: só as colunas pedidas entram no SELECT, então
+# as demais não são lidas do banco nem carregadas nos objetos.
+
+
+def colunas(modelo, campos: Optional[Sequence[str]], padrao: Sequence) -> Sequence:
+    """Colunas do SELECT: as dos campos pedidos ou, sem campos, padrao"""
+    return [getattr(modelo, campo) for campo in campos] if campos else padrao
+
+
+def opcoes_campos(modelo, campos: Optional[Sequence[str]]) -> list:
+    """load_only com os campos pedidos (o ORM inclui a chave primária sempre)"""
+    return [load_only(*colunas(modelo, campos, ()))] if campos else []
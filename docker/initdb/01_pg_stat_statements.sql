@@ -0,0 +1,4 @@
+-- Executado pela imagem do PostgreSQL só na criação do volume, no banco
+-- POSTGRES_DB. A biblioteca já vem carregada por shared_preload_libraries
+-- (docker-compose.yaml); a extensão expõe a view lida por "python db.py indices".
+CREATE EXTENSION IF NOT EXISTS pg_stat_statements;
@@ -0,0 +1,29 @@
+"""
+Configuração do gunicorn para produção.
+
+Uso: gunicorn -c gunicorn.conf.py wsgi:app
+
+Cada worker tem o seu próprio pool de conexões, então o total de conexões com o
+banco chega a WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+# Importa a aplicação uma vez no master; os workers herdam o código já carregado
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+
+
+def post_fork(server, worker):
+    # Conexões abertas pelo master (ex.: no create_app) não podem ser
+    # compartilhadas entre processos: o worker descarta as herdadas sem fechá-las
+    # e abre as suas sob demanda.
+    from biblioteca_api import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -27,7 +27,7 @@ sleep 15
 
 echo "🔧 Verificando a inicialização do banco de dados..."
 
-# A inicialização do banco de dados é feita pela aplicação ao iniciar.
+# O container da API executa "python db.py init" antes de subir o gunicorn.
 # Vamos verificar os logs para confirmar que a API está rodando.
 docker-compose logs biblioteca-api
 
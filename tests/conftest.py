@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from biblioteca_api import app, db
+
+
+@contextmanager
+def _capturar_sql():
+    instrucoes = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        instrucoes.append(statement)
+
+    # O engine é obtido num app_context, mas as requisições do client devem ser
+    # feitas fora dele, como nos demais testes
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        yield instrucoes
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+
+@pytest.fixture
+def capturar_sql():
+    """
+    Context manager que registra o SQL enviado ao banco dentro do bloco:
+
+        with capturar_sql() as instrucoes:
+            client.get(...)
+    """
+    return _capturar_sql
@@ -1,7 +1,10 @@
+import json
+
 import pytest
 
 from biblioteca_api import app, db
 from biblioteca_api.models.aluno import Aluno
+from biblioteca_api.services.aluno_service import AlunoService
 
 
 @pytest.fixture
@@ -152,3 +155,102 @@ def test_atualizar_aluno_inexistente(client):
     )
     assert response.status_code == 404
     assert "Aluno não encontrado" in response.get_json()["message"]
+
+
+def test_buscar_aluno_por_nome_sem_acentos(client):
+    client.post(
+        "/Alunos/",
+        json={"NOME": "João Gonçalves", "EMAIL": "joao@teste.com", "CURSO": "Física"},
+    )
+    with app.app_context():
+        alunos = AlunoService.buscar_por_nome(db.session, "joao goncalves")
+        assert [aluno.NOME for aluno in alunos] == ["João Gonçalves"]
+
+
+def test_atualizar_aluno_com_if_match(client):
+    client.post("/Alunos/", json={"NOME": "Aluno Teste", "EMAIL": "aluno@teste.com"})
+    etag = client.get("/Alunos/1").headers["ETag"]
+    assert etag == '"v1"'
+
+    dados = {"NOME": "Aluno Atualizado", "EMAIL": "aluno@teste.com"}
+    response = client.put("/Alunos/1", json=dados, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v2"'
+    assert response.get_json()["VERSAO"] == 2
+
+    # Outro cliente ainda com a versão 1 não sobrescreve a alteração
+    dados = {"NOME": "Alteração Perdida", "EMAIL": "aluno@teste.com"}
+    response = client.put("/Alunos/1", json=dados, headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert client.get("/Alunos/1").get_json()["NOME"] == "Aluno Atualizado"
+
+
+def test_obter_aluno_condicional(client):
+    client.post("/Alunos/", json={"NOME": "Aluno Teste", "EMAIL": "aluno@teste.com"})
+
+    response = client.get("/Alunos/1", headers={"If-None-Match": '"v1"'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"v1"'
+    response = client.get("/Alunos/2", headers={"If-None-Match": '"v1"'})
+    assert response.status_code == 404
+
+
+def test_patch_aluno(client):
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+    client.post("/Alunos/", json={"NOME": "Outro", "EMAIL": "b@teste.com"})
+
+    response = client.patch("/Alunos/1", json={"CURSO": "Física"})
+    assert response.status_code == 200
+    assert response.get_json()["CURSO"] == "Física"
+    assert response.get_json()["EMAIL"] == "a@teste.com"
+
+    assert client.patch("/Alunos/1", json={"EMAIL": "b@teste.com"}).status_code == 409
+    assert client.patch("/Alunos/1", json={"EMAIL": "a@teste.com"}).status_code == 200
+
+
+def test_busca_em_lote_de_alunos(client):
+    for nome in ("Aluno 1", "Aluno 2"):
+        client.post("/Alunos/", json={"NOME": nome, "EMAIL": f"{nome}@teste.com"})
+
+    data = client.post("/Alunos/lookup", json={"ids": [2, 5, 1]}).get_json()
+    assert [aluno and aluno["NOME"] for aluno in data["itens"]] == [
+        "Aluno 2",
+        None,
+        "Aluno 1",
+    ]
+    assert data["nao_encontrados"] == [5]
+    data = client.get("/Alunos/?ids=7,7").get_json()
+    assert data == {"itens": [None, None], "nao_encontrados": [7]}
+    response = client.post("/Alunos/lookup", json={"ids": [1, True]})
+    assert response.status_code == 400
+
+
+def test_listagem_igual_ao_detalhe(client):
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+
+    listado = client.get("/Alunos/").get_json()[0]
+    assert listado == client.get("/Alunos/1").get_json()
+    assert listado["MAT_ALUNO"] == "1"
+
+
+def test_listar_alunos_ndjson_igual_a_listagem(client):
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+
+    response = client.get("/Alunos/", headers={"Accept": "application/x-ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    linhas = [json.loads(linha) for linha in response.data.decode().splitlines()]
+    assert linhas == client.get("/Alunos/").get_json()
+    assert linhas[0]["MAT_ALUNO"] == "1"
+
+
+def test_fields_aluno(client):
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+
+    assert client.get("/Alunos/?fields=NOME").get_json() == [
+        {"MAT_ALUNO": "1", "NOME": "Aluno"}
+    ]
+    assert client.get("/Alunos/1?fields=EMAIL").get_json() == {
+        "MAT_ALUNO": "1",
+        "EMAIL": "a@teste.com",
+    }
+    assert client.get("/Alunos/1?fields=NOME_NORM").status_code == 400
@@ -0,0 +1,133 @@
+import pytest
+
+from biblioteca_api import app, db
+from biblioteca_api.cache import LRUCache
+from biblioteca_api.services.exemplar_service import exemplar_cache
+from biblioteca_api.services.livro_service import livro_cache
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+@pytest.fixture
+def caches_ligados(monkeypatch):
+    for cache in (livro_cache, exemplar_cache):
+        monkeypatch.setattr(cache, "modo", "on")
+        cache.clear()
+    yield
+    for cache in (livro_cache, exemplar_cache):
+        cache.clear()
+
+
+def test_lru_descarta_o_menos_usado():
+    cache = LRUCache("teste", maxsize=2, modo="on")
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expira_entradas():
+    relogio = Relogio()
+    cache = LRUCache("teste", ttl=10, modo="on", relogio=relogio)
+    cache.set(1, "a")
+    relogio.agora = 9.9
+    assert cache.get(1) == "a"
+    relogio.agora = 10
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_modo_shadow_sempre_consulta_o_banco():
+    cache = LRUCache("teste", modo="shadow")
+    valores = iter(["v1", "v1", "v2"])
+    carregar = lambda: next(valores)  # noqa: E731
+
+    assert [cache.buscar(1, carregar) for _ in range(3)] == ["v1", "v1", "v2"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["divergencias"]) == (2, 1, 1)
+
+
+def test_modo_off_nao_guarda_nada():
+    cache = LRUCache("teste")
+    assert cache.buscar(1, lambda: "a") == "a"
+    assert cache.stats()["entradas"] == 0
+
+
+def test_buscar_varios_consulta_so_as_chaves_fora_do_cache():
+    cache = LRUCache("teste", modo="on")
+    consultas = []
+
+    def carregar(chaves):
+        consultas.append(list(chaves))
+        return {chave: f"v{chave}" for chave in chaves if chave != 3}
+
+    assert cache.buscar_varios([1, 2, 3], carregar) == {1: "v1", 2: "v2"}
+    assert cache.buscar_varios([2, 3, 4], carregar) == {2: "v2", 4: "v4"}
+    assert consultas == [[1, 2, 3], [3, 4]]
+
+
+def test_modo_invalido():
+    with pytest.raises(ValueError):
+        LRUCache("teste", modo="talvez")
+
+
+def test_get_livro_usa_cache_e_put_invalida(client, caches_ligados):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor"})
+
+    assert client.get("/Livros/1").get_json()["TITULO"] == "Livro Teste"
+    assert client.get("/Livros/1").get_json()["TITULO"] == "Livro Teste"
+    assert (livro_cache.hits, livro_cache.misses) == (1, 1)
+
+    client.put("/Livros/1", json={"TITULO": "Novo Título"})
+    assert client.get("/Livros/1").get_json()["TITULO"] == "Novo Título"
+
+    client.delete("/Livros/1")
+    assert client.get("/Livros/1").status_code == 404
+
+
+def test_get_exemplar_usa_cache_e_put_invalida(client, caches_ligados):
+    client.post("/Livros/", json={"TITULO": "Livro 1", "AUTOR": "Autor"})
+    client.post("/Livros/", json={"TITULO": "Livro 2", "AUTOR": "Autor"})
+    client.post("/Exemplares/", json={"COD_LIVRO": 1})
+
+    assert client.get("/Exemplares/1").get_json()["COD_LIVRO"] == 1
+    assert client.get("/Exemplares/1").get_json()["COD_LIVRO"] == 1
+    assert exemplar_cache.hits == 1
+
+    client.put("/Exemplares/1", json={"COD_LIVRO": 2})
+    assert client.get("/Exemplares/1").get_json()["COD_LIVRO"] == 2
+
+
+def test_status_cache(client, caches_ligados):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor"})
+    client.get("/Livros/1")
+    client.get("/Livros/1")
+
+    stats = client.get("/status/cache").get_json()
+    assert stats["livro"]["modo"] == "on"
+    assert stats["livro"]["hit_rate"] == 0.5
+    assert "exemplar" in stats
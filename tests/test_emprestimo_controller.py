@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, timedelta
 
 import pytest
@@ -5,6 +6,8 @@ import pytest
 from biblioteca_api import app, db
 from biblioteca_api.models.aluno import Aluno
 from biblioteca_api.models.emprestimo import Emprestimo
+from biblioteca_api.models.exemplar import Exemplar
+from biblioteca_api.models.livro import Livro
 
 
 @pytest.fixture
@@ -168,3 +171,233 @@ def test_listar_emprestimos_por_aluno_inexistente(client):
     response = client.get("/Emprestimos/aluno/99999")
     assert response.status_code == 404
     assert "Aluno não encontrado" in response.get_json()["message"]
+
+
+def test_listar_emprestimos_ndjson(client):
+    for _ in range(3):
+        client.post("/Emprestimos/", json={"MAT_ALUNO": 12345})
+    response = client.get(
+        "/Emprestimos/?after=1", headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    linhas = [json.loads(linha) for linha in response.data.decode().splitlines()]
+    assert [linha["COD"] for linha in linhas] == [2, 3]
+    assert linhas[0]["DATA_EMPRESTIMO"] == datetime.now().strftime("%Y-%m-%d")
+    assert linhas[0]["DATA_DEVOLUCAO"] is None
+    assert linhas == client.get("/Emprestimos/?after=1").get_json()
+
+
+@pytest.fixture
+def exemplares(client):
+    with app.app_context():
+        db.session.add(Livro(TITULO="Livro Teste", AUTOR="Autor Teste"))
+        db.session.add_all([Exemplar(TOMBO=tombo, COD_LIVRO=1) for tombo in (1, 2, 3)])
+        db.session.commit()
+
+
+def test_checkout(client, exemplares):
+    response = client.post(
+        "/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [1, 2, 3]}
+    )
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data["MAT_ALUNO"] == 12345
+    assert data["TOMBOS"] == [1, 2, 3]
+    itens = client.get(f"/Emprestimo-exemplares/emprestimo/{data['COD']}").get_json()
+    assert sorted(item["TOMBO_EXEMPLAR"] for item in itens) == [1, 2, 3]
+
+
+def test_checkout_exemplar_indisponivel_nao_cria_emprestimo(client, exemplares):
+    client.post("/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [2]})
+    response = client.post(
+        "/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [1, 2]}
+    )
+    assert response.status_code == 400
+    assert "Exemplares já emprestados: 2" in response.get_json()["message"]
+    assert len(client.get("/Emprestimos/").get_json()) == 1
+
+
+def test_checkout_exemplar_inexistente(client, exemplares):
+    response = client.post(
+        "/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [1, 99]}
+    )
+    assert response.status_code == 400
+    assert "Exemplares não encontrados: 99" in response.get_json()["message"]
+    assert client.get("/Emprestimos/").get_json() == []
+
+
+def test_devolver_emprestimos_em_lote(client):
+    cods = [
+        client.post("/Emprestimos/", json={"MAT_ALUNO": 12345}).get_json()["COD"]
+        for _ in range(2)
+    ]
+    client.put(f"/Emprestimos/devolver/{cods[1]}")
+    response = client.put("/Emprestimos/devolver", json={"CODS": cods + [9999]})
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {"COD": cods[0], "STATUS": "devolvido"},
+        {"COD": cods[1], "STATUS": "ja_devolvido"},
+        {"COD": 9999, "STATUS": "nao_encontrado"},
+    ]
+    emprestimo = client.get(f"/Emprestimos/{cods[0]}").get_json()
+    assert emprestimo["DATA_DEVOLUCAO"] == datetime.now().strftime("%Y-%m-%d")
+    assert emprestimo["DATA_ATRASO"] is None
+
+
+def test_devolver_emprestimos_por_tombo_com_atraso(client, exemplares):
+    checkout = client.post(
+        "/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [1, 2]}
+    ).get_json()
+    with app.app_context():
+        emprestimo = db.session.get(Emprestimo, checkout["COD"])
+        emprestimo.DATA_PREVISTA_DEV = datetime.now().date() - timedelta(days=1)
+        db.session.commit()
+
+    response = client.put("/Emprestimos/devolver", json={"TOMBOS": [1, 2, 3, 99]})
+    assert response.status_code == 200
+    cod = checkout["COD"]
+    assert response.get_json() == [
+        {"TOMBO": 1, "COD": cod, "STATUS": "devolvido"},
+        {"TOMBO": 2, "COD": cod, "STATUS": "devolvido"},
+        {"TOMBO": 3, "STATUS": "nao_encontrado"},
+        {"TOMBO": 99, "STATUS": "nao_encontrado"},
+    ]
+    emprestimo = client.get(f"/Emprestimos/{cod}").get_json()
+    assert emprestimo["DATA_ATRASO"] == datetime.now().strftime("%Y-%m-%d")
+
+    response = client.put("/Emprestimos/devolver", json={"TOMBOS": [1]})
+    assert response.get_json() == [{"TOMBO": 1, "STATUS": "ja_devolvido"}]
+
+
+def test_listar_emprestimos_por_aluno_condicional(client):
+    client.post("/Emprestimos/", json={"MAT_ALUNO": 12345})
+    etag = client.get("/Emprestimos/aluno/12345").headers["ETag"]
+
+    response = client.get(
+        "/Emprestimos/aluno/12345", headers={"If-None-Match": f"W/{etag}, \"outro\""}
+    )
+    assert response.status_code == 304
+
+    client.put("/Emprestimos/devolver/1")
+    response = client.get("/Emprestimos/aluno/12345", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()[0]["DATA_DEVOLUCAO"] is not None
+
+
+def test_devolucao_em_lote_incrementa_versao(client):
+    client.post("/Emprestimos/", json={"MAT_ALUNO": 12345})
+    etag = client.get("/Emprestimos/1").headers["ETag"]
+
+    client.put("/Emprestimos/devolver", json={"CODS": [1]})
+
+    assert client.get("/Emprestimos/1").headers["ETag"] != etag
+    response = client.put(
+        "/Emprestimos/1",
+        json={
+            "MAT_ALUNO": 12345,
+            "DATA_EMPRESTIMO": "2024-01-01",
+            "DATA_PREVISTA_DEV": "2024-01-15",
+        },
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 412
+
+
+def test_patch_emprestimo(client):
+    client.post("/Emprestimos/", json={"MAT_ALUNO": 12345})
+
+    response = client.patch(
+        "/Emprestimos/1",
+        json={"DATA_PREVISTA_DEV": "2030-01-31"},
+        headers={"If-Match": '"v1"'},
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["DATA_PREVISTA_DEV"] == "2030-01-31"
+    assert data["MAT_ALUNO"] == 12345
+    assert data["VERSAO"] == 2
+
+    response = client.patch("/Emprestimos/1", json={"DATA_DEVOLUCAO": "31/01/2030"})
+    assert response.status_code == 400
+    response = client.patch("/Emprestimos/1", json={"MAT_ALUNO": 999})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Aluno não encontrado"
+    response = client.patch("/Emprestimos/9", json={"DATA_ATRASO": None})
+    assert response.status_code == 404
+
+
+def test_listar_emprestimos_com_include(client, exemplares, capturar_sql):
+    for tombos in ([1, 2], [3]):
+        client.post(
+            "/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": tombos}
+        )
+    with capturar_sql() as instrucoes:
+        response = client.get("/Emprestimos/?include=aluno,exemplares.livro")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data[0]["aluno"]["NOME"] == "Aluno Teste"
+    assert [e["TOMBO"] for e in data[0]["exemplares"]] == [1, 2]
+    assert data[1]["exemplares"][0]["livro"]["TITULO"] == "Livro Teste"
+    # Um SELECT para empréstimos + aluno + outro para exemplares + livro,
+    # independentemente do tamanho da página
+    assert [instrucao.split()[0] for instrucao in instrucoes] == ["SELECT", "SELECT"]
+
+
+def test_obter_emprestimo_com_include(client, exemplares):
+    client.post("/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [2]})
+
+    response = client.get("/Emprestimos/1?include=exemplares")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert "aluno" not in data
+    assert data["exemplares"] == [{"TOMBO": 2, "COD_LIVRO": 1, "VERSAO": 1}]
+
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/Emprestimos/1?include=exemplares", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert "aluno" not in client.get("/Emprestimos/aluno/12345").get_json()[0]
+
+
+def test_include_invalido(client):
+    response = client.get("/Emprestimos/?include=aluno,livro")
+    assert response.status_code == 400
+    assert "livro" in response.get_json()["message"]
+
+
+def test_listagem_igual_ao_detalhe(client):
+    client.post("/Emprestimos/", json={"MAT_ALUNO": 12345})
+    client.put("/Emprestimos/devolver/1")
+
+    # A listagem sai das linhas do Core, sem marshal; o formato deve ser o mesmo
+    listado = client.get("/Emprestimos/").get_json()[0]
+    assert listado == client.get("/Emprestimos/1").get_json()
+    assert listado["DATA_DEVOLUCAO"] == datetime.now().strftime("%Y-%m-%d")
+    assert listado["DATA_ATRASO"] is None
+
+
+def test_fields_emprestimo(client, exemplares):
+    client.post("/Emprestimos/checkout", json={"MAT_ALUNO": 12345, "TOMBOS": [1]})
+
+    hoje = datetime.now().strftime("%Y-%m-%d")
+    assert client.get("/Emprestimos/?fields=DATA_EMPRESTIMO").get_json() == [
+        {"COD": 1, "DATA_EMPRESTIMO": hoje}
+    ]
+    data = client.get("/Emprestimos/1?fields=MAT_ALUNO&include=aluno").get_json()
+    assert data == {
+        "COD": 1,
+        "MAT_ALUNO": 12345,
+        "aluno": {
+            "MAT_ALUNO": "12345",
+            "NOME": "Aluno Teste",
+            "EMAIL": "aluno@teste.com",
+            "CURSO": "Curso Teste",
+            "VERSAO": 1,
+        },
+    }
+    data = client.get("/Emprestimos/?fields=COD&include=exemplares").get_json()
+    exemplar = {"TOMBO": 1, "COD_LIVRO": 1, "VERSAO": 1}
+    assert data == [{"COD": 1, "exemplares": [exemplar]}]
@@ -0,0 +1,88 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from biblioteca_api import db
+from biblioteca_api.models.aluno import Aluno
+from biblioteca_api.models.emprestimo import Emprestimo
+from biblioteca_api.models.emprestimo_exemplar import EmprestimoExemplar
+from biblioteca_api.models.exemplar import Exemplar
+from biblioteca_api.models.livro import Livro
+from biblioteca_api.services.emprestimo_exemplar_service import (
+    EmprestimoExemplarService,
+    ExemplarEmprestado,
+)
+
+WORKERS = 16
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Banco em arquivo: cada thread usa a sua própria conexão, como balcões
+    # diferentes atendendo ao mesmo tempo
+    engine = create_engine(f"sqlite:///{tmp_path / 'checkout.db'}")
+    db.metadata.create_all(engine)
+    hoje = datetime.now().date()
+    with Session(engine) as session:
+        session.add(Aluno(MAT_ALUNO=1, NOME="Aluno Teste", EMAIL="aluno@teste.com"))
+        session.add(Livro(TITULO="Livro Teste", AUTOR="Autor Teste"))
+        session.add(Exemplar(TOMBO=1, COD_LIVRO=1))
+        for cod in range(1, WORKERS + 1):
+            session.add(
+                Emprestimo(
+                    COD=cod,
+                    MAT_ALUNO=1,
+                    DATA_EMPRESTIMO=hoje,
+                    DATA_PREVISTA_DEV=hoje + timedelta(days=15),
+                )
+            )
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def test_checkout_concorrente_do_mesmo_tombo(engine):
+    barreira = threading.Barrier(WORKERS)
+    resultados = []
+
+    def balcao(cod_emprestimo):
+        with Session(engine) as session:
+            barreira.wait()
+            try:
+                resultado = EmprestimoExemplarService.emprestar_exemplar(
+                    session, cod_emprestimo, 1
+                )
+                resultados.append("emprestado" if resultado else repr(resultado))
+            except ExemplarEmprestado:
+                resultados.append("ExemplarEmprestado")
+            except Exception as e:
+                # Qualquer outra falha (ex.: "database is locked") fica registrada
+                # e derruba as asserções abaixo, em vez de sumir com a thread
+                resultados.append(repr(e))
+
+    threads = [
+        threading.Thread(target=balcao, args=(cod,)) for cod in range(1, WORKERS + 1)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(resultados) == WORKERS
+    assert sorted(resultados) == sorted(
+        ["emprestado"] + ["ExemplarEmprestado"] * (WORKERS - 1)
+    )
+    with Session(engine) as session:
+        ativos = session.scalar(
+            select(func.count())
+            .select_from(EmprestimoExemplar)
+            .join(Emprestimo)
+            .where(
+                EmprestimoExemplar.tombo_exemplar == 1,
+                Emprestimo.DATA_DEVOLUCAO.is_(None),
+            )
+        )
+    assert ativos == 1
@@ -1,12 +1,16 @@
 from datetime import datetime, timedelta
 
 import pytest
+from sqlalchemy.exc import OperationalError
 
 from biblioteca_api import app, db
 from biblioteca_api.models.aluno import Aluno
 from biblioteca_api.models.emprestimo import Emprestimo
 from biblioteca_api.models.exemplar import Exemplar
 from biblioteca_api.models.livro import Livro
+from biblioteca_api.services.emprestimo_exemplar_service import (
+    EmprestimoExemplarService,
+)
 
 
 @pytest.fixture
@@ -188,3 +192,63 @@ def test_listar_emprestimos_por_exemplar_inexistente(client):
     response = client.get("/Emprestimo-exemplares/exemplar/999")
     assert response.status_code == 404
     assert "Exemplar não encontrado" in response.get_json()["message"]
+
+
+def test_listar_emprestimo_exemplares_paginado_por_chave_composta(client):
+    with app.app_context():
+        db.session.add(Exemplar(TOMBO=2, COD_LIVRO=1))
+        db.session.commit()
+    client.post("/Emprestimo-exemplares/", json={"COD_EMPRESTIMO": 1, "TOMBO_EXEMPLAR": 1})
+    client.post("/Emprestimo-exemplares/", json={"COD_EMPRESTIMO": 1, "TOMBO_EXEMPLAR": 2})
+
+    response = client.get("/Emprestimo-exemplares/?limit=1")
+    assert response.status_code == 200
+    assert response.headers["X-Next-Cursor"] == "1,1"
+
+    response = client.get("/Emprestimo-exemplares/?after=1,1&limit=1")
+    data = response.get_json()
+    assert data == [{"COD_EMPRESTIMO": 1, "TOMBO_EXEMPLAR": 2}]
+
+
+def test_listar_emprestimo_exemplares_cursor_invalido(client):
+    response = client.get("/Emprestimo-exemplares/?after=abc")
+    assert response.status_code == 400
+
+
+def test_criar_emprestimo_exemplar_ja_emprestado(client):
+    with app.app_context():
+        db.session.add(
+            Emprestimo(
+                COD=2,
+                MAT_ALUNO=1,
+                DATA_EMPRESTIMO=datetime.now().date(),
+                DATA_PREVISTA_DEV=(datetime.now() + timedelta(days=15)).date(),
+            )
+        )
+        db.session.commit()
+    client.post("/Emprestimo-exemplares/", json={"COD_EMPRESTIMO": 1, "TOMBO_EXEMPLAR": 1})
+    response = client.post(
+        "/Emprestimo-exemplares/", json={"COD_EMPRESTIMO": 2, "TOMBO_EXEMPLAR": 1}
+    )
+    assert response.status_code == 400
+    assert "Exemplar já está emprestado" in response.get_json()["message"]
+
+    client.put("/Emprestimos/devolver/1")
+    response = client.post(
+        "/Emprestimo-exemplares/", json={"COD_EMPRESTIMO": 2, "TOMBO_EXEMPLAR": 1}
+    )
+    assert response.status_code == 201
+
+
+def test_criar_emprestimo_exemplar_erro_no_banco(client, monkeypatch):
+    def falha(db, tombo_exemplar):
+        raise OperationalError("SELECT", {}, Exception("conexão perdida"))
+
+    monkeypatch.setattr(
+        EmprestimoExemplarService, "exemplar_emprestado", staticmethod(falha)
+    )
+    response = client.post(
+        "/Emprestimo-exemplares/", json={"COD_EMPRESTIMO": 1, "TOMBO_EXEMPLAR": 1}
+    )
+    assert response.status_code == 500
+    assert "Erro ao emprestar exemplar" in response.get_json()["message"]
@@ -1,4 +1,6 @@
 import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
 
 from biblioteca_api import app, db
 from biblioteca_api.models.exemplar import Exemplar
@@ -180,3 +182,114 @@ def test_atualizar_exemplar_sem_cod_livro(client):
     )
     assert response.status_code == 400
     assert "COD_LIVRO é obrigatório" in response.get_json()["error"]
+
+
+def test_listar_exemplares_ndjson(client):
+    for _ in range(2):
+        client.post("/Exemplares/", json={"COD_LIVRO": 1})
+    response = client.get("/Exemplares/", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.data.decode().splitlines() == [
+        '{"TOMBO":1,"COD_LIVRO":1,"VERSAO":1}',
+        '{"TOMBO":2,"COD_LIVRO":1,"VERSAO":1}',
+    ]
+
+
+def test_listar_exemplares_ndjson_erro_no_banco(client):
+    client.post("/Exemplares/", json={"COD_LIVRO": 1})
+
+    def falhar_select(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            raise OperationalError(statement, parameters, Exception("sem conexão"))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", falhar_select)
+    try:
+        # O erro chega ao servidor em vez de encerrar o corpo como se estivesse
+        # completo
+        with pytest.raises(OperationalError):
+            client.get("/Exemplares/", headers={"Accept": "application/x-ndjson"})
+    finally:
+        event.remove(engine, "before_cursor_execute", falhar_select)
+
+
+def test_criar_exemplares_lote(client):
+    response = client.post("/Exemplares/livro/1/lote", json={"QUANTIDADE": 40})
+    assert response.status_code == 201
+    data = response.get_json()
+    assert len(data) == 40
+    assert [exemplar["TOMBO"] for exemplar in data] == list(range(1, 41))
+    assert all(exemplar["COD_LIVRO"] == 1 for exemplar in data)
+    assert data[0] == client.get("/Exemplares/1").get_json()
+    assert data[0]["VERSAO"] == 1
+    assert len(client.get("/Exemplares/livro/1").get_json()) == 40
+
+
+def test_criar_exemplares_lote_livro_inexistente(client):
+    response = client.post("/Exemplares/livro/999/lote", json={"QUANTIDADE": 2})
+    assert response.status_code == 404
+    assert "Livro não encontrado" in response.get_json()["error"]
+
+
+def test_criar_exemplares_lote_erro_no_banco(client):
+    def falhar_insert(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            raise OperationalError(statement, parameters, Exception("disco cheio"))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", falhar_insert)
+    try:
+        response = client.post("/Exemplares/livro/1/lote", json={"QUANTIDADE": 2})
+    finally:
+        event.remove(engine, "before_cursor_execute", falhar_insert)
+    assert response.status_code == 500
+    assert response.get_json()["error"] == "Erro ao criar exemplares"
+    assert client.get("/Exemplares/livro/1").get_json() == []
+
+
+def test_criar_exemplares_lote_quantidade_invalida(client):
+    response = client.post("/Exemplares/livro/1/lote", json={"QUANTIDADE": 0})
+    assert response.status_code == 400
+
+
+def test_patch_exemplar(client):
+    client.post("/Exemplares/", json={"COD_LIVRO": 1})
+
+    response = client.patch("/Exemplares/1", json={"COD_LIVRO": 2})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Livro não encontrado"}
+
+    with app.app_context():
+        db.session.add(Livro(TITULO="Outro Livro", AUTOR="Autor"))
+        db.session.commit()
+    response = client.patch("/Exemplares/1", json={"COD_LIVRO": 2})
+    assert response.status_code == 200
+    assert response.get_json() == {"TOMBO": 1, "COD_LIVRO": 2, "VERSAO": 2}
+    assert response.headers["ETag"] == '"v2"'
+
+
+def test_exemplar_com_include_livro(client):
+    client.post("/Exemplares/", json={"COD_LIVRO": 1})
+
+    data = client.get("/Exemplares/?include=livro").get_json()
+    assert data[0]["livro"]["TITULO"] == "Livro Teste"
+    data = client.get("/Exemplares/1?include=livro").get_json()
+    assert data["livro"]["COD"] == 1
+    assert "livro" not in client.get("/Exemplares/1").get_json()
+    assert client.get("/Exemplares/?include=aluno").status_code == 400
+
+
+def test_busca_em_lote_de_exemplares(client):
+    client.post("/Exemplares/livro/1/lote", json={"QUANTIDADE": 2})
+
+    data = client.post("/Exemplares/lookup", json={"ids": [2, 3, 1]}).get_json()
+    assert data["itens"] == [
+        {"TOMBO": 2, "COD_LIVRO": 1, "VERSAO": 1},
+        None,
+        {"TOMBO": 1, "COD_LIVRO": 1, "VERSAO": 1},
+    ]
+    assert data["nao_encontrados"] == [3]
+    assert client.get("/Exemplares/?ids=1").get_json()["itens"][0]["TOMBO"] == 1
@@ -0,0 +1,56 @@
+from biblioteca_api.index_advisor import colunas_filtradas, sugerir_indices
+
+TABELAS = ["ALUNO", "LIVRO", "EXEMPLAR", "EMPRESTIMO", "EMP_EXEMPLAR"]
+
+
+def test_colunas_filtradas_sql_do_sqlalchemy():
+    sql = (
+        'SELECT "EMPRESTIMO"."COD", "EMPRESTIMO"."MAT_ALUNO" FROM "EMPRESTIMO" '
+        'WHERE "EMPRESTIMO"."MAT_ALUNO" = $1 ORDER BY "EMPRESTIMO"."COD"'
+    )
+    assert colunas_filtradas(sql, TABELAS) == {("EMPRESTIMO", "MAT_ALUNO")}
+
+
+def test_colunas_filtradas_juncao_e_colunas_minusculas():
+    sql = (
+        'SELECT "EXEMPLAR"."TOMBO" FROM "EXEMPLAR" JOIN "EMP_EXEMPLAR" '
+        'ON "EXEMPLAR"."TOMBO" = "EMP_EXEMPLAR".tombo_exemplar '
+        'WHERE "EMP_EXEMPLAR".cod_emprestimo IN ($1, $2) AND pg_class.relname = $3'
+    )
+    assert colunas_filtradas(sql, TABELAS) == {
+        ("EXEMPLAR", "TOMBO"),
+        ("EMP_EXEMPLAR", "tombo_exemplar"),
+        ("EMP_EXEMPLAR", "cod_emprestimo"),
+    }
+
+
+def test_sugerir_indices_ignora_colunas_indexadas():
+    consultas = [
+        {
+            "query": 'SELECT 1 FROM "EXEMPLAR" WHERE "EXEMPLAR"."COD_LIVRO" = $1',
+            "calls": 500,
+            "total_exec_time": 1200.0,
+        },
+        {
+            "query": 'SELECT 1 FROM "ALUNO" WHERE "ALUNO"."EMAIL" = $1',
+            "calls": 10,
+            "total_exec_time": 2000.0,
+        },
+        {
+            "query": 'SELECT 1 FROM "ALUNO" WHERE "ALUNO"."MAT_ALUNO" = $1',
+            "calls": 9000,
+            "total_exec_time": 900.0,
+        },
+    ]
+    indexadas = {("ALUNO", "MAT_ALUNO")}
+
+    sugestoes = sugerir_indices(consultas, indexadas, TABELAS)
+
+    assert [(s["tabela"], s["coluna"]) for s in sugestoes] == [
+        ("ALUNO", "EMAIL"),
+        ("EXEMPLAR", "COD_LIVRO"),
+    ]
+    assert sugestoes[1]["chamadas"] == 500
+    assert sugestoes[1]["ddl"] == (
+        'CREATE INDEX CONCURRENTLY "ix_exemplar_cod_livro" ON "EXEMPLAR" ("COD_LIVRO")'
+    )
@@ -0,0 +1,140 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from biblioteca_api import app, db
+from biblioteca_api.invalidacao import (
+    OuvinteInvalidacao,
+    barramento_memoria,
+    codificar,
+    decodificar,
+    garantir_ouvinte,
+)
+from biblioteca_api.models.aluno import Aluno
+from biblioteca_api.services.livro_service import LivroService, livro_cache
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+@pytest.fixture
+def mensagens():
+    # Faz o papel de outro worker assinando o barramento
+    recebidas = []
+
+    def assinante(entidade, chaves):
+        recebidas.append((entidade, list(chaves)))
+
+    barramento_memoria.assinar(assinante)
+    yield recebidas
+    barramento_memoria.cancelar(assinante)
+
+
+def test_codificar_divide_em_mensagens():
+    mensagens = codificar("emprestimo", list(range(1, 1201)))
+    assert len(mensagens) == 3
+    assert decodificar(mensagens[0]) == ("emprestimo", list(range(1, 501)))
+    assert decodificar("livro:7") == ("livro", [7])
+
+
+def test_escritas_do_orm_publicam_no_commit(client, mensagens):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor"})
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+    assert mensagens == []
+
+    client.put("/Livros/1", json={"TITULO": "Outro Título"})
+    client.put("/Alunos/1", json={"NOME": "Outro Nome", "EMAIL": "a@teste.com"})
+    client.delete("/Livros/1")
+
+    assert mensagens == [("livro", [1]), ("aluno", [1]), ("livro", [1])]
+
+
+def test_rollback_descarta_publicacoes(client, mensagens):
+    with app.app_context():
+        db.session.add(Aluno(NOME="Aluno", EMAIL="a@teste.com"))
+        db.session.commit()
+        aluno = db.session.get(Aluno, 1)
+        aluno.NOME = "Não confirmado"
+        db.session.flush()
+        db.session.rollback()
+
+    assert mensagens == []
+
+
+def test_devolucao_em_lote_publica_emprestimos(client, mensagens):
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+    for _ in range(2):
+        client.post(
+            "/Emprestimos/",
+            json={
+                "MAT_ALUNO": 1,
+                "DATA_EMPRESTIMO": "2024-01-01",
+                "DATA_PREVISTA_DEV": "2024-01-15",
+            },
+        )
+
+    client.put("/Emprestimos/devolver", json={"CODS": [1, 2, 3]})
+
+    assert ("emprestimo", [1, 2]) in mensagens
+
+
+def test_sem_ouvinte_fora_do_postgresql(client):
+    with app.app_context():
+        assert garantir_ouvinte(db.engine) is None
+
+
+class ConexaoFalsa:
+    """Imita o suficiente de uma conexão psycopg2 para select() e poll()"""
+
+    def __init__(self):
+        self._leitor, self._escritor = socket.socketpair()
+        self.notifies = []
+
+    def fileno(self):
+        return self._leitor.fileno()
+
+    def poll(self):
+        self._leitor.recv(1024)
+
+    def notificar(self, payload):
+        self.notifies.append(SimpleNamespace(payload=payload))
+        self._escritor.send(b"!")
+
+
+def test_ouvinte_evicta_cache_local(client, monkeypatch):
+    monkeypatch.setattr(livro_cache, "modo", "on")
+    livro_cache.clear()
+    with app.app_context():
+        livro = LivroService.create_livro(db.session, "Livro Teste", "Autor")
+        LivroService.get_livro_dict(db.session, livro.COD)
+    assert livro_cache.stats()["entradas"] == 1
+
+    conexao = ConexaoFalsa()
+    ouvinte = OuvinteInvalidacao(engine=None, intervalo=0.05)
+    thread = threading.Thread(target=ouvinte._escutar, args=(conexao,))
+    thread.start()
+    try:
+        conexao.notificar("livro:1")
+        limite = time.monotonic() + 2
+        while livro_cache.stats()["entradas"] and time.monotonic() < limite:
+            time.sleep(0.01)
+    finally:
+        ouvinte.parar()
+        thread.join()
+
+    assert livro_cache.stats()["entradas"] == 0
+    assert livro_cache.stats()["invalidations"] == 1
+    livro_cache.clear()
@@ -1,7 +1,11 @@
 import pytest
+from sqlalchemy.orm import Session
 
+import db as db_cli
 from biblioteca_api import app, db
 from biblioteca_api.models.livro import Livro
+from biblioteca_api.services.concorrencia import VersaoDesatualizada
+from biblioteca_api.services.livro_service import LivroService
 
 
 @pytest.fixture
@@ -219,3 +223,237 @@ def test_buscar_livros_por_titulo_e_autor(client):
     assert len(data) == 1
     assert data[0]["TITULO"] == "Introdução à Programação"
     assert data[0]["AUTOR"] == "Ana Programadora"
+
+
+def test_listar_livros_paginado_por_cursor(client):
+    for i in range(5):
+        client.post(
+            "/Livros/",
+            json={"TITULO": f"Livro Página {i}", "AUTOR": "Autor Paginado"},
+        )
+    response = client.get("/Livros/?limit=2")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [livro["COD"] for livro in data] == [1, 2]
+    assert response.headers["X-Next-Cursor"] == "2"
+    assert 'rel="next"' in response.headers["Link"]
+
+    response = client.get("/Livros/?after=4&limit=2")
+    data = response.get_json()
+    assert [livro["COD"] for livro in data] == [5]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_listar_livros_limit_invalido(client):
+    response = client.get("/Livros/?limit=0")
+    assert response.status_code == 400
+
+
+def test_buscar_livros_paginado(client):
+    for i in range(3):
+        client.post(
+            "/Livros/",
+            json={"TITULO": f"Banco de Dados {i}", "AUTOR": "Autor Busca"},
+        )
+    response = client.get("/Livros/buscar?TITULO=Banco&limit=2&offset=1")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [livro["TITULO"] for livro in data] == ["Banco de Dados 1", "Banco de Dados 2"]
+
+
+def test_buscar_livros_sem_acentos(client):
+    client.post(
+        "/Livros/",
+        json={"TITULO": "Sistemas de Informação", "AUTOR": "José Conceição"},
+    )
+    response = client.get("/Livros/buscar?TITULO=informacao&AUTOR=JOSE")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [livro["TITULO"] for livro in data] == ["Sistemas de Informação"]
+
+
+def test_atualizar_livro_mantem_titulo_normalizado(client):
+    resp = client.post("/Livros/", json={"TITULO": "Antigo", "AUTOR": "Autor"})
+    cod_livro = resp.get_json()["COD"]
+    client.put(f"/Livros/{cod_livro}", json={"TITULO": "Educação Básica"})
+    response = client.get("/Livros/buscar?TITULO=educacao basica")
+    assert [livro["COD"] for livro in response.get_json()] == [cod_livro]
+
+
+def test_importar_livros_csv(client):
+    csv = (
+        "TITULO,AUTOR,EDITORA,ANO\n"
+        "Dom Casmurro,Machado de Assis,Garnier,1899\n"
+        "Memórias Póstumas,Machado de Assis,,\n"
+    )
+    response = client.post(
+        "/Livros/importar", data=csv.encode(), content_type="text/csv"
+    )
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data["total"] == 2
+    cod = data["CODS"][1]
+    livro = client.get(f"/Livros/{cod}").get_json()
+    assert livro["TITULO"] == "Memórias Póstumas"
+    assert livro["ANO"] is None
+    busca = client.get("/Livros/buscar?TITULO=memorias postumas").get_json()
+    assert [livro["COD"] for livro in busca] == [cod]
+
+
+def test_importar_livros_ndjson_invalido(client):
+    ndjson = '{"TITULO": "Válido", "AUTOR": "Autor"}\n{"AUTOR": "Sem título"}\n'
+    response = client.post(
+        "/Livros/importar", data=ndjson.encode(), content_type="application/x-ndjson"
+    )
+    assert response.status_code == 400
+    assert "Linha 2" in response.get_json()["message"]
+    assert client.get("/Livros/").get_json() == []
+
+
+def test_cli_importar_livros_sqlite(client, tmp_path):
+    arquivo = tmp_path / "catalogo.csv"
+    arquivo.write_text(
+        "TITULO,AUTOR,EDITORA,ANO\nDom Casmurro,Machado de Assis,Garnier,1899\n",
+        encoding="utf-8",
+    )
+    assert db_cli.main(["importar-livros", str(arquivo)]) == 0
+    livros = client.get("/Livros/").get_json()
+    assert [livro["TITULO"] for livro in livros] == ["Dom Casmurro"]
+
+
+def test_cli_importar_livros_invalido(client, tmp_path):
+    arquivo = tmp_path / "catalogo.ndjson"
+    arquivo.write_text('{"AUTOR": "Sem título"}\n', encoding="utf-8")
+    assert db_cli.main(["importar-livros", str(arquivo)]) == 1
+    assert db_cli.main(["importar-livros", str(tmp_path / "inexistente.csv")]) == 1
+    assert client.get("/Livros/").get_json() == []
+
+
+def test_obter_livro_condicional(client):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor Teste"})
+
+    response = client.get("/Livros/1")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    response = client.get("/Livros/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    client.put("/Livros/1", json={"TITULO": "Novo Título"})
+    response = client.get("/Livros/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["TITULO"] == "Novo Título"
+    assert response.headers["ETag"] != etag
+
+
+def test_atualizar_livro_if_match_desatualizado(client):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor Teste"})
+    client.put("/Livros/1", json={"ANO": 2020})
+
+    response = client.put(
+        "/Livros/1", json={"TITULO": "Outro"}, headers={"If-Match": '"v1"'}
+    )
+    assert response.status_code == 412
+    response = client.put(
+        "/Livros/1", json={"TITULO": "Outro"}, headers={"If-Match": "*"}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v3"'
+
+
+def test_atualizacao_concorrente_nao_sobrescreve(client):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor Teste"})
+
+    with app.app_context():
+        # Esta sessão leu a versão 1 (a referência mantém o objeto no identity
+        # map); outra sessão altera o livro antes do commit
+        livro = db.session.get(Livro, 1)
+        with Session(db.engine) as outra:
+            outra.get(Livro, 1).TITULO = "Primeira Alteração"
+            outra.commit()
+        with pytest.raises(VersaoDesatualizada):
+            LivroService.update_livro(db.session, livro.COD, TITULO="Segunda")
+
+    assert client.get("/Livros/1").get_json()["TITULO"] == "Primeira Alteração"
+
+
+def test_patch_livro_um_unico_update(client, capturar_sql):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor Teste"})
+    with capturar_sql() as instrucoes:
+        response = client.patch("/Livros/1", json={"TITULO": "Informação"})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v2"'
+    assert response.get_json() == {
+        "COD": 1,
+        "TITULO": "Informação",
+        "AUTOR": "Autor Teste",
+        "EDITORA": None,
+        "ANO": None,
+        "VERSAO": 2,
+    }
+    assert [instrucao.split()[0] for instrucao in instrucoes] == ["UPDATE"]
+    busca = client.get("/Livros/buscar?TITULO=informacao").get_json()
+    assert [livro["COD"] for livro in busca] == [1]
+
+
+def test_patch_livro_invalido(client):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor Teste"})
+
+    assert client.patch("/Livros/1", json={}).status_code == 400
+    assert client.patch("/Livros/1", json={"COD": 2}).status_code == 400
+    assert client.patch("/Livros/1", json={"TITULO": None}).status_code == 400
+    assert client.patch("/Livros/1", json={"ANO": "2020"}).status_code == 400
+    assert client.patch("/Livros/2", json={"ANO": 2020}).status_code == 404
+    response = client.patch(
+        "/Livros/1", json={"ANO": 2020}, headers={"If-Match": '"v7"'}
+    )
+    assert response.status_code == 412
+    assert client.get("/Livros/1").get_json()["VERSAO"] == 1
+
+
+def test_busca_em_lote_de_livros(client, capturar_sql):
+    for titulo in ("Livro 1", "Livro 2", "Livro 3"):
+        client.post("/Livros/", json={"TITULO": titulo, "AUTOR": "Autor"})
+    with capturar_sql() as instrucoes:
+        response = client.get("/Livros/?ids=3,99,1,3")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [livro and livro["COD"] for livro in data["itens"]] == [3, None, 1, 3]
+    assert data["nao_encontrados"] == [99]
+    assert [instrucao.split()[0] for instrucao in instrucoes] == ["SELECT"]
+
+    data = client.post("/Livros/lookup", json={"ids": [2]}).get_json()
+    assert data["itens"][0]["TITULO"] == "Livro 2"
+    assert client.get("/Livros/?ids=1,x").status_code == 400
+    assert client.post("/Livros/lookup", json={"ids": []}).status_code == 400
+
+
+def test_fields_seleciona_so_as_colunas_pedidas(client, capturar_sql):
+    client.post("/Livros/", json={"TITULO": "Livro Teste", "AUTOR": "Autor Teste"})
+    with capturar_sql() as instrucoes:
+        lista = client.get("/Livros/?fields=TITULO")
+        detalhe = client.get("/Livros/1?fields=TITULO,ANO")
+
+    assert lista.get_json() == [{"COD": 1, "TITULO": "Livro Teste"}]
+    assert detalhe.get_json() == {"COD": 1, "TITULO": "Livro Teste", "ANO": None}
+    assert len(instrucoes) == 2
+    for instrucao in instrucoes:
+        assert "AUTOR" not in instrucao and "VERSAO" not in instrucao
+
+    etag = detalhe.headers["ETag"]
+    assert etag != '"v1"'
+    response = client.get(
+        "/Livros/1?fields=TITULO,ANO", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+def test_fields_invalido(client):
+    response = client.get("/Livros/?fields=TITULO,SENHA")
+    assert response.status_code == 400
+    assert "SENHA" in response.get_json()["message"]
+    assert client.get("/Livros/1?fields=,").status_code == 400
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+from biblioteca_api import app, db
+from biblioteca_api.pool import (
+    InstrumentedQueuePool,
+    engine_options,
+    pool_stats,
+    raw_connection,
+)
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+def test_engine_options_le_ambiente(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    opcoes = engine_options("postgresql+psycopg2://u:s@localhost/biblioteca")
+    assert opcoes["poolclass"] is InstrumentedQueuePool
+    assert opcoes["pool_size"] == 20
+    assert opcoes["max_overflow"] == 0
+    assert opcoes["pool_pre_ping"] is False
+    assert opcoes["pool_timeout"] == 30
+
+
+def test_engine_options_sqlite_sem_pool():
+    assert engine_options("sqlite:///:memory:") == {}
+
+
+def test_pool_stats_conta_checkouts_e_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    with raw_connection(engine):
+        # Única conexão do pool está em uso: outra thread esgota o timeout
+        erros = []
+
+        def pegar_conexao():
+            try:
+                engine.connect()
+            except exc.TimeoutError as e:
+                erros.append(e)
+
+        thread = threading.Thread(target=pegar_conexao)
+        thread.start()
+        thread.join()
+        assert pool_stats(engine)["em_uso"] == 1
+
+    with engine.connect():
+        pass
+
+    stats = pool_stats(engine)
+    assert len(erros) == 1
+    assert stats["pool"] == "InstrumentedQueuePool"
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["em_uso"] == 0
+    assert stats["espera_max_ms"] >= 100
+
+
+def test_status_pool(client):
+    response = client.get("/status/pool")
+    assert response.status_code == 200
+    with app.app_context():
+        assert response.get_json()["pool"] == type(db.engine.pool).__name__
@@ -0,0 +1,142 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select, text
+
+from biblioteca_api import db
+from biblioteca_api.migrations import MIGRACOES
+from biblioteca_api.migrations import v0001_schema_inicial
+from biblioteca_api.models.normalizacao import normalizar
+from biblioteca_api.schema import (
+    BASELINE,
+    SCHEMA_VERSION,
+    _aplicar,
+    migracoes_pendentes,
+    migrar,
+    verificar_schema,
+    versao_schema,
+    versoes_aplicadas,
+)
+
+TODAS = [migracao.VERSAO for migracao in MIGRACOES]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+
+
+def test_migrar_banco_vazio_cria_schema_atual(engine):
+    assert migrar(engine) == []
+    tabelas = set(inspect(engine).get_table_names())
+    assert {"ALUNO", "LIVRO", "EXEMPLAR", "EMPRESTIMO", "SCHEMA_VERSION"} <= tabelas
+    with engine.connect() as conexao:
+        assert versao_schema(conexao) == SCHEMA_VERSION
+        assert versoes_aplicadas(conexao) == set(TODAS)
+        assert migracoes_pendentes(conexao) == []
+
+
+def test_migrar_idempotente(engine):
+    migrar(engine)
+    assert migrar(engine) == []
+
+
+def test_migrar_banco_legado(engine):
+    # Banco criado antes das colunas normalizadas e sem tabela de versões
+    with engine.begin() as conexao:
+        v0001_schema_inicial.upgrade(conexao)
+        conexao.execute(
+            text('INSERT INTO "LIVRO" ("TITULO", "AUTOR") VALUES (:t, :a)'),
+            {"t": "Introdução à Computação", "a": "José"},
+        )
+
+    with engine.connect() as conexao:
+        assert [m.VERSAO for m in migracoes_pendentes(conexao)] == TODAS
+
+    assert migrar(engine) == [v for v in TODAS if v != BASELINE]
+
+    with engine.connect() as conexao:
+        livro = conexao.execute(
+            text('SELECT "TITULO_NORM", "AUTOR_NORM", "VERSAO" FROM "LIVRO"')
+        ).one()
+        assert tuple(livro) == ("introducao a computacao", "jose", 1)
+        assert versoes_aplicadas(conexao) == set(TODAS)
+    indices = {i["name"] for i in inspect(engine).get_indexes("EMPRESTIMO")}
+    assert "ix_emprestimo_ativo" in indices
+
+
+def test_migrar_banco_legado_normaliza_como_a_busca(engine):
+    # ø, ß, æ e ł não se decompõem em NFKD: a migração tem de gravar exatamente
+    # o que normalizar() gera para os termos de busca
+    titulo, autor = "Straße Ærø", "Łukasz Søndergård"
+    with engine.begin() as conexao:
+        v0001_schema_inicial.upgrade(conexao)
+        conexao.execute(
+            text('INSERT INTO "LIVRO" ("TITULO", "AUTOR") VALUES (:t, :a)'),
+            {"t": titulo, "a": autor},
+        )
+
+    migrar(engine)
+
+    with engine.connect() as conexao:
+        livro = conexao.execute(
+            text('SELECT "TITULO_NORM", "AUTOR_NORM" FROM "LIVRO"')
+        ).one()
+    assert tuple(livro) == (normalizar(titulo), normalizar(autor))
+    assert livro.TITULO_NORM == "straße ærø"
+
+
+def test_migracao_com_erro_e_desfeita(engine):
+    migrar(engine)
+
+    def upgrade(conexao):
+        conexao.execute(text('INSERT INTO "LIVRO" ("TITULO") VALUES (\'Parcial\')'))
+        raise RuntimeError("falha no meio da migração")
+
+    quebrada = SimpleNamespace(VERSAO=99, DESCRICAO="Quebrada", upgrade=upgrade)
+    with pytest.raises(RuntimeError):
+        _aplicar(engine, quebrada)
+
+    with engine.connect() as conexao:
+        total = conexao.execute(select(func.count()).select_from(text('"LIVRO"')))
+        assert total.scalar() == 0
+        assert 99 not in versoes_aplicadas(conexao)
+
+
+def test_versao_schema_banco_vazio(engine):
+    with engine.connect() as conexao:
+        assert versao_schema(conexao) is None
+
+
+def test_verificar_schema_modos(engine, caplog):
+    with caplog.at_level(logging.WARNING):
+        assert verificar_schema(engine, "warn") is None
+    assert "python db.py init" in caplog.text
+
+    with pytest.raises(RuntimeError):
+        verificar_schema(engine, "strict")
+
+    migrar(engine)
+    assert verificar_schema(engine, "strict") == SCHEMA_VERSION
+
+
+def test_verificar_schema_off_nao_acessa_banco():
+    inacessivel = create_engine("postgresql+psycopg2://u:s@host-inexistente/db")
+    assert verificar_schema(inacessivel, "off") is None
+
+
+def test_migracoes_cobrem_os_modelos(engine):
+    # Banco legado + migrações deve terminar com as mesmas colunas e índices
+    # que o create_all dos modelos
+    with engine.begin() as conexao:
+        v0001_schema_inicial.upgrade(conexao)
+    migrar(engine)
+
+    esperado = create_engine("sqlite://")
+    db.metadata.create_all(esperado)
+    for tabela in db.metadata.tables:
+        colunas = {c["name"] for c in inspect(engine).get_columns(tabela)}
+        assert colunas == {c["name"] for c in inspect(esperado).get_columns(tabela)}
+        indices = {i["name"] for i in inspect(engine).get_indexes(tabela)}
+        assert indices == {i["name"] for i in inspect(esperado).get_indexes(tabela)}
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from biblioteca_api import app, db
+from biblioteca_api.serializacao import SerializadorJSON, configurar_json
+
+PAYLOAD = [
+    {
+        "COD": 1,
+        "NOME": "João",
+        "DATA_EMPRESTIMO": date(2024, 1, 31),
+        "DATA_DEVOLUCAO": None,
+        "TOMBOS": [1, 2],
+    },
+    {7: True},
+]
+ESPERADO = (
+    '[{"COD":1,"NOME":"João","DATA_EMPRESTIMO":"2024-01-31",'
+    '"DATA_DEVOLUCAO":null,"TOMBOS":[1,2]},{"7":true}]'
+).encode("utf-8")
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+def test_stdlib():
+    assert SerializadorJSON("stdlib").dumps(PAYLOAD) == ESPERADO
+
+
+def test_orjson_gera_o_mesmo_json():
+    pytest.importorskip("orjson")
+    serializador = SerializadorJSON("auto")
+    assert serializador.backend == "orjson"
+    assert serializador.dumps(PAYLOAD) == ESPERADO
+
+
+def test_backend_invalido():
+    with pytest.raises(ValueError):
+        SerializadorJSON("ujson")
+    with pytest.raises(TypeError):
+        SerializadorJSON("stdlib").dumps({"x": object()})
+
+
+def test_respostas_usam_o_serializador(client):
+    client.post("/Alunos/", json={"NOME": "Aluno", "EMAIL": "a@teste.com"})
+    client.post("/Emprestimos/", json={"MAT_ALUNO": 1})
+    serializador = configurar_json(app, "stdlib")
+    try:
+        response = client.get("/Emprestimos/1")
+        assert response.mimetype == "application/json"
+        assert b'"DATA_EMPRESTIMO":"' in response.data
+        assert client.get("/swagger.json").status_code == 200
+        assert app.json.serializador is serializador
+    finally:
+        configurar_json(app)
@@ -0,0 +1,5 @@
+"""Ponto de entrada WSGI de produção: gunicorn -c gunicorn.conf.py wsgi:app"""
+
+from biblioteca_api import app
+
+__all__ = ["app"]